@@ -0,0 +1,342 @@
+import os
+import sys
+import json
+import uuid
+import time
+import hashlib
+import asyncio
+import argparse
+import resource
+import requests
+from urllib.parse import urlsplit
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+
+# --- Configuration ---
+load_dotenv()
+
+BACKEND_URL = os.getenv('BOT_BACKEND_URL', 'http://127.0.0.1:5000')
+MASTER_KEY = os.getenv('MASTER_BACKEND_KEY')
+ASYNC_LOG_URL = os.getenv('BOT_BACKEND_ASYNC_LOG_URL', 'http://127.0.0.1:5001')
+
+TEST_USER_ID = "bench-user"
+TEST_BOT_FILENAME = "bot_to_test.py"
+HEADERS = {
+    'Authorization': f'Bearer {MASTER_KEY}',
+    'Accept': 'application/json',
+}
+
+# --- Helper Functions ---
+def print_step(title):
+    print("\n" + "="*50)
+    print(f"STEP: {title}")
+    print("="*50)
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+def print_latencies(label, values):
+    print(f"{label}: n={len(values)} "
+          f"p50={percentile(values, 50) * 1000:.1f}ms "
+          f"p95={percentile(values, 95) * 1000:.1f}ms "
+          f"p99={percentile(values, 99) * 1000:.1f}ms")
+
+def post(endpoint, payload, timeout=30):
+    return requests.post(f"{BACKEND_URL}{endpoint}", headers=HEADERS, json=payload, timeout=timeout)
+
+def delete_bots(bot_ids):
+    for bot_id in bot_ids:
+        try:
+            post("/delete", {"userId": TEST_USER_ID, "botoraloBotId": bot_id})
+        except requests.exceptions.RequestException:
+            pass
+
+# --- Scenarios ---
+def deploy_one(bot_id, auto_start, density=None):
+    meta_data = {
+        "userId": TEST_USER_ID,
+        "botoraloBotId": bot_id,
+        "name": f"bench-{bot_id[:8]}",
+        "auto_start": auto_start,
+    }
+    if density:
+        meta_data["density"] = density
+    started = time.time()
+    with open(TEST_BOT_FILENAME, 'rb') as f:
+        files = {
+            'meta': (None, json.dumps(meta_data), 'application/json'),
+            'code': (TEST_BOT_FILENAME, f, 'text/plain')
+        }
+        response = requests.post(f"{BACKEND_URL}/deploy", headers=HEADERS, files=files, timeout=30)
+    return wait_for_deploy(bot_id, started, response)
+
+def deploy_delta(bot_id, files, auto_start=True):
+    """files: {path: bytes}. Sends the manifest first, then uploads only what the backend asks for."""
+    manifest = {path: hashlib.sha256(content).hexdigest() for path, content in files.items()}
+    started = time.time()
+    missing = post("/deploy/manifest", {"userId": TEST_USER_ID, "botoraloBotId": bot_id, "files": manifest}).json()["missing"]
+    meta_data = {
+        "userId": TEST_USER_ID,
+        "botoraloBotId": bot_id,
+        "name": f"bench-{bot_id[:8]}",
+        "auto_start": auto_start,
+        "manifest": manifest,
+    }
+    upload = [('meta', (None, json.dumps(meta_data), 'application/json'))]
+    upload += [('code', (path, files[path], 'application/octet-stream')) for path in missing]
+    response = requests.post(f"{BACKEND_URL}/deploy", headers=HEADERS, files=upload, timeout=30)
+    return wait_for_deploy(bot_id, started, response)
+
+def wait_for_deploy(bot_id, started, response):
+    accepted = time.time()
+    if response.status_code != 202:
+        return {"bot_id": bot_id, "accepted": False, "accept_s": accepted - started, "status": response.status_code}
+    job_id = response.json()["jobId"]
+    while True:
+        job = post("/deploy/status", {"userId": TEST_USER_ID, "jobId": job_id}).json()["job"]
+        if job["status"] in ("succeeded", "failed"):
+            break
+        time.sleep(0.25)
+    return {
+        "bot_id": bot_id,
+        "accepted": True,
+        "accept_s": accepted - started,
+        "total_s": time.time() - started,
+        "status": job["status"],
+        "stages": job["stages"],
+    }
+
+def bench_deploy(args):
+    """N concurrent deploys: accept latency, end-to-end latency and deploys/minute."""
+    print_step(f"Concurrent deploys: {args.count} bots, {args.concurrency} client threads")
+    bot_ids = [str(uuid.uuid4()) for _ in range(args.count)]
+    started = time.time()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(lambda b: deploy_one(b, args.auto_start), bot_ids))
+    elapsed = time.time() - started
+
+    accepted = [r for r in results if r["accepted"]]
+    succeeded = [r for r in accepted if r["status"] == "succeeded"]
+    print(f"accepted={len(accepted)} rejected={len(results) - len(accepted)} "
+          f"succeeded={len(succeeded)} failed={len(accepted) - len(succeeded)}")
+    print_latencies("accept latency", [r["accept_s"] for r in results])
+    print_latencies("end-to-end", [r["total_s"] for r in accepted])
+    for stage in ("upload", "extract", "create", "install", "start"):
+        durations = [r["stages"][stage]["duration_ms"] / 1000.0 for r in succeeded
+                     if "duration_ms" in r["stages"].get(stage, {})]
+        if durations:
+            print_latencies(f"stage {stage}", durations)
+    print(f"wall={elapsed:.1f}s throughput={len(succeeded) / elapsed * 60:.1f} deploys/min")
+    if not args.keep:
+        delete_bots(bot_ids)
+
+def deploy_and_wait(count, density=None):
+    def deploy_until_accepted(bot_id):
+        while True:
+            result = deploy_one(bot_id, True, density)
+            if result["accepted"] or result["status"] != 503:
+                return result
+            time.sleep(1)
+    bot_ids = [str(uuid.uuid4()) for _ in range(count)]
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(deploy_until_accepted, bot_ids))
+    return [r["bot_id"] for r in results if r.get("status") == "succeeded"]
+
+def bench_dashboard(args):
+    """A dashboard with N bots: one request per bot vs. the batch endpoints."""
+    print_step(f"Dashboard refresh for {args.count} bots")
+    bot_ids = deploy_and_wait(args.count)
+    try:
+        for endpoint in ("/info", "/stats"):
+            singles, batches = [], []
+            for _ in range(args.rounds):
+                started = time.time()
+                with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+                    list(pool.map(lambda b: post(endpoint, {"userId": TEST_USER_ID, "botoraloBotId": b}), bot_ids))
+                singles.append(time.time() - started)
+                started = time.time()
+                post(f"{endpoint}/batch", {"userId": TEST_USER_ID, "botoraloBotIds": bot_ids})
+                batches.append(time.time() - started)
+            print_latencies(f"{endpoint} x{len(bot_ids)} ({args.concurrency} parallel)", singles)
+            print_latencies(f"{endpoint}/batch", batches)
+    finally:
+        if not args.keep:
+            delete_bots(bot_ids)
+
+def bench_lifecycle(args):
+    """Per-request latency of /info, /stop and /start on a deployed bot."""
+    print_step(f"Lifecycle request latency ({args.rounds} rounds)")
+    bot_ids = deploy_and_wait(1)
+    payload = {"userId": TEST_USER_ID, "botoraloBotId": bot_ids[0]}
+    try:
+        timings = {"/info": [], "/stop": [], "/start": []}
+        for _ in range(args.rounds):
+            for endpoint in ("/info", "/stop", "/info", "/start"):
+                started = time.time()
+                post(endpoint, payload)
+                timings[endpoint].append(time.time() - started)
+        for endpoint, values in timings.items():
+            print_latencies(endpoint, values)
+    finally:
+        if not args.keep:
+            delete_bots(bot_ids)
+
+def bench_logs(args):
+    """N SSE clients on one bot's /logs: upstream Docker follow streams should stay at one."""
+    print_step(f"Log followers: {args.subscribers} SSE clients per round")
+    bot_ids = deploy_and_wait(1)
+    payload = {"userId": TEST_USER_ID, "botoraloBotId": bot_ids[0]}
+    try:
+        for subscribers in args.subscribers:
+            streams = [requests.post(f"{BACKEND_URL}/logs", headers=HEADERS, json=payload, stream=True, timeout=30)
+                       for _ in range(subscribers)]
+            received = [0] * subscribers
+
+            def read(index):
+                started = time.time()
+                for chunk in streams[index].iter_content(chunk_size=None):
+                    received[index] += chunk.count(b"data: ")
+                    if time.time() - started > args.hold:
+                        break
+
+            with ThreadPoolExecutor(max_workers=subscribers) as pool:
+                futures = [pool.submit(read, i) for i in range(subscribers)]
+                time.sleep(args.hold / 2)
+                stats = requests.get(f"{BACKEND_URL}/logs/followers", headers=HEADERS, timeout=10).json()
+                for future in futures:
+                    future.result()
+            for stream in streams:
+                stream.close()
+            bot = stats["bots"].get(bot_ids[0], {})
+            print(f"clients={subscribers:>4} upstream_connections={stats['upstream_connections']} "
+                  f"upstream_opened_total={stats['upstream_opened_total']} "
+                  f"upstream_bytes={stats['upstream_bytes']} max_lag={bot.get('max_lag', 0)} "
+                  f"lines/client={sum(received) / subscribers:.0f}")
+    finally:
+        if not args.keep:
+            delete_bots(bot_ids)
+
+def bench_sse_scale(args):
+    """Hold N idle /logs2 streams open on the async log server; report its memory per connection."""
+    print_step(f"Async SSE connection scaling: {args.connections}")
+    url = urlsplit(ASYNC_LOG_URL)
+    body = json.dumps({"userId": TEST_USER_ID, "botoraloBotId": "bench-sse"}).encode()
+    request = (f"POST /logs2 HTTP/1.1\r\nHost: {url.netloc}\r\nAuthorization: Bearer {MASTER_KEY}\r\n"
+               f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n").encode() + body
+    # Raw sockets, not a thread per stream, so the client isn't the bottleneck.
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+    def server_stats():
+        return requests.get(f"{ASYNC_LOG_URL}/_async/stats", headers=HEADERS, timeout=30).json()
+
+    async def open_stream():
+        reader, writer = await asyncio.open_connection(url.hostname, url.port)
+        writer.write(request)
+        await writer.drain()
+        await reader.readuntil(b"\r\n\r\n")
+        return reader, writer
+
+    async def run():
+        baseline = await asyncio.to_thread(server_stats)
+        streams = []
+        try:
+            for target in sorted(args.connections):
+                started = time.time()
+                while len(streams) < target:
+                    batch = min(500, target - len(streams))
+                    streams.extend(await asyncio.gather(*(open_stream() for _ in range(batch))))
+                opened_s = time.time() - started
+                stats = await asyncio.to_thread(server_stats)
+                per_connection = (stats["rss_bytes"] - baseline["rss_bytes"]) / len(streams)
+                print(f"connections={stats['open_connections']:>6} open_time={opened_s:.1f}s "
+                      f"server_rss={stats['rss_bytes'] / 1024 / 1024:.0f}MiB "
+                      f"per_connection={per_connection / 1024:.1f}KiB")
+            started = time.time()
+            stats = await asyncio.to_thread(server_stats)
+            print(f"/_async/stats latency with {len(streams)} streams open: {(time.time() - started) * 1000:.1f}ms")
+        finally:
+            for _, writer in streams:
+                writer.close()
+
+    asyncio.run(run())
+
+def bench_redeploy(args):
+    """One-line edits to a deployed bot: full re-upload vs. manifest delta deploy."""
+    print_step(f"Redeploy after a one-line edit ({args.rounds} rounds)")
+    bot_ids = deploy_and_wait(1)
+    with open(TEST_BOT_FILENAME, 'rb') as f:
+        code = f.read()
+    try:
+        timings = {"full": [], "delta": []}
+        reused = 0
+        for i in range(args.rounds):
+            timings["full"].append(deploy_one(bot_ids[0], True)["total_s"])
+            edited = code + f"\n# edit {i}\n".encode()
+            result = deploy_delta(bot_ids[0], {TEST_BOT_FILENAME: edited})
+            timings["delta"].append(result["total_s"])
+            reused += bool(result["stages"]["create"].get("reused"))
+        for mode, values in timings.items():
+            print_latencies(f"{mode} redeploy", values)
+        print(f"container reused on {reused}/{args.rounds} delta deploys")
+    finally:
+        if not args.keep:
+            delete_bots(bot_ids)
+
+def bench_density(args):
+    """The same N bots dedicated (one container each) vs. shared runtimes: bots per GB."""
+    print_step(f"Density: {args.count} bots, dedicated vs. shared")
+    results = {}
+    for density in ("dedicated", "shared"):
+        bot_ids = deploy_and_wait(args.count, density)
+        try:
+            # Let the sampler settle on the idle bots before reading memory.
+            time.sleep(args.hold)
+            if density == "dedicated":
+                stats = post("/stats/batch", {"userId": TEST_USER_ID, "botoraloBotIds": bot_ids}).json()["stats"]
+                total_mb = sum(s.get("memory_usage_mb", 0) for s in stats.values())
+                containers = len(bot_ids)
+            else:
+                shared = requests.get(f"{BACKEND_URL}/shared/stats", headers=HEADERS, timeout=10).json()
+                total_mb = sum(r.get("container_mb") or 0 for r in shared["runtimes"].values())
+                containers = len(shared["runtimes"])
+            results[density] = (len(bot_ids), containers, total_mb)
+        finally:
+            if not args.keep:
+                delete_bots(bot_ids)
+    for density, (bots, containers, total_mb) in results.items():
+        per_bot = total_mb / bots if bots else 0
+        print(f"{density:10s} bots={bots} containers={containers} memory={total_mb:.1f} MB "
+              f"per_bot={per_bot:.1f} MB bots_per_gb={1024 / per_bot if per_bot else 0:.1f}")
+
+SCENARIOS = {
+    "deploy": bench_deploy,
+    "dashboard": bench_dashboard,
+    "lifecycle": bench_lifecycle,
+    "redeploy": bench_redeploy,
+    "logs": bench_logs,
+    "sse-scale": bench_sse_scale,
+    "density": bench_density,
+}
+
+if __name__ == '__main__':
+    if not MASTER_KEY:
+        print("CRITICAL ERROR: MASTER_BACKEND_KEY is not set in your .env file.")
+        sys.exit(1)
+    parser = argparse.ArgumentParser(description="Botoralo backend load benchmarks")
+    parser.add_argument("scenario", choices=sorted(SCENARIOS))
+    parser.add_argument("--count", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--auto-start", action="store_true")
+    parser.add_argument("--subscribers", type=int, nargs="+", default=[1, 10, 50], help="logs scenario")
+    parser.add_argument("--hold", type=float, default=5.0, help="seconds each log client stays connected, or density settles")
+    parser.add_argument("--connections", type=int, nargs="+", default=[1000, 2500, 5000], help="sse-scale scenario")
+    parser.add_argument("--keep", action="store_true", help="don't delete the bots afterwards")
+    args = parser.parse_args()
+    print(f"Targeting backend: {BACKEND_URL}")
+    SCENARIOS[args.scenario](args)
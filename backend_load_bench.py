@@ -0,0 +1,273 @@
+import os
+import sys
+import json
+import uuid
+import time
+import argparse
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from fake_docker import FakeDocker
+
+# Load benchmarks for the whole backend (Flask app, deploy pipeline, log fan-out,
+# sampler) against FakeDocker, served on a loopback port. No Docker daemon or
+# network needed, so it can run in CI:
+#   python backend_load_bench.py all --json results.json --max-p95-ms 500
+
+TEST_USER_ID = "load-user"
+BOT_CODE = b"import time\nwhile True:\n    print('tick', flush=True)\n    time.sleep(1)\n"
+
+# --- Helper Functions ---
+def print_step(title):
+    print("\n" + "="*50)
+    print(f"STEP: {title}")
+    print("="*50)
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+def summarize(label, values, elapsed=None):
+    """Prints and returns n, p50/p95/p99 (ms) and, given the wall time, throughput per second."""
+    result = {
+        "n": len(values),
+        "p50_ms": round(percentile(values, 50) * 1000, 1),
+        "p95_ms": round(percentile(values, 95) * 1000, 1),
+        "p99_ms": round(percentile(values, 99) * 1000, 1),
+    }
+    line = f"{label}: n={result['n']} p50={result['p50_ms']}ms p95={result['p95_ms']}ms p99={result['p99_ms']}ms"
+    if elapsed:
+        result["per_s"] = round(len(values) / elapsed, 1)
+        line += f" throughput={result['per_s']}/s"
+    print(line)
+    return result
+
+class Backend:
+    """bot_backend on a loopback port, with FakeDocker swapped in for docker_client/docker_api."""
+
+    def __init__(self, args):
+        self.daemon = FakeDocker(
+            log_rate=args.log_rate,
+            stats_latency=args.stats_latency_ms / 1000,
+            create_latency=args.create_latency_ms / 1000,
+            install_latency=args.install_latency_ms / 1000,
+        )
+        self.daemon.install()
+        os.environ.setdefault("MASTER_BACKEND_KEY", uuid.uuid4().hex + uuid.uuid4().hex)
+        os.environ["BOTS_DIR"] = tempfile.mkdtemp(prefix="botoralo-load-")
+        os.environ.setdefault("WARM_POOL_SIZE", "0")
+        os.environ.setdefault("SAMPLER_INTERVAL", "1")
+        # Measure the pipeline, not the queue bound: every deploy of a scenario is accepted.
+        os.environ.setdefault("DEPLOY_MAX_PENDING", str(max(args.deploys, args.bots) * 2))
+        import logging
+        logging.disable(logging.INFO)
+        import bot_backend
+        from werkzeug.serving import make_server
+        self.backend = bot_backend
+        bot_backend.start_background_services()
+        self.server = make_server("127.0.0.1", 0, bot_backend.app, threaded=True)
+        threading.Thread(target=self.server.serve_forever, name="load-bench-server", daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        self.headers = {"Authorization": f"Bearer {os.environ['MASTER_BACKEND_KEY']}"}
+        self._local = threading.local()
+
+    @property
+    def session(self):
+        # One keep-alive session per client thread.
+        if not hasattr(self._local, "session"):
+            self._local.session = requests.Session()
+            self._local.session.headers.update(self.headers)
+        return self._local.session
+
+    def post(self, endpoint, payload, timeout=60):
+        return self.session.post(f"{self.url}{endpoint}", json=payload, timeout=timeout)
+
+    def deploy(self, bot_id, memory_mb=128):
+        meta = {"userId": TEST_USER_ID, "botoraloBotId": bot_id, "name": f"load-{bot_id[:8]}",
+                "memory_mb": memory_mb, "auto_start": True}
+        started = time.perf_counter()
+        response = self.session.post(
+            f"{self.url}/deploy",
+            files={"meta": (None, json.dumps(meta), "application/json"), "code": ("main.py", BOT_CODE, "text/plain")},
+            timeout=60,
+        )
+        accepted = time.perf_counter()
+        if response.status_code != 202:
+            return {"bot_id": bot_id, "accepted": False, "accept_s": accepted - started, "status": response.status_code}
+        job_id = response.json()["jobId"]
+        while True:
+            job = self.post("/deploy/status", {"userId": TEST_USER_ID, "jobId": job_id}).json()["job"]
+            if job["status"] in ("succeeded", "failed"):
+                break
+            time.sleep(0.02)
+        return {"bot_id": bot_id, "accepted": True, "accept_s": accepted - started,
+                "total_s": time.perf_counter() - started, "status": job["status"], "stages": job["stages"]}
+
+    def deploy_many(self, count, concurrency):
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            return list(pool.map(self.deploy, [str(uuid.uuid4()) for _ in range(count)]))
+
+    def delete(self, bot_ids):
+        for bot_id in bot_ids:
+            self.post("/delete", {"userId": TEST_USER_ID, "botoraloBotId": bot_id})
+
+# --- Scenarios ---
+def scenario_deploy(backend, args):
+    """N concurrent deploys: accept latency, end-to-end latency and deploys/s."""
+    print_step(f"Concurrent deploys: {args.deploys} bots, {args.concurrency} clients")
+    started = time.perf_counter()
+    results = backend.deploy_many(args.deploys, args.concurrency)
+    elapsed = time.perf_counter() - started
+    succeeded = [r for r in results if r.get("status") == "succeeded"]
+    print(f"accepted={sum(r['accepted'] for r in results)} succeeded={len(succeeded)} "
+          f"rejected={sum(r.get('status') == 503 for r in results)}")
+    report = {
+        "succeeded": len(succeeded),
+        "accept": summarize("accept", [r["accept_s"] for r in results]),
+        "end_to_end": summarize("end-to-end", [r["total_s"] for r in succeeded], elapsed),
+    }
+    for stage in ("extract", "create", "install", "start"):
+        durations = [r["stages"][stage]["duration_ms"] / 1000 for r in succeeded
+                     if "duration_ms" in r["stages"].get(stage, {})]
+        report[f"stage_{stage}"] = summarize(f"stage {stage}", durations)
+    backend.delete([r["bot_id"] for r in results])
+    return report
+
+def scenario_viewers(backend, args):
+    """M SSE viewers on each of B bots' /logs: time to first line, delivery latency and lines/s delivered."""
+    print_step(f"Log viewers: {args.viewers} per bot on {args.bots} bots, {args.log_rate:g} lines/s each, "
+               f"{args.hold:g}s")
+    bot_ids = [r["bot_id"] for r in backend.deploy_many(args.bots, args.concurrency) if r.get("status") == "succeeded"]
+    first_line, delays, delivered = [], [], [0]
+    lock = threading.Lock()
+
+    def view(bot_id):
+        started = time.perf_counter()
+        got_first = False
+        count, lags = 0, []
+        with requests.post(f"{backend.url}/logs", headers=backend.headers, stream=True, timeout=60,
+                           json={"userId": TEST_USER_ID, "botoraloBotId": bot_id}) as response:
+            for raw in response.iter_lines():
+                if not raw.startswith(b"data: "):
+                    continue
+                text = raw[6:].decode(errors="replace")
+                printed_at, _, rest = text.partition(" ")
+                if not rest.startswith("line "):
+                    continue
+                if not got_first:
+                    got_first = True
+                    with lock:
+                        first_line.append(time.perf_counter() - started)
+                count += 1
+                try:
+                    lags.append(time.time() - float(printed_at))
+                except ValueError:
+                    pass
+                if time.perf_counter() - started > args.hold:
+                    break
+        with lock:
+            delivered[0] += count
+            delays.extend(lags)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(bot_ids) * args.viewers) as pool:
+        list(pool.map(view, [bot_id for bot_id in bot_ids for _ in range(args.viewers)]))
+    elapsed = time.perf_counter() - started
+    followers = backend.session.get(f"{backend.url}/logs/followers", timeout=10).json()
+    expected = args.log_rate * args.hold * len(bot_ids) * args.viewers
+    print(f"delivered={delivered[0]} lines ({delivered[0] / max(1, expected):.0%} of the live rate, replay included), "
+          f"{delivered[0] / elapsed:.0f} lines/s, upstream streams opened={followers['upstream_opened_total']}")
+    report = {
+        "delivered_lines": delivered[0],
+        "delivered_per_s": round(delivered[0] / elapsed, 1),
+        "first_line": summarize("time to first line", first_line),
+        "delivery": summarize("print-to-client delay", delays),
+    }
+    backend.delete(bot_ids)
+    return report
+
+def scenario_stats_storm(backend, args):
+    """C clients polling /stats and /stats/batch as fast as they can for D seconds."""
+    print_step(f"Stats polling storm: {args.concurrency} clients, {args.bots} bots, {args.duration:g}s")
+    bot_ids = [r["bot_id"] for r in backend.deploy_many(args.bots, args.concurrency) if r.get("status") == "succeeded"]
+    time.sleep(backend.backend.SAMPLER_INTERVAL * 2)     # let the sampler see every bot
+    report = {}
+    for endpoint in ("/stats", "/stats/batch", "/info/batch"):
+        latencies = []
+        lock = threading.Lock()
+        deadline = time.perf_counter() + args.duration
+        docker_stats_before = backend.daemon.calls["stats"]
+
+        def poll(worker):
+            mine = []
+            i = worker
+            while time.perf_counter() < deadline:
+                if endpoint == "/stats":
+                    payload = {"userId": TEST_USER_ID, "botoraloBotId": bot_ids[i % len(bot_ids)]}
+                else:
+                    payload = {"userId": TEST_USER_ID, "botoraloBotIds": bot_ids}
+                i += 1
+                started = time.perf_counter()
+                backend.post(endpoint, payload)
+                mine.append(time.perf_counter() - started)
+            with lock:
+                latencies.extend(mine)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            list(pool.map(poll, range(args.concurrency)))
+        report[endpoint] = summarize(endpoint, latencies, time.perf_counter() - started)
+        report[endpoint]["docker_stats_calls"] = backend.daemon.calls["stats"] - docker_stats_before
+    backend.delete(bot_ids)
+    return report
+
+SCENARIOS = {
+    "deploy": scenario_deploy,
+    "viewers": scenario_viewers,
+    "stats-storm": scenario_stats_storm,
+}
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Botoralo backend load benchmarks against an in-memory Docker")
+    parser.add_argument("scenario", choices=sorted(SCENARIOS) + ["all"])
+    parser.add_argument("--deploys", type=int, default=50, help="deploy scenario")
+    parser.add_argument("--bots", type=int, default=10, help="viewers and stats-storm scenarios")
+    parser.add_argument("--viewers", type=int, default=10, help="SSE clients per bot")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--hold", type=float, default=5.0, help="seconds each viewer stays connected")
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds of stats polling per endpoint")
+    parser.add_argument("--log-rate", type=float, default=20.0, help="lines/s each fake bot prints")
+    parser.add_argument("--stats-latency-ms", type=float, default=5.0)
+    parser.add_argument("--create-latency-ms", type=float, default=50.0)
+    parser.add_argument("--install-latency-ms", type=float, default=200.0)
+    parser.add_argument("--json", help="write the results here")
+    parser.add_argument("--max-p95-ms", type=float, help="exit 1 if any p95 latency is above this")
+    args = parser.parse_args()
+
+    backend = Backend(args)
+    print(f"Backend on {backend.url} with FakeDocker")
+    names = sorted(SCENARIOS) if args.scenario == "all" else [args.scenario]
+    results = {name: SCENARIOS[name](backend, args) for name in names}
+    results["docker_calls"] = dict(backend.daemon.calls)
+    print(f"\nDocker calls: {', '.join(f'{name}={count}' for name, count in sorted(results['docker_calls'].items()))}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.max_p95_ms is not None:
+        over = []
+        def walk(path, value):
+            if isinstance(value, dict):
+                if "p95_ms" in value and value["p95_ms"] > args.max_p95_ms:
+                    over.append(f"{path} p95={value['p95_ms']}ms")
+                for key, child in value.items():
+                    walk(f"{path}.{key}" if path else key, child)
+        walk("", results)
+        if over:
+            print(f"\nOver the {args.max_p95_ms:g}ms p95 budget: {', '.join(over)}")
+            sys.exit(1)
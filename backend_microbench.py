@@ -0,0 +1,661 @@
+import io
+import os
+import re
+import json
+import random
+import socket
+import time
+import shutil
+import zipfile
+import argparse
+import tempfile
+import threading
+import tracemalloc
+
+from log_broker import LogBroker
+from log_store import LogStore, codec_available, render_line
+from log_index import LogIndex
+from log_governor import LogGovernor
+from sse_framing import SseFraming
+from line_framer import LineFramer
+from upload_extract import ZipStreamExtractor, UploadRejected
+from bot_registry import BotRegistry
+from lifecycle import LifecycleCoordinator, WeightedSemaphore, host_capacity
+from placement import NodeLoad, choose_node, fits
+from hibernation import IdleHibernator
+from metrics import Family, MetricsRegistry
+
+# In-process micro-benchmarks for the backend's hot paths. No Docker or network needed.
+
+def print_step(title):
+    print("\n" + "="*50)
+    print(f"STEP: {title}")
+    print("="*50)
+
+# --- Log broker fan-out ---
+def bench_broker(args):
+    """One publisher, N subscribers each reading from their own cursor."""
+    for subscribers in args.subscribers:
+        print_step(f"Log broker fan-out: {subscribers} subscribers, {args.lines} lines")
+        broker = LogBroker(capacity=args.capacity)
+        received = [0] * subscribers
+        dropped = [0] * subscribers
+
+        def reader(index):
+            cursor = broker.replay_cursor(0)
+            while True:
+                lines, cursor, lost = broker.read(cursor)
+                received[index] += len(lines)
+                dropped[index] += lost
+                if cursor >= args.lines:
+                    return
+                if not lines:
+                    broker.wait(cursor, timeout=0.1)
+
+        tracemalloc.start()
+        threads = [threading.Thread(target=reader, args=(i,)) for i in range(subscribers)]
+        for t in threads:
+            t.start()
+        started = time.perf_counter()
+        for i in range(args.lines):
+            broker.publish(f"[stdout] line {i} of the fan-out benchmark")
+        publish_s = time.perf_counter() - started
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        delivered = sum(received)
+        print(f"publish: {args.lines / publish_s:,.0f} lines/s")
+        print(f"delivered: {delivered:,} lines in {elapsed:.2f}s ({delivered / elapsed:,.0f} lines/s total)")
+        print(f"dropped (slow subscribers skipped ahead): {sum(dropped):,}")
+        print(f"peak traced memory: {peak / 1024:.0f} KiB")
+
+# --- On-disk log store ---
+def bench_store(args):
+    """Append throughput, then point-query latency at the start, middle and end of the history."""
+    print_step(f"Log store: {args.lines} lines")
+    directory = tempfile.mkdtemp(prefix="logstore-bench-")
+    try:
+        store = LogStore(directory, segment_bytes=1024 * 1024, retention_bytes=1 << 40)
+        base = time.time() - args.lines
+        started = time.perf_counter()
+        for i in range(args.lines):
+            store.append(f"[stdout] line {i} of the log store benchmark", ts=base + i)
+        store.flush()
+        elapsed = time.perf_counter() - started
+        stats = store.stats()
+        print(f"append: {args.lines / elapsed:,.0f} lines/s, {stats['segments']} segments, "
+              f"{stats['bytes'] / 1024 / 1024:.1f} MiB")
+        for label, offset in (("oldest", 0), ("middle", args.lines // 2), ("newest", args.lines - 100)):
+            for key, query in (("since", {"since": base + offset}), ("after_seq", {"after_seq": offset})):
+                started = time.perf_counter()
+                for _ in range(100):
+                    store.range(limit=100, **query)
+                print(f"range {label:>6} by {key:<9}: {(time.perf_counter() - started) * 10:.2f}ms per 100-line query")
+        store.close()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+# --- Log archival ---
+def sample_log_line(rng, i):
+    kind = rng.random()
+    if kind < 0.6:
+        return f"[stdout] {time.strftime('%H:%M:%S')} INFO handled update {i} from chat {rng.randint(1000, 9999)} in {rng.random() * 90:.1f}ms"
+    if kind < 0.9:
+        return f"[stdout] {json.dumps({'event': 'message', 'user': rng.randint(1, 500), 'text': 'hello ' * rng.randint(1, 6)})}"
+    return f"[stderr] WARNING retrying request {i}: timed out after {rng.randint(1, 30)}s"
+
+def bench_archive(args):
+    """Compression ratio and CPU per codec, and export throughput: /logs/range pages vs. gzip download."""
+    print_step(f"Log archival: {args.lines} lines")
+    rng = random.Random(1)
+    lines = [sample_log_line(rng, i) for i in range(args.lines)]
+    base = time.time() - args.lines * 0.01
+    for codec in ("gzip", "zstd"):
+        if not codec_available(codec):
+            print(f"{codec}: not installed, skipped")
+            continue
+        directory = tempfile.mkdtemp(prefix="logarchive-bench-")
+        try:
+            store = LogStore(directory, segment_bytes=1024 * 1024, retention_bytes=1 << 40)
+            for i, line in enumerate(lines):
+                store.append(line, ts=base + i * 0.01)
+            store.flush()
+            raw_bytes = store.stats()["bytes"]
+            store.archive_sealed(codec)
+            ratio = store.archived_raw_bytes / max(1, store.archived_bytes)
+            print(f"{codec}: {raw_bytes / 1024 / 1024:.1f} MiB -> {store.stats()['bytes'] / 1024 / 1024:.1f} MiB on disk, "
+                  f"ratio {ratio:.1f}x, {store.archive_seconds / (store.archived_raw_bytes / 1024 / 1024):.3f} CPU s/MiB")
+
+            # The plain-text path: page through /logs/range's query and serialize each page.
+            started = time.perf_counter()
+            plain, after = 0, None
+            while True:
+                page = store.range(after_seq=after, limit=10000)
+                if not page:
+                    break
+                plain += len(json.dumps({"lines": [{"seq": q, "t": t, "line": l} for q, t, l in page]}))
+                after = page[-1][0]
+            plain_s = time.perf_counter() - started
+            print(f"  /logs/range pages: {plain / 1024 / 1024:.1f} MiB in {plain_s:.2f}s "
+                  f"({args.lines / plain_s:,.0f} lines/s)")
+
+            # Everything (mostly passthrough), then a range starting mid-segment (recompressed edges).
+            for label, since in (("whole history", None), ("from the middle", base + args.lines * 0.005 + 0.003)):
+                started = time.perf_counter()
+                cpu = time.process_time()
+                chunks, info = store.download(since=since, codec=codec)
+                sent = sum(len(chunk) for chunk in chunks)
+                elapsed = time.perf_counter() - started
+                print(f"  download {label}: {sent / 1024 / 1024:.1f} MiB in {elapsed:.2f}s, "
+                      f"{time.process_time() - cpu:.2f} CPU s, {info['passthrough']}/{info['segments']} segments passed through")
+            text = sum(len(render_line(base, line.encode())) for line in lines)
+            print(f"  same lines as plain text: {text / 1024 / 1024:.1f} MiB")
+            store.close()
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+# --- Log search ---
+TRACEBACK_LINES = [
+    "[stderr] Traceback (most recent call last):",
+    '[stderr]   File "/bot/main.py", line 42, in handle',
+    "[stderr]     reply = cache[chat_id]",
+    "[stderr] KeyError: 'chat'",
+]
+
+def bench_search(args):
+    """Index build rate and size, then /logs/search queries vs. a linear scan of the same history."""
+    print_step(f"Log search: {args.lines} lines")
+    rng = random.Random(2)
+    directory = tempfile.mkdtemp(prefix="logsearch-bench-")
+    try:
+        store = LogStore(directory, retention_bytes=1 << 40)
+        base = time.time() - args.lines * 0.01
+        seq = 0
+        while seq < args.lines:
+            chunk = TRACEBACK_LINES if rng.random() < 0.0005 else [sample_log_line(rng, seq)]
+            for line in chunk:
+                store.append(line, ts=base + seq * 0.01)
+                seq += 1
+        store.flush()
+        index = LogIndex(store)
+        started = time.perf_counter()
+        index.catch_up()
+        elapsed = time.perf_counter() - started
+        stats = index.stats()
+        print(f"index build: {seq / elapsed:,.0f} lines/s, {stats['tokens']:,} tokens, "
+              f"{stats['postings_bytes'] / 1024 / 1024:.1f} MiB of postings, {stats['error_blocks']} error blocks")
+
+        def linear(predicate, limit):
+            # What filtering on the client amounts to: read everything, keep the last `limit` matches.
+            found, after = [], None
+            while True:
+                page = store.range(after_seq=after, limit=10000)
+                if not page:
+                    return found[-limit:]
+                found.extend(r for r in page if predicate(r[2]))
+                after = page[-1][0]
+
+        cases = [
+            ("rare word", {"query": "KeyError"}, lambda l: "keyerror" in l.lower()),
+            ("word fragment", {"query": "imed ou"}, lambda l: "imed ou" in l.lower()),
+            ("common word", {"query": "handled"}, lambda l: "handled" in l.lower()),
+            ("regex", {"regex": r"retrying request \d+: timed out after 2\ds"},
+             lambda l, r=re.compile(r"retrying request \d+: timed out after 2\ds", re.I): r.search(l)),
+            ("level traceback", {"level": "traceback"}, None),
+        ]
+        for label, query, predicate in cases:
+            started = time.perf_counter()
+            lines, _, scanned = index.search(limit=100, **query)
+            indexed_ms = (time.perf_counter() - started) * 1000
+            line = f"{label:<16} {len(lines):>3} lines, indexed {indexed_ms:8.1f}ms ({scanned:,} lines checked)"
+            if predicate:
+                started = time.perf_counter()
+                expected = linear(predicate, 100)
+                linear_ms = (time.perf_counter() - started) * 1000
+                assert [r[0] for r in expected] == [r[0] for r in lines], label
+                line += f", linear scan {linear_ms:8.1f}ms"
+            print(line)
+        started = time.perf_counter()
+        blocks = index.error_blocks(5, 3)
+        print(f"last 5 error blocks with context: {(time.perf_counter() - started) * 1000:.1f}ms, "
+              f"{sum(len(b[3]) for b in blocks)} lines")
+        store.close()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+# --- Log rate limits ---
+def bench_governor(args):
+    """admit() cost per line for normal, repeating and flooding output, and what a flood costs downstream."""
+    print_step(f"Log governor: {args.lines} lines")
+    rng = random.Random(3)
+    varied = [sample_log_line(rng, i) for i in range(args.lines)]
+    repeated = ["[stdout] polling..."] * args.lines
+    cases = [
+        ("varied, unlimited", varied, (0, 0)),
+        ("varied, under limit", varied, (1e9, 1e12)),
+        ("repeated line", repeated, (500, 131072)),
+        ("flood over limit", varied, (500, 131072)),
+    ]
+    for label, lines, (lines_per_s, bytes_per_s) in cases:
+        governor = LogGovernor(lines_per_s, bytes_per_s)
+        started = time.perf_counter()
+        published = 0
+        for line in lines:
+            published += len(governor.admit(line))
+        published += len(governor.flush())
+        elapsed = time.perf_counter() - started
+        print(f"{label:<20} {elapsed / len(lines) * 1e9:6.0f} ns/line, {published:>8,} published, "
+              f"{governor.dropped_lines:>8,} dropped, {governor.collapsed:>8,} collapsed, {governor.sampled:>6,} sampled")
+
+    # The flood end to end: broker + store per line, with and without the governor in front.
+    for label, governor in (("no governor", None), ("governor", LogGovernor(500, 131072))):
+        directory = tempfile.mkdtemp(prefix="loggovernor-bench-")
+        try:
+            broker, store = LogBroker(args.capacity), LogStore(directory, retention_bytes=1 << 40)
+            started = time.perf_counter()
+            for line in varied:
+                for admitted in (governor.admit(line) if governor else (line,)):
+                    broker.publish(admitted)
+                    store.append(admitted)
+            elapsed = time.perf_counter() - started
+            print(f"flood, {label:<12} {elapsed / len(varied) * 1e9:6.0f} ns/line, "
+                  f"{store.stats()['bytes'] / 1024 / 1024:6.1f} MiB stored")
+            store.close()
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    # Backpressure: simulated time, a reader taking 64 KiB chunks as fast as the bot writes them.
+    now = [0.0]
+    governor = LogGovernor(500, 131072, read_factor=4, clock=lambda: now[0])
+    total = 0
+    while now[0] < 60:
+        total += 65536
+        now[0] += 0.001 + governor.read_delay(65536)
+    print(f"reader throttled to {total / now[0] / 1024:,.0f} KiB/s (limit 128 KiB/s x read factor 4), "
+          f"{governor.throttled_s:.1f}s of {now[0]:.1f}s spent waiting")
+
+# --- SSE framing ---
+def bench_sse(args):
+    """Writes, wire bytes and CPU per line for per-line SSE events vs. batched (and gzipped) events."""
+    rng = random.Random(4)
+    lines = [sample_log_line(rng, i) for i in range(args.lines)]
+    for rate in args.sse_rates:
+        # Lines a 50 ms window collects from a bot printing `rate` lines/s.
+        per_batch = max(1, rate // 20)
+        print_step(f"SSE framing: {args.lines} lines at {rate} lines/s ({per_batch} per 50 ms batch)")
+        for label, framing in (("per line", SseFraming("line")), ("batch", SseFraming("batch")),
+                               ("batch + gzip", SseFraming("batch", gzip=True))):
+            sender, receiver = socket.socketpair()
+            drain = threading.Thread(target=lambda: [None for _ in iter(lambda: receiver.recv(1 << 16), b"")])
+            drain.start()
+            writes = 0
+            started, cpu = time.perf_counter(), time.process_time()
+            for start in range(0, len(lines), per_batch):
+                batch = lines[start:start + per_batch]
+                events = framing.lines(batch, start + len(batch))
+                if framing.batched:
+                    sender.sendall(framing.encode("".join(events)))
+                    writes += 1
+                else:
+                    # What the WSGI server does with a generator yielding one event per line.
+                    for event in events:
+                        sender.sendall(framing.encode(event))
+                        writes += 1
+            sender.sendall(framing.finish())
+            sender.close()
+            drain.join()
+            receiver.close()
+            elapsed, cpu = time.perf_counter() - started, time.process_time() - cpu
+            print(f"{label:<13} {writes:>8,} writes, {framing.wire_bytes / len(lines):6.1f} wire bytes/line "
+                  f"({framing.raw_bytes / 1024 / 1024:.1f} MiB framed), {cpu / len(lines) * 1e6:5.2f} CPU us/line, "
+                  f"{len(lines) / elapsed:>10,.0f} lines/s")
+
+# --- Line framing ---
+def split_lines_legacy(chunks):
+    """The str-buffer + split("\\n", 1) loop the exec/log streams used before LineFramer."""
+    buffer, lines = "", []
+    for chunk in chunks:
+        buffer += chunk.decode("utf-8", errors="replace")
+        while "\n" in buffer:
+            line, buffer = buffer.split("\n", 1)
+            lines.append(("stdout", line, False))
+    return len(lines)
+
+def split_lines_framer(chunks):
+    framer = LineFramer(max_line_bytes=1 << 30)
+    count = 0
+    for chunk in chunks:
+        count += len(framer.feed(chunk))
+    return count + len(framer.flush())
+
+def bench_framer(args):
+    """Lines/s and MB/s for the framer vs. the legacy loop across chunk sizes and line lengths."""
+    for line_length in args.line_lengths:
+        line = ("x" * (line_length - 1) + "\n").encode()
+        data = line * max(1, args.bytes // len(line))
+        print_step(f"Line framing: {line_length}-byte lines, {len(data) / 1024 / 1024:.0f} MiB")
+        for chunk_size in args.chunk_sizes:
+            chunks = [data[i:i + chunk_size] for i in range(0, len(data), chunk_size)]
+            for name, split in (("legacy", split_lines_legacy), ("framer", split_lines_framer)):
+                started = time.perf_counter()
+                count = split(chunks)
+                elapsed = time.perf_counter() - started
+                print(f"chunk {chunk_size:>6} {name}: {count / elapsed:>12,.0f} lines/s "
+                      f"{len(data) / elapsed / 1024 / 1024:>8.1f} MB/s")
+
+# --- Upload extraction ---
+UPLOAD_CHUNK = 64 * 1024    # roughly what the multipart parser hands over per write
+
+
+def build_zip(entries):
+    """entries: iterable of (name, size, chunk); the archive is built in memory."""
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name, size, chunk in entries:
+            with zf.open(name, "w", force_zip64=size > 1 << 30) as f:
+                for _ in range(size // len(chunk)):
+                    f.write(chunk)
+    return buf.getvalue()
+
+
+def disk_bytes(root):
+    return sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(root) for f in files)
+
+
+def unzip_legacy(archive, directory):
+    # What /deploy used to do: spool the upload, save it as source.zip, then extractall.
+    zip_path = os.path.join(directory, "source.zip")
+    spooled = tempfile.SpooledTemporaryFile(max_size=500 * 1024)
+    for i in range(0, len(archive), UPLOAD_CHUNK):
+        spooled.write(archive[i:i + UPLOAD_CHUNK])
+    spooled.seek(0)
+    with open(zip_path, "wb") as f:
+        shutil.copyfileobj(spooled, f)
+    spooled.close()
+    with zipfile.ZipFile(zip_path) as zf:
+        zf.extractall(os.path.join(directory, "code"))
+    peak_disk = disk_bytes(directory)
+    os.remove(zip_path)
+    return peak_disk
+
+
+def unzip_stream(archive, directory, args):
+    extractor = ZipStreamExtractor(os.path.join(directory, "code"), max_bytes=args.upload_max_mb * 1024 * 1024,
+                                   max_files=100_000, max_ratio=args.upload_max_ratio)
+    try:
+        for i in range(0, len(archive), UPLOAD_CHUNK):
+            extractor.write(archive[i:i + UPLOAD_CHUNK])
+        extractor.finish()
+        return disk_bytes(directory)
+    finally:
+        extractor.close()
+
+
+def bench_unzip(args):
+    """Wall time, peak Python memory and peak disk for zipfile vs. streaming extraction, plus a zip bomb."""
+    source = b"".join(f"def handler_{i}(event):\n    return {{'ok': {i}}}\n".encode() for i in range(40))
+    small_files = [(f"src/m{i // 100}/f{i}.py", len(source), source) for i in range(args.zip_files)]
+    # Each chunk starts with 16 KiB of random bytes, so deflate cannot just back-reference the last one.
+    large_file = [("data/blob.bin", args.zip_mb * 1024 * 1024, os.urandom(16 * 1024) + source * 12)]
+    cases = (
+        (f"{args.zip_files} small files", build_zip(small_files)),
+        (f"one {args.zip_mb} MiB file", build_zip(large_file)),
+    )
+    for title, archive in cases:
+        print_step(f"Upload extraction: {title}, {len(archive) / 1024 / 1024:.1f} MiB compressed")
+        for name, run in (("zipfile", lambda d: unzip_legacy(archive, d)),
+                          ("stream", lambda d: unzip_stream(archive, d, args))):
+            directory = tempfile.mkdtemp(prefix="unzip-bench-")
+            try:
+                tracemalloc.start()
+                started = time.perf_counter()
+                peak_disk = run(directory)
+                elapsed = time.perf_counter() - started
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                print(f"{name:>8}: {elapsed * 1000:>8.1f}ms  peak memory {peak / 1024:>8.0f} KiB  "
+                      f"peak disk {peak_disk / 1024 / 1024:>7.1f} MiB")
+            finally:
+                shutil.rmtree(directory, ignore_errors=True)
+
+    bomb = build_zip([("main.py", 1 << 30, bytes(1024 * 1024))])
+    print_step(f"Zip bomb: 1 GiB of zeros in {len(bomb) / 1024:.0f} KiB")
+    directory = tempfile.mkdtemp(prefix="unzip-bench-")
+    try:
+        started = time.perf_counter()
+        try:
+            unzip_stream(bomb, directory, args)
+            print("stream: not rejected")
+        except UploadRejected as e:
+            print(f"stream: rejected in {(time.perf_counter() - started) * 1000:.1f}ms ({e}), "
+                  f"{disk_bytes(directory)} bytes left on disk")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+# --- Bot registry ---
+def bench_registry(args):
+    """Startup-to-ready with N registered bots: open and load the registry, then reconcile one list call."""
+    print_step(f"Bot registry: {args.bots} bots")
+    directory = tempfile.mkdtemp(prefix="registry-bench-")
+    path = os.path.join(directory, "registry.sqlite3")
+    try:
+        registry = BotRegistry(path)
+        started = time.perf_counter()
+        registry.update_many({
+            f"bot{i}": {"runtime": "python", "entrypoint": "main.py", "content_hash": f"{i:064x}",
+                        "dep_hash": f"{i:064x}", "memory_mb": 128,
+                        "desired_state": "running" if i % 4 else "stopped", "container_id": f"c{i}",
+                        "exec_id": f"e{i}", "started_at": time.time()}
+            for i in range(args.bots)
+        })
+        print(f"populate (one transaction): {(time.perf_counter() - started) * 1000:.1f}ms")
+        started = time.perf_counter()
+        for i in range(min(args.bots, 1000)):
+            registry.update(f"bot{i}", exec_id=f"e{i}-2", started_at=time.time())
+        print(f"single-row update: {(time.perf_counter() - started) / min(args.bots, 1000) * 1e6:.0f}us each")
+        registry.close()
+
+        # What a list call returns: every bot but a few, some of them exited, plus one unregistered.
+        containers = {
+            f"bot{i}": {"Id": f"c{i}", "State": "exited" if i % 10 == 0 else "running", "Labels": {}}
+            for i in range(args.bots) if i % 100 != 1
+        }
+        containers["stray"] = {"Id": "stray", "State": "running", "Labels": {"botoralo.memory_mb": "256"}}
+        attached = []
+        started = time.perf_counter()
+        registry = BotRegistry(path)
+        report = registry.reconcile(containers, lambda bot_id, row: attached.append(bot_id), "botoralo.memory_mb")
+        elapsed = time.perf_counter() - started
+        registry.close()
+        print(f"load: {registry.load_ms:.1f}ms  reconcile: {report['duration_ms']:.1f}ms  "
+              f"startup-to-ready (excluding the Docker call): {elapsed * 1000:.1f}ms")
+        print({k: v for k, v in report.items() if k != "duration_ms"})
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+# --- Lifecycle admission ---
+def bench_admission(args):
+    """Simulated deploys through the weighted semaphore, and duplicate starts through the coordinator."""
+    capacity = args.capacity_units or host_capacity()
+    print_step(f"Admission: {args.deploys} deploys, capacity {capacity}, install {args.install_ms}ms x weight 2")
+    semaphore = WeightedSemaphore(capacity)
+
+    def deploy():
+        with semaphore.acquire(1, "create"):
+            time.sleep(args.install_ms / 10000)
+        with semaphore.acquire(2, "install"):
+            time.sleep(args.install_ms / 1000)
+
+    threads = [threading.Thread(target=deploy) for _ in range(args.deploys)]
+    peak_depth = 0
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    while any(thread.is_alive() for thread in threads):
+        peak_depth = max(peak_depth, semaphore.stats()["queue_depth"])
+        time.sleep(0.005)
+    elapsed = time.perf_counter() - started
+    print(f"all done in {elapsed:.2f}s, peak queue depth {peak_depth}")
+    for stage, stats in semaphore.stats()["stages"].items():
+        print(f"{stage:>8}: wait p50 {stats['wait_ms_p50']}ms p95 {stats['wait_ms_p95']}ms max {stats['wait_ms_max']}ms")
+
+    print_step(f"Coalescing: {args.deploys} concurrent starts of one bot")
+    coordinator = LifecycleCoordinator()
+    executions = []
+
+    def start_process():
+        executions.append(1)
+        time.sleep(0.05)
+        return "starting"
+
+    threads = [threading.Thread(target=coordinator.run, args=("bot", "start", start_process), kwargs={"coalesce": True})
+               for _ in range(args.deploys)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    print(f"executions: {len(executions)}, coalesced: {coordinator.stats()['coalesced']}")
+
+# --- Placement ---
+def first_fit(loads, memory_mb):
+    return next((load.name for load in loads if fits(load, memory_mb)), None)
+
+
+def least_loaded(loads, memory_mb):
+    feasible = [load for load in loads if fits(load, memory_mb)]
+    return min(feasible, key=lambda load: load.reserved_mb / load.capacity_mb).name if feasible else None
+
+
+def bench_placement(args):
+    """Bots placed per strategy until the first rejection, and the memory stranded across nodes at that point."""
+    rng = random.Random(1)
+    tiers = [128, 256, 512, 1024]
+    requests = [(rng.choice(tiers), rng.uniform(0.2, 0.6)) for _ in range(args.bots * 4)]
+    for overcommit in (1.0, 2.0):
+        print_step(f"Placement: {args.nodes} nodes x {args.node_mb} MB, overcommit {overcommit:g}")
+        for label, strategy in (("best-fit", choose_node), ("first-fit", first_fit), ("least-loaded", least_loaded)):
+            reserved = {f"n{i}": 0 for i in range(args.nodes)}
+            used = dict.fromkeys(reserved, 0.0)
+            placed = 0
+            started = time.perf_counter()
+            for memory_mb, usage in requests:
+                loads = [NodeLoad(name, args.node_mb, overcommit, reserved[name], used[name]) for name in reserved]
+                name = strategy(loads, memory_mb)
+                if name is None:
+                    break
+                reserved[name] += memory_mb
+                used[name] += memory_mb * usage
+                placed += 1
+            elapsed = time.perf_counter() - started
+            stranded = args.nodes * args.node_mb * overcommit - sum(reserved.values())
+            print(f"{label:>12}: {placed:6d} bots, {stranded:8.0f} MB stranded, "
+                  f"{elapsed / max(1, placed) * 1e6:.1f}us/decision")
+
+# --- Idle hibernation ---
+def bench_hibernation(args):
+    """Bots one host holds with hibernation off and on, then the cost of one idle sweep."""
+    rng = random.Random(1)
+    tiers = [128, 128, 128, 512, 1024]     # mostly free-tier bots
+    bots = [(rng.choice(tiers), rng.uniform(0.2, 0.6), rng.random() < args.idle_fraction) for _ in range(args.bots * 10)]
+    for overcommit in (2.0, 4.0):
+        print_step(f"Density: one {args.node_mb} MB host, overcommit {overcommit:g}, {args.idle_fraction:.0%} of bots idle")
+        for hibernate in (False, True):
+            reserved = used = 0.0
+            held = 0
+            for memory_mb, usage, idle in bots:
+                load = NodeLoad("host", args.node_mb, overcommit, reserved, used)
+                if not fits(load, memory_mb):
+                    break
+                reserved += memory_mb
+                # A hibernated (stopped) bot holds no memory until it wakes.
+                used += 0 if hibernate and idle else memory_mb * usage
+                held += 1
+            print(f"hibernation {'on ' if hibernate else 'off'}: {held:5d} bots, {used:8.0f} MB in use, "
+                  f"{reserved:8.0f} MB reserved")
+
+    print_step(f"Idle sweep over {args.bots} registered bots")
+    rows = {
+        f"bot-{i}": {"memory_mb": 128, "desired_state": "running", "hibernated": None}
+        for i in range(args.bots)
+    }
+    quiet = {"cpu_percent": 0.0, "net_rx_bps": 0.0, "net_tx_bps": 0.0}
+    hibernated = []
+    hibernator = IdleHibernator(
+        {128: ("stop", 3600)}, rows_fn=lambda: rows, usage_fn=lambda bot_id, window: quiet,
+        hibernate_fn=lambda bot_id, mode, idle: hibernated.append(bot_id) or True, busy_fn=lambda bot_id: False,
+    )
+    now = time.time()
+    hibernator.sweep(now)
+    for i in range(0, args.bots, 2):
+        hibernator.touch(f"bot-{i}", now + 3000)
+    started = time.perf_counter()
+    hibernator.sweep(now + 3700)
+    elapsed = time.perf_counter() - started
+    print(f"sweep: {elapsed * 1000:.1f}ms, {len(hibernated)} hibernated")
+
+# --- Metrics ---
+def bench_metrics(args):
+    """Cost of one histogram observation on a hot path, and of rendering a scrape with N bots."""
+    print_step("Histogram observe")
+    registry = MetricsRegistry()
+    histogram = registry.histogram("bench_seconds", "Bench.", ("route", "method", "status"))
+    n = 200_000
+    started = time.perf_counter()
+    for i in range(n):
+        histogram.observe(("/info", "POST", "200"), (i % 1000) / 10000)
+    elapsed = time.perf_counter() - started
+    print(f"observe: {elapsed / n * 1e9:.0f}ns")
+
+    print_step(f"Scrape with {args.bots} bots")
+    counts = {f"bot-{i}": i for i in range(args.bots)}
+    registry.collector(lambda: [
+        Family("bench_log_lines_total", "counter", "Bench.", [({"bot": bot_id}, n) for bot_id, n in counts.items()]),
+        Family("bench_log_bytes_total", "counter", "Bench.", [({"bot": bot_id}, n * 80) for bot_id, n in counts.items()]),
+    ])
+    started = time.perf_counter()
+    body = registry.render()
+    elapsed = time.perf_counter() - started
+    print(f"render: {elapsed * 1000:.1f}ms, {len(body) / 1024:.0f} KiB, {body.count(chr(10))} lines")
+
+BENCHMARKS = {
+    "broker": bench_broker,
+    "store": bench_store,
+    "archive": bench_archive,
+    "search": bench_search,
+    "governor": bench_governor,
+    "sse": bench_sse,
+    "framer": bench_framer,
+    "unzip": bench_unzip,
+    "registry": bench_registry,
+    "admission": bench_admission,
+    "placement": bench_placement,
+    "hibernation": bench_hibernation,
+    "metrics": bench_metrics,
+}
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Botoralo backend micro-benchmarks")
+    parser.add_argument("benchmark", choices=sorted(BENCHMARKS))
+    parser.add_argument("--lines", type=int, default=100_000)
+    parser.add_argument("--capacity", type=int, default=1000)
+    parser.add_argument("--subscribers", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--bytes", type=int, default=16 * 1024 * 1024, help="input size for the framer benchmark")
+    parser.add_argument("--sse-rates", type=int, nargs="+", default=[100, 2000, 20000], help="lines/s for the SSE benchmark")
+    parser.add_argument("--chunk-sizes", type=int, nargs="+", default=[64, 4096, 65536])
+    parser.add_argument("--line-lengths", type=int, nargs="+", default=[80, 4096, 1024 * 1024])
+    parser.add_argument("--zip-files", type=int, default=5000, help="entries in the many-files unzip case")
+    parser.add_argument("--zip-mb", type=int, default=64, help="size of the single-file unzip case")
+    parser.add_argument("--upload-max-mb", type=int, default=200)
+    parser.add_argument("--upload-max-ratio", type=float, default=100)
+    parser.add_argument("--bots", type=int, default=1000, help="registered bots for the registry benchmark")
+    parser.add_argument("--deploys", type=int, default=32, help="concurrent deploys for the admission benchmark")
+    parser.add_argument("--install-ms", type=int, default=200)
+    parser.add_argument("--capacity-units", type=int, default=0, help="admission capacity (0 = sized to this host)")
+    parser.add_argument("--nodes", type=int, default=4, help="Docker nodes for the placement benchmark")
+    parser.add_argument("--node-mb", type=int, default=16384)
+    parser.add_argument("--idle-fraction", type=float, default=0.6, help="share of bots idle past their window")
+    args = parser.parse_args()
+    BENCHMARKS[args.benchmark](args)
@@ -1,20 +1,45 @@
 import os
 import sys
+import re
 import json
+import queue
 import tempfile
 import shutil
-import zipfile
 import traceback
 import threading
 import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from functools import wraps, lru_cache
-from flask import Flask, request, jsonify, Response, stream_with_context
+from flask import Flask, Request, request, jsonify, Response, stream_with_context
 import docker
 from dotenv import load_dotenv
-from queue import Queue, Empty
-from collections import deque, defaultdict
 import logging
 from logging.config import dictConfig
+from deploy_jobs import DeployQueue, DeployQueueFull
+from log_broker import LogBroker
+from log_store import LogStore, codec_available, empty_archive
+from log_index import LEVELS, LogIndex
+from line_framer import DemuxFramer, LineFramer
+from log_follower import LogFollowerHub
+from log_governor import LogGovernor, parse_rate_policy
+from sse_framing import SseFraming, parse_framing
+from deps_cache import DepsImageCache, dependency_manifest_hash
+from code_manifest import (ManifestStore, apply_delta, build_manifest, file_sha256, manifest_digest,
+                           missing_on_disk, safe_relpath, validate_manifest)
+from package_cache import PackageCache
+from upload_extract import ZipStreamExtractor
+from warm_pool import WarmPool
+from resource_sampler import ResourceSampler
+from container_index import ContainerIndex
+from bot_registry import BotRegistry
+from lifecycle import LifecycleCoordinator, WeightedSemaphore, host_capacity
+from placement import Placement, load_nodes
+from hibernation import IdleHibernator, parse_policy
+from metrics import Family, HealthProber, MetricsRegistry, instrument_docker
+from shared_runtime import (DENSITY_MODES, LAUNCH_SCRIPT, PREPARE_SCRIPT, READ_SCRIPT, RUNTIME_LABEL,
+                            RUNTIME_NAME_PREFIX, STOP_SCRIPT, SharedRuntimes, bot_dir, bot_env, code_archive,
+                            group_key, parse_readings, runtime_pids_limit)
 
 # --- Logging Setup ---
 dictConfig({
@@ -26,21 +51,164 @@ dictConfig({
 
 load_dotenv()
 
-log_buffers = {}       # bot_id -> Queue()
-log_history = {}       # bot_id -> deque(maxlen=100)
-active_connections = defaultdict(int)
+log_brokers = {}       # bot_id -> LogBroker
+log_brokers_lock = threading.Lock()
+log_stores = {}        # bot_id -> LogStore
+log_stores_lock = threading.Lock()
+log_archive_queue = queue.Queue()    # LogStores with sealed segments to compress
+log_indexes = {}       # bot_id -> LogIndex over its LogStore, guarded by log_stores_lock
+log_governors = {}     # (bot_id, "capture" | "follower") -> LogGovernor
+log_governors_lock = threading.Lock()
 
 MASTER_BACKEND_KEY = os.getenv("MASTER_BACKEND_KEY")
 BOTS_DIR = os.getenv("BOTS_DIR", os.path.join(tempfile.gettempdir(), "botoralo_bots"))
 BOT_IMAGE = os.getenv("BOT_IMAGE", "bot_runtime:latest")
 FLASK_HOST = os.getenv("FLASK_HOST", "0.0.0.0")
 FLASK_PORT = int(os.getenv("FLASK_PORT", "5000"))
+DOCKER_NODES = os.getenv("DOCKER_NODES", "")     # JSON list of nodes, or a path to one; empty = local daemon only
+NODE_OVERCOMMIT = float(os.getenv("NODE_OVERCOMMIT", "2.0"))     # memory limits per node, as a multiple of its RAM
+ASYNC_LOG_PORT = int(os.getenv("ASYNC_LOG_PORT", "0"))     # 0 = log streams stay on Flask only
+LOG_BUFFER_LINES = int(os.getenv("LOG_BUFFER_LINES", "1000"))
+LOG_REPLAY_LINES = 100
+LOG_MAX_LINE_BYTES = int(os.getenv("LOG_MAX_LINE_BYTES", "16384"))
+LOG_FOLLOW_LINGER = float(os.getenv("LOG_FOLLOW_LINGER", "5"))
+SSE_BATCH_MS = int(os.getenv("SSE_BATCH_MS", "50"))     # "framing": "batch" streams: lines per event window...
+SSE_BATCH_BYTES = int(os.getenv("SSE_BATCH_BYTES", "65536"))     # ...and the size that starts a new event
+REATTACH_POLL_INTERVAL = float(os.getenv("REATTACH_POLL_INTERVAL", "5"))
+LOG_CAPTURE_DRAIN = 1.0     # seconds the container log is still followed after a dedicated bot's exec ends
+LOG_SEGMENT_MB = int(os.getenv("LOG_SEGMENT_MB", "4"))
+LOG_RETENTION_MB = int(os.getenv("LOG_RETENTION_MB", "64"))
+LOG_RETENTION_HOURS = float(os.getenv("LOG_RETENTION_HOURS", "72"))
+LOG_ARCHIVE_CODEC = os.getenv("LOG_ARCHIVE_CODEC", "gzip")     # sealed segments: gzip, zstd (needs zstandard) or none
+if LOG_ARCHIVE_CODEC != "none" and not codec_available(LOG_ARCHIVE_CODEC):
+    raise ValueError(f"LOG_ARCHIVE_CODEC {LOG_ARCHIVE_CODEC!r} is unknown or its module isn't installed")
+LOG_ARCHIVE_LEVEL = int(os.getenv("LOG_ARCHIVE_LEVEL", "0"))     # 0 = the codec's default
+# Docker's own json-file log, which /logs follows: rotated, older files gzipped by the daemon.
+CONTAINER_LOG_CONFIG = {"type": "json-file", "config": {
+    "max-size": f"{int(os.getenv('CONTAINER_LOG_MAX_MB', '10'))}m",
+    "max-file": os.getenv("CONTAINER_LOG_FILES", "3"),
+    "compress": "true",
+}}
+LOG_RATE_LIMIT = os.getenv("LOG_RATE_LIMIT", "500:131072")     # "<lines/s>:<bytes/s>" per bot; "0:0" = unlimited
+LOG_RATE_POLICY = parse_rate_policy(os.getenv("LOG_RATE_POLICY", ""))     # "<tier>=<lines/s>:<bytes/s>,..." overrides per plan
+LOG_RATE_DEFAULT = parse_rate_policy(f"0={LOG_RATE_LIMIT}")[0]
+LOG_RATE_BURST_SECONDS = float(os.getenv("LOG_RATE_BURST_SECONDS", "2"))
+LOG_SAMPLE_EVERY = int(os.getenv("LOG_SAMPLE_EVERY", "100"))     # over the limit, 1 line in N is still kept
+if LOG_SAMPLE_EVERY < 1:
+    raise ValueError("LOG_SAMPLE_EVERY must be at least 1")
+LOG_READ_FACTOR = float(os.getenv("LOG_READ_FACTOR", "4"))     # readers block past this multiple of the bytes/s limit
+DEPLOY_WORKERS = int(os.getenv("DEPLOY_WORKERS", str(os.cpu_count() or 1)))
+DEPLOY_MAX_PENDING = int(os.getenv("DEPLOY_MAX_PENDING", str(DEPLOY_WORKERS * 4)))
+STAGING_DIR = os.path.join(BOTS_DIR, ".staging")
+LOG_STORE_DIR = os.path.join(BOTS_DIR, ".logs")
+MANIFEST_DIR = os.path.join(BOTS_DIR, ".manifests")
+REGISTRY_PATH = os.path.join(BOTS_DIR, ".registry.sqlite3")
+DEPS_CACHE_BUDGET_MB = int(os.getenv("DEPS_CACHE_BUDGET_MB", "10240"))
+PACKAGE_CACHE_DIR = os.getenv("PACKAGE_CACHE_DIR", os.path.join(BOTS_DIR, ".pkgcache"))
+PACKAGE_CACHE_BUDGET_MB = int(os.getenv("PACKAGE_CACHE_BUDGET_MB", "5120"))
+WARM_POOL_SIZE = int(os.getenv("WARM_POOL_SIZE", "2"))
+WARM_POOL_TIERS = [int(t) for t in os.getenv("WARM_POOL_TIERS", "128,256,512").split(",") if t.strip()]
+BATCH_MAX_BOTS = int(os.getenv("BATCH_MAX_BOTS", "200"))
+STATS_WORKERS = int(os.getenv("STATS_WORKERS", "16"))
+SAMPLER_INTERVAL = float(os.getenv("SAMPLER_INTERVAL", "5"))
+SAMPLER_HISTORY = int(os.getenv("SAMPLER_HISTORY", "720"))     # samples kept per bot
+ADMISSION_MB_PER_UNIT = int(os.getenv("ADMISSION_MB_PER_UNIT", "1024"))
+ADMISSION_CAPACITY = int(os.getenv("ADMISSION_CAPACITY", "0")) or host_capacity(ADMISSION_MB_PER_UNIT)
+ADMISSION_TIMEOUT = float(os.getenv("ADMISSION_TIMEOUT", "600"))
+INSTALL_WEIGHT = int(os.getenv("INSTALL_WEIGHT", "2"))
+CREATE_WEIGHT = int(os.getenv("CREATE_WEIGHT", "1"))
+UPLOAD_MAX_MB = int(os.getenv("UPLOAD_MAX_MB", "200"))          # extracted size of one code_zip
+UPLOAD_MAX_FILES = int(os.getenv("UPLOAD_MAX_FILES", "10000"))
+UPLOAD_MAX_RATIO = float(os.getenv("UPLOAD_MAX_RATIO", "100"))
+HIBERNATE_POLICY = parse_policy(os.getenv("HIBERNATE_POLICY", ""))     # "<tier>=<pause|stop>:<idle s>,..."; empty = never
+HIBERNATE_CHECK_INTERVAL = float(os.getenv("HIBERNATE_CHECK_INTERVAL", "60"))
+HIBERNATE_CPU_PERCENT = float(os.getenv("HIBERNATE_CPU_PERCENT", "1.0"))     # at or above = active
+HIBERNATE_NET_BPS = float(os.getenv("HIBERNATE_NET_BPS", "1024"))         # rx + tx, at or above = active
+HEALTH_PROBE_INTERVAL = float(os.getenv("HEALTH_PROBE_INTERVAL", "5"))
+DENSITY_MODE = os.getenv("DENSITY_MODE", "dedicated")     # for deploys that don't set "density"
+if DENSITY_MODE not in DENSITY_MODES:
+    raise ValueError(f"Invalid DENSITY_MODE {DENSITY_MODE!r}, expected one of {', '.join(DENSITY_MODES)}")
+SHARED_RUNTIME_MAX_BOTS = int(os.getenv("SHARED_RUNTIME_MAX_BOTS", "16"))
+SHARED_RUNTIME_MEMORY_MB = int(os.getenv("SHARED_RUNTIME_MEMORY_MB", "1024"))     # the whole runtime container
+SHARED_RUNTIME_BOT_PIDS = int(os.getenv("SHARED_RUNTIME_BOT_PIDS", "64"))
 
 os.makedirs(BOTS_DIR, exist_ok=True)
+os.makedirs(STAGING_DIR, exist_ok=True)
+
+# Histograms are observed inline; everything else is read from existing state when /metrics is scraped.
+metrics = MetricsRegistry()
+request_seconds = metrics.histogram(
+    "botoralo_http_request_duration_seconds", "Time to the response headers, per route.", ("route", "method", "status"))
+docker_seconds = metrics.histogram(
+    "botoralo_docker_request_duration_seconds", "Docker Engine API call latency.", ("node", "operation"))
+deploy_stage_seconds = metrics.histogram(
+    "botoralo_deploy_stage_duration_seconds", "Deploy stage durations.", ("stage", "status"))
+
+deploy_queue = DeployQueue(
+    max_workers=DEPLOY_WORKERS, max_pending=DEPLOY_MAX_PENDING,
+    on_stage_end=lambda stage, status, seconds: deploy_stage_seconds.observe((stage, status), seconds),
+)
+# Container creation and dependency installs share the host through `admission`;
+# lifecycle operations on one bot never overlap.
+admission = WeightedSemaphore(ADMISSION_CAPACITY)
+lifecycle = LifecycleCoordinator()
+
+# Every Docker daemon bots can be placed on. The first is primary: the warm pool and the
+# package cache helper run there, and docker_client/docker_api refer to it.
+nodes = load_nodes(
+    DOCKER_NODES, docker.from_env(), docker.APIClient(base_url='unix://var/run/docker.sock'),
+    overcommit=NODE_OVERCOMMIT,
+)
+primary_node = next(iter(nodes.values()))
+docker_client = primary_node.client
+docker_api = primary_node.api
+for _node in nodes.values():
+    # A local node has a high-level client and a separate APIClient; time both.
+    for _api in {id(api): api for api in (_node.api, _node.client.api)}.values():
+        instrument_docker(_api, docker_seconds, _node.name)
+
+class BotoraloRequest(Request):
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        # A deploy's code_zip is unpacked while the body is parsed instead of being spooled to a temp file.
+        if self.endpoint == "deploy_bot" and filename and filename.lower().endswith(".zip"):
+            return ZipStreamExtractor(
+                os.path.join(STAGING_DIR, f"upload-{uuid.uuid4().hex}"),
+                max_bytes=UPLOAD_MAX_MB * 1024 * 1024,
+                max_files=UPLOAD_MAX_FILES,
+                max_ratio=UPLOAD_MAX_RATIO,
+            )
+        return super()._get_file_stream(total_content_length, content_type, filename, content_length)
 
-docker_client = docker.from_env()
-docker_api = docker.APIClient(base_url='unix://var/run/docker.sock')
 app = Flask(__name__)
+app.request_class = BotoraloRequest
+
+@app.before_request
+def _start_request_timer():
+    request.started_at = time.perf_counter()
+
+@app.after_request
+def _observe_request(response):
+    # Streaming responses (SSE) are timed to their headers, not to the end of the stream.
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    request_seconds.observe((route, request.method, str(response.status_code)),
+                            time.perf_counter() - request.started_at)
+    return response
+
+stats_executor = ThreadPoolExecutor(max_workers=STATS_WORKERS, thread_name_prefix="stats")
+for _node in nodes.values():
+    # Images and containers are per daemon, so each node gets its own deps cache and index.
+    _node.deps_cache = DepsImageCache(
+        _node.client,
+        index_path=os.path.join(
+            BOTS_DIR, ".deps_cache.json" if _node is primary_node else f".deps_cache-{_node.name}.json"),
+        budget_bytes=DEPS_CACHE_BUDGET_MB * 1024 * 1024,
+    )
+package_cache = PackageCache(
+    docker_client,
+    root=PACKAGE_CACHE_DIR,
+    image=BOT_IMAGE,
+    budget_bytes=PACKAGE_CACHE_BUDGET_MB * 1024 * 1024,
+)
 
 def require_master_key(f):
     @wraps(f)
@@ -83,45 +251,145 @@ def parse_json_body(required_fields=None):
         return inner
     return decorator
 
+CONTAINER_NAME_PREFIX = "botoralo-bot-"
+MEMORY_LABEL = "botoralo.memory_mb"
+# Bot ids become container names, host paths and arguments of root scripts in shared runtimes.
+BOT_ID_RE = re.compile(r"[A-Za-z0-9][A-Za-z0-9_.-]{0,127}")
+BOT_ID_ERROR = "'botoraloBotId' must be 1-128 letters, digits, '_', '.' or '-', starting with a letter or digit"
+
 def get_container_name(bot_id):
-    return f"botoralo-bot-{bot_id}"
+    return f"{CONTAINER_NAME_PREFIX}{bot_id}"
+
+def get_log_broker(bot_id):
+    with log_brokers_lock:
+        broker = log_brokers.get(bot_id)
+        if broker is None:
+            broker = log_brokers[bot_id] = LogBroker(LOG_BUFFER_LINES)
+        return broker
+
+def get_log_store(bot_id):
+    with log_stores_lock:
+        store = log_stores.get(bot_id)
+        if store is None:
+            store = log_stores[bot_id] = LogStore(
+                os.path.join(LOG_STORE_DIR, str(bot_id)),
+                segment_bytes=LOG_SEGMENT_MB * 1024 * 1024,
+                retention_bytes=LOG_RETENTION_MB * 1024 * 1024,
+                retention_seconds=LOG_RETENTION_HOURS * 3600,
+                on_seal=log_archive_queue.put if LOG_ARCHIVE_CODEC != "none" else None,
+            )
+        return store
+
+def get_log_index(bot_id):
+    store = get_log_store(bot_id)
+    with log_stores_lock:
+        index = log_indexes.get(bot_id)
+        if index is None:
+            index = log_indexes[bot_id] = LogIndex(store)
+            # History from before a restart is indexed in the background; new lines go in as published.
+            threading.Thread(target=index.catch_up, name=f"log-index-{bot_id}", daemon=True).start()
+        return index
+
+def get_log_governor(bot_id, source):
+    # Limits follow the bot's plan tier, re-read whenever a reader (re)starts.
+    row = bot_registry.get(bot_id)
+    lines_per_s, bytes_per_s = LOG_RATE_POLICY.get((row and row["memory_mb"]) or 128, LOG_RATE_DEFAULT)
+    with log_governors_lock:
+        governor = log_governors.get((bot_id, source))
+        if governor is None:
+            governor = log_governors[(bot_id, source)] = LogGovernor(
+                lines_per_s, bytes_per_s, burst_seconds=LOG_RATE_BURST_SECONDS,
+                sample_every=LOG_SAMPLE_EVERY, read_factor=LOG_READ_FACTOR)
+        elif (governor.lines_per_s, governor.bytes_per_s) != (lines_per_s, bytes_per_s):
+            governor.configure(lines_per_s, bytes_per_s, LOG_RATE_BURST_SECONDS)
+        return governor
+
+def publish_log(bot_id, line):
+    hibernator.touch(bot_id)
+    get_log_broker(bot_id).publish(line)
+    seq = get_log_store(bot_id).append(line)
+    get_log_index(bot_id).add(seq, line)
 
 def get_bot_code_dir(bot_id):
     return os.path.join(BOTS_DIR, str(bot_id))
 
+for _node in nodes.values():
+    _node.index = ContainerIndex(_node.api, CONTAINER_NAME_PREFIX)
+manifest_store = ManifestStore(MANIFEST_DIR)
+bot_registry = BotRegistry(REGISTRY_PATH)
+placement = Placement(nodes, bot_registry, usage_fn=lambda bot_id: _observed_memory_mb(bot_id))
+
+def _indexes_ready():
+    return all(node.index.ready for node in nodes.values())
+
 def get_container(bot_id):
+    # The returned model is bound to the client of the bot's node, so calls on it go there.
+    node = placement.node_of(bot_id)
+    if node.index.ready:
+        state = node.index.get(get_container_name(bot_id))
+        if state:
+            # Built from the index instead of an inspect; only Id, Name and status are populated.
+            return node.client.containers.prepare_model(
+                {"Id": state.id, "Name": f"/{state.name}", "State": {"Status": state.status}}
+            )
+        # Not indexed yet (the create event may still be in flight), so ask Docker.
     try:
-        return docker_client.containers.get(get_container_name(bot_id))
+        return node.client.containers.get(get_container_name(bot_id))
     except docker.errors.NotFound:
         return None
 
 def save_bot_code(bot_code_dir, files):
+    # Returns the upload report ({} for plain files) for the job's upload stage.
     app.logger.info(f"Saving code to {bot_code_dir}")
-    os.makedirs(bot_code_dir, exist_ok=True)
     zip_file = files.get("code_zip")
     if zip_file and zip_file.filename:
-        if not zip_file.filename.endswith(".zip"):
+        if not zip_file.filename.lower().endswith(".zip") or not isinstance(zip_file.stream, ZipStreamExtractor):
             raise ValueError("Uploaded archive must be a .zip file.")
-        zip_path = os.path.join(bot_code_dir, "source.zip")
-        zip_file.save(zip_path)
-        with zipfile.ZipFile(zip_path, "r") as zf:
-            zf.extractall(bot_code_dir)
-        os.remove(zip_path)
-        return
+        # Already extracted by BotoraloRequest; raises UploadRejected (a ValueError) if it was refused.
+        report = zip_file.stream.finish()
+        os.rename(zip_file.stream.directory, bot_code_dir)
+        return report
+    os.makedirs(bot_code_dir, exist_ok=True)
     uploaded_files = files.getlist("code")
     if not uploaded_files or not uploaded_files[0].filename:
         raise ValueError("No code files were provided.")
     if len(uploaded_files) == 1:
         f = uploaded_files[0]
         f.save(os.path.join(bot_code_dir, f.filename))
-        return
+        return {"files": 1}
     for f in uploaded_files:
         save_path = os.path.join(bot_code_dir, f.filename)
         os.makedirs(os.path.dirname(save_path), exist_ok=True)
         f.save(save_path)
+    return {"files": len(uploaded_files)}
+
+def save_delta_files(staging_dir, files, manifest):
+    # Delta deploys upload only changed files, named by their path relative to the bot root.
+    uploaded = set()
+    for f in files.getlist("code"):
+        if not f.filename:
+            continue
+        relpath = safe_relpath(f.filename)
+        if relpath not in manifest:
+            raise ValueError(f"Uploaded file {relpath} is not in the manifest.")
+        save_path = os.path.join(staging_dir, *relpath.split("/"))
+        os.makedirs(os.path.dirname(save_path), exist_ok=True)
+        f.save(save_path)
+        if file_sha256(save_path) != manifest[relpath]:
+            raise ValueError(f"Uploaded file {relpath} does not match its manifest hash.")
+        uploaded.add(relpath)
+    os.makedirs(staging_dir, exist_ok=True)
+    return uploaded
+
+def extract_bot_code(staging_dir, bot_code_dir):
+    # Moves a staged upload into place (zips are already unpacked during upload).
+    if os.path.exists(bot_code_dir):
+        shutil.rmtree(bot_code_dir)
+    shutil.move(staging_dir, bot_code_dir)
 
 @lru_cache(maxsize=256)
-def detect_runtime_and_entrypoint_cached(bot_code_dir: str):
+def detect_runtime_and_entrypoint_cached(bot_code_dir: str, content_hash: str):
+    # Keyed by the code's manifest digest as well as its path, so a redeploy to the same path misses.
     files = os.listdir(bot_code_dir)
     lower_files = [f.lower() for f in files]
     package_json = os.path.join(bot_code_dir, "package.json")
@@ -145,81 +413,525 @@ def detect_runtime_and_entrypoint_cached(bot_code_dir: str):
             return "node", f
     raise RuntimeError("Could not determine runtime or entrypoint.")
 
+def detect_runtime_and_entrypoint(bot_id):
+    bot_code_dir = get_bot_code_dir(bot_id)
+    content_hash = manifest_store.digest(bot_id)
+    row = bot_registry.get(bot_id)
+    if content_hash and row and row["runtime"] and row["content_hash"] == content_hash:
+        # Recorded at deploy time, so this survives a backend restart without a directory walk.
+        return row["runtime"], row["entrypoint"]
+    if content_hash is None:
+        # No manifest recorded for this code, so nothing to key a cache entry on.
+        return detect_runtime_and_entrypoint_cached.__wrapped__(bot_code_dir, None)
+    return detect_runtime_and_entrypoint_cached(bot_code_dir, content_hash)
+
 def _start_bot_process(botoralo_bot_id: str):
-    q = log_buffers.setdefault(botoralo_bot_id, Queue())
-    history = log_history.setdefault(botoralo_bot_id, deque(maxlen=100))
-    container = get_container(botoralo_bot_id)
+    _detach_log_capture(botoralo_bot_id)
+    # A new process: its first line isn't a repeat of the old one's last.
+    for line in get_log_governor(botoralo_bot_id, "capture").reset():
+        publish_log(botoralo_bot_id, line)
+    hibernator.touch(botoralo_bot_id)
+    get_log_broker(botoralo_bot_id).mark_run()
+    row = bot_registry.get(botoralo_bot_id)
+    shared = row["shared_runtime"] if row else None
+    node = placement.node_of(botoralo_bot_id)
+    container = _runtime_container(shared, node) if shared else get_container(botoralo_bot_id)
     if not container:
-        q.put(f"[error] Container for bot {botoralo_bot_id} not found")
-        history.append(f"[error] Container for bot {botoralo_bot_id} not found")
+        publish_log(botoralo_bot_id, f"[error] Container for bot {botoralo_bot_id} not found")
         return
     try:
-        runtime, entrypoint = detect_runtime_and_entrypoint_cached(get_bot_code_dir(botoralo_bot_id))
+        runtime, entrypoint = detect_runtime_and_entrypoint(botoralo_bot_id)
     except Exception as e:
-        q.put(f"[error] Failed to detect runtime: {e}")
-        history.append(f"[error] Failed to detect runtime: {e}")
+        publish_log(botoralo_bot_id, f"[error] Failed to detect runtime: {e}")
         return
-    if runtime == "python":
+    api = node.api
+    container_name, workdir, user = get_container_name(botoralo_bot_id), "/bot", "1000:1000"
+    if shared:
+        # Its output stays on the exec stream: the runtime's container log is shared by every bot in it.
+        container_name, workdir, user = shared, f"{bot_dir(botoralo_bot_id)}/code", "0:0"
+        memory_mb = row["memory_mb"] or 128
+        interpreter = ["python", "-u"] if runtime == "python" else ["node"]
+        cmd = ["bash", "-c", LAUNCH_SCRIPT, "launch", botoralo_bot_id, str(memory_mb), str(SHARED_RUNTIME_BOT_PIDS),
+               *interpreter, f"{workdir}/{entrypoint}"]
+        env = bot_env(runtime, memory_mb, f"{bot_dir(botoralo_bot_id)}/deps")
+    elif runtime == "python":
         cmd = ["bash", "-lc", f"python -u /bot/{entrypoint} > /proc/1/fd/1 2>&1"]
-        # cmd = ["bash", "-lc", f"{install_cmd} > /proc/1/fd/1 2>&1"],
         env = {"PYTHONUNBUFFERED": "1"}
     else:
         cmd = ["bash", "-lc", f"node /bot/{entrypoint} > /proc/1/fd/1 2>&1"]
         env = {"FORCE_COLOR": "1"}
     try:
-        exec_obj = docker_api.exec_create(
-            container=get_container_name(botoralo_bot_id),
+        started_at = time.time()
+        exec_obj = api.exec_create(
+            container=container_name,
             cmd=cmd,
-            workdir="/bot",
-            user="1000:1000",
+            workdir=workdir,
+            user=user,
             tty=True,
             stderr=True,
             stdout=True,
             environment=env
         )
         exec_id = exec_obj.get("Id")
-        stream = docker_api.exec_start(exec_id, stream=True, demux=True)
+        stream = api.exec_start(exec_id, stream=True, demux=True)
+        bot_registry.update(botoralo_bot_id, exec_id=exec_id, started_at=started_at)
+        # A dedicated bot's exec stream stays empty; its output is read back from the container log.
+        capture = None if shared else _attach_log_capture(botoralo_bot_id, lambda: started_at)
 
         def stream_logs():
+            framer = DemuxFramer(LOG_MAX_LINE_BYTES)
+            governor = get_log_governor(botoralo_bot_id, "capture")
+            def publish_lines(lines):
+                for line in lines:
+                    text = line.text.strip()
+                    if text:
+                        suffix = " [truncated]" if line.truncated else ""
+                        for admitted in governor.admit(f"[{line.stream}] {text}{suffix}"):
+                            publish_log(botoralo_bot_id, admitted)
             try:
-                stdout_buf, stderr_buf = "", ""
-                
                 for stdout, stderr in stream:
-                    if stdout:
-                        stdout_buf += stdout.decode("utf-8", errors="replace")
-                        while "\n" in stdout_buf:
-                            line, stdout_buf = stdout_buf.split("\n", 1)
-                            line = line.strip()
-                            if line:
-                                q.put(f"[stdout] {line}")
-                                history.append(f"[stdout] {line}")
-                    if stderr:
-                        stderr_buf += stderr.decode("utf-8", errors="replace")
-                        while "\n" in stderr_buf:
-                            line, stderr_buf = stderr_buf.split("\n", 1)
-                            line = line.strip()
-                            if line:
-                                q.put(f"[stderr] {line}")
-                                history.append(f"[stderr] {line}")
+                    publish_lines(framer.feed(stdout, stderr))
+                    # For a shared-mode bot, not reading is the backpressure: the pty fills and its
+                    # writes block. A dedicated bot's exec stream carries nothing; see _attach_log_capture.
+                    delay = governor.read_delay(len(stdout or b"") + len(stderr or b""))
+                    if delay:
+                        time.sleep(delay)
+                publish_lines(framer.flush())
+                for admitted in governor.flush():
+                    publish_log(botoralo_bot_id, admitted)
 
             except Exception as e:
                 msg = f"[error] Stream error: {e}"
-                q.put(msg)
-                history.append(msg)
+                publish_log(botoralo_bot_id, msg)
             finally:
+                if capture is not None:
+                    # Docker may not have passed the last lines to the log yet.
+                    time.sleep(LOG_CAPTURE_DRAIN)
+                    _detach_log_capture(botoralo_bot_id, capture)
                 try:
-                    info = docker_api.exec_inspect(exec_id)
+                    info = api.exec_inspect(exec_id)
                     exit_code = info.get("ExitCode")
                     msg = f"[info] process exited with code {exit_code}"
-                    q.put(msg)
-                    history.append(msg)
+                    publish_log(botoralo_bot_id, msg)
                 except Exception:
                     pass
         threading.Thread(target=stream_logs, daemon=True).start()
     except Exception as e:
         msg = f"[error] Failed to start exec: {e}"
-        q.put(msg)
-        history.append(msg)
+        publish_log(botoralo_bot_id, msg)
+
+def _create_bot_container(image, name, memory_mb, bot_code_dir, labels=None, node=None):
+    container = (node or primary_node).client.containers.create(
+        image,
+        command=["bash", "-c", "tail -f /dev/null"],
+        name=name,
+        detach=True,
+        mem_limit=f"{memory_mb}m",
+        network_mode='bridge',
+        log_config=CONTAINER_LOG_CONFIG,
+        volumes={bot_code_dir: {'bind': '/bot', 'mode': 'rw'}, **package_cache.volumes()},
+        working_dir='/bot',
+        read_only=False,
+        tty=True,
+        user='1000:1000',
+        labels={MEMORY_LABEL: str(memory_mb), **(labels or {})},
+    )
+    container.start()
+    return container
+
+def _create_pool_container(name, memory_mb, code_dir, labels):
+    with admission.acquire(CREATE_WEIGHT, "create", ADMISSION_TIMEOUT):
+        return _create_bot_container(BOT_IMAGE, name, memory_mb, code_dir, labels)
+
+warm_pool = WarmPool(
+    docker_client,
+    create_fn=lambda name, memory_mb, code_dir, labels: _create_pool_container(name, memory_mb, code_dir, labels),
+    pool_dir=os.path.join(BOTS_DIR, ".pool"),
+    tiers=WARM_POOL_TIERS,
+    size=WARM_POOL_SIZE,
+)
+
+# Node modules live in the image layer (DEPS_DIR) rather than the /bot bind mount,
+# so that committing the post-install container captures them.
+DEPS_DIR = "/deps"
+
+def _exec_install(container, cmd, workdir="/bot"):
+    exit_code, output = container.exec_run(
+        cmd=["bash", "-lc", f"{cmd} > /proc/1/fd/1 2>&1"],
+        workdir=workdir,
+        user="1000:1000",
+    )
+    return exit_code == 0
+
+def _install_dependencies(container, runtime, bot_code_dir, workdir="/bot", deps_dir=DEPS_DIR, isolated=False):
+    # Resolve from the shared package cache first; on a miss let the helper
+    # container fill it and retry, and only then fall back to a plain online install.
+    # `isolated` keeps Python packages in deps_dir too, for bots sharing a runtime container.
+    if runtime == "node":
+        container.exec_run(cmd=["bash", "-c", 'mkdir -p "$1" && chown 1000:1000 "$1"', "mkdir", deps_dir],
+                           user="0:0")
+        container.exec_run(
+            cmd=["bash", "-c", '[ ! -f package.json ] || cp package.json "$1/"; '
+                               '[ ! -f package-lock.json ] || cp package-lock.json "$1/"', "copy", deps_dir],
+            workdir=workdir,
+            user="1000:1000",
+        )
+    started_at = time.time()
+    install_cmd = package_cache.install_cmd(runtime, deps_dir, isolated)
+    if not _exec_install(container, install_cmd, workdir):
+        if not (package_cache.fill(runtime, bot_code_dir) and _exec_install(container, install_cmd, workdir)):
+            if not _exec_install(container, package_cache.fallback_cmd(runtime, deps_dir, isolated), workdir):
+                raise RuntimeError("Dependency installation failed.")
+            _link_node_modules(container, runtime, workdir, deps_dir)
+            return {"package_cache": "bypassed"}
+    _link_node_modules(container, runtime, workdir, deps_dir)
+    return package_cache.record_install(container, runtime, deps_dir, started_at, isolated)
+
+def _link_node_modules(container, runtime, workdir="/bot", deps_dir=DEPS_DIR):
+    if runtime != "node":
+        return
+    container.exec_run(
+        cmd=["bash", "-c", '[ -e node_modules ] || ln -s "$1/node_modules" node_modules', "link", deps_dir],
+        workdir=workdir,
+        user="1000:1000",
+    )
+
+def _container_memory_mb(bot_id, container):
+    state = placement.node_of(bot_id).index.get(get_container_name(bot_id))
+    labels = state.labels if state else container.labels
+    return labels.get(MEMORY_LABEL)
+
+def _restart_bot_process(bot_id, container, auto_start):
+    # Restarting the container ends the old exec'd process but keeps its
+    # filesystem, so installed dependencies survive.
+    if auto_start:
+        container.restart(timeout=5)
+        _start_bot_process(bot_id)
+    elif container.status == "running":
+        container.stop(timeout=10)
+
+def _register_deploy(bot_id, runtime, entrypoint, manifest, dep_hash, memory_mb, auto_start, container_id,
+                     shared_runtime=None):
+    bot_registry.update(
+        bot_id,
+        runtime=runtime,
+        entrypoint=entrypoint,
+        content_hash=manifest_digest(manifest),
+        dep_hash=dep_hash,
+        memory_mb=memory_mb,
+        desired_state="running" if auto_start else "stopped",
+        container_id=container_id,
+        exec_id=None,
+        hibernated=None,
+        hibernated_mb=None,
+        shared_runtime=shared_runtime,
+    )
+
+# --- Shared runtimes ---
+# In shared (high-density) mode a bot is a process in its tenant group's runtime container
+# rather than a container of its own: code and dependencies under /bots/<bot_id>, its
+# process group id in /run/botoralo. The registry's `shared_runtime` column names the container.
+shared_runtimes = SharedRuntimes(bot_registry, max_bots=SHARED_RUNTIME_MAX_BOTS)
+
+def _shared_runtime_of(bot_id):
+    row = bot_registry.get(bot_id)
+    return row["shared_runtime"] if row else None
+
+def _runtime_container(name, node):
+    try:
+        return node.client.containers.get(name)
+    except docker.errors.NotFound:
+        return None
+
+def _runtime_exec(node, name, cmd):
+    # As root: the scripts manage other users' processes, cgroups and pid files.
+    exec_id = node.api.exec_create(name, cmd, user="0:0")["Id"]
+    return node.api.exec_start(exec_id).decode(errors="replace").strip()
+
+def _start_runtime(container, node):
+    container.start()
+    limits = _runtime_exec(node, container.name, ["bash", "-c", PREPARE_SCRIPT])
+    app.logger.info(f"Shared runtime {container.name} on {node.name} started, {limits} limits")
+
+def _ensure_runtime(name, node, group):
+    container = _runtime_container(name, node)
+    if container is None:
+        with admission.acquire(CREATE_WEIGHT, "create", ADMISSION_TIMEOUT):
+            container = node.client.containers.create(
+                BOT_IMAGE,
+                command=["bash", "-c", "tail -f /dev/null"],
+                name=name,
+                detach=True,
+                mem_limit=f"{SHARED_RUNTIME_MEMORY_MB}m",
+                pids_limit=runtime_pids_limit(SHARED_RUNTIME_MAX_BOTS, SHARED_RUNTIME_BOT_PIDS),
+                network_mode='bridge',
+                log_config=CONTAINER_LOG_CONFIG,
+                volumes=package_cache.volumes(),
+                tty=True,
+                user='1000:1000',
+                labels={RUNTIME_LABEL: group_key(group)},
+            )
+            _start_runtime(container, node)
+        shared_runtimes.created += 1
+    elif container.status != "running":
+        _start_runtime(container, node)
+    return container
+
+def _assign_shared_runtime(bot_id, group, memory_mb):
+    # A runtime fixes the node. If the bot doesn't fit on that node any more, it gets
+    # a runtime (possibly a new one) wherever placement puts it.
+    with shared_runtimes.lock:
+        name, node_name = shared_runtimes.assign(bot_id, group)
+        if node_name:
+            bot_registry.update(bot_id, node=node_name)
+        node = placement.place(bot_id, memory_mb)
+        if node.name != node_name:
+            name, _ = shared_runtimes.assign(bot_id, group, node=node.name)
+        bot_registry.update(bot_id, shared_runtime=name)
+    return name, node
+
+def _stop_shared_process(bot_id, name, node, timeout=10):
+    # True if the bot's process was running. The launcher writes the pid file, so this is one exec.
+    return _runtime_exec(node, name, ["bash", "-c", STOP_SCRIPT, "stop", bot_id, str(timeout)]) == "stopped"
+
+def _prune_shared_runtime(name, node):
+    with shared_runtimes.lock:
+        if name in shared_runtimes.members():
+            return
+        try:
+            container = _runtime_container(name, node)
+            if container is None:
+                return
+            container.remove(force=True)
+        except Exception as e:
+            app.logger.warning(f"Removing empty shared runtime {name} on {node.name} failed: {e}")
+            return
+        shared_runtimes.removed += 1
+        app.logger.info(f"Removed empty shared runtime {name} on {node.name}")
+
+def _leave_shared_runtime(bot_id, name, node):
+    # Ends the bot's process and removes its code and dependencies from the runtime.
+    try:
+        _stop_shared_process(bot_id, name, node, timeout=5)
+        _runtime_exec(node, name, ["rm", "-rf", bot_dir(bot_id)])
+    except Exception as e:
+        app.logger.warning(f"Cleaning bot {bot_id} out of shared runtime {name} failed: {e}")
+    if _shared_runtime_of(bot_id) == name:
+        bot_registry.update(bot_id, shared_runtime=None)
+    _prune_shared_runtime(name, node)
+
+def _put_shared_code(node, name, container, bot_id, bot_code_dir):
+    # The runtime has no bind mount per bot, so the code is copied in; dependencies in deps/ stay.
+    _runtime_exec(node, name, ["bash", "-c", 'rm -rf "$1/code" && mkdir -p "$1" && chown 1000:1000 "$1"',
+                               "put", bot_dir(bot_id)])
+    container.put_archive(bot_dir(bot_id), code_archive(bot_code_dir))
+
+def _deploy_shared(job, bot_code_dir, runtime, entrypoint, manifest, previous, dep_hash, memory_mb, auto_start,
+                   group):
+    bot_id = job.bot_id
+    old_runtime, old_node = _shared_runtime_of(bot_id), placement.node_of(bot_id)
+    existing_container = get_container(bot_id)
+    if existing_container:
+        # Moving from its own container into shared mode.
+        _resume_if_paused(existing_container, bot_registry.get(bot_id))
+        existing_container.remove(force=True)
+    name, node = _assign_shared_runtime(bot_id, group, memory_mb)
+    if old_runtime and old_runtime != name:
+        _leave_shared_runtime(bot_id, old_runtime, old_node)
+    container, _ = lifecycle.run(name, "create", _ensure_runtime, name, node, group, coalesce=True)
+    job.end_stage("create", containerId=container.id, runtime=name, node=node.name, shared=True,
+                  reused=old_runtime == name)
+
+    job.begin_stage("install")
+    if old_runtime == name:
+        _stop_shared_process(bot_id, name, node)
+    _put_shared_code(node, name, container, bot_id, bot_code_dir)
+    workdir, deps_dir = f"{bot_dir(bot_id)}/code", f"{bot_dir(bot_id)}/deps"
+    if old_runtime == name and previous and previous.get("dep_hash") == dep_hash:
+        # node_modules is a link inside code/, which was just replaced.
+        _link_node_modules(container, runtime, workdir, deps_dir)
+        job.end_stage("install", cache="unchanged", depHash=dep_hash)
+    else:
+        with admission.acquire(INSTALL_WEIGHT, "install", ADMISSION_TIMEOUT) as waited:
+            _runtime_exec(node, name, ["rm", "-rf", deps_dir])
+            install_report = _install_dependencies(container, runtime, bot_code_dir, workdir, deps_dir, isolated=True)
+        job.end_stage("install", cache="miss", depHash=dep_hash, admissionWaitMs=round(waited * 1000, 1),
+                      **install_report)
+
+    _register_deploy(bot_id, runtime, entrypoint, manifest, dep_hash, memory_mb, auto_start, container.id,
+                     shared_runtime=name)
+    if auto_start:
+        job.begin_stage("start")
+        _start_bot_process(bot_id)
+        job.end_stage("start")
+    else:
+        job.skip_stage("start")
+    job.succeed(containerId=container.id, runtime=name)
+
+def _run_deploy(job, staging_dir, memory_mb, auto_start, manifest=None, uploaded=None, group=None):
+    botoralo_bot_id = job.bot_id
+    bot_code_dir = get_bot_code_dir(botoralo_bot_id)
+    previous = manifest_store.load(botoralo_bot_id)
+    delta = manifest is not None
+    row = bot_registry.get(botoralo_bot_id)
+    # A redeploy that fails puts this back: the bot it replaces may still be running.
+    before = {"row": row, "manifest": previous, "code": None, "delta": delta} if row else None
+    try:
+        job.begin_stage("extract")
+        if before and os.path.isdir(bot_code_dir):
+            before["code"] = _set_aside_code(job, bot_code_dir, delta)
+        if delta:
+            # Changed files are written into the live directory; it stays bind-mounted.
+            applied = apply_delta(staging_dir, bot_code_dir, manifest, uploaded)
+        else:
+            extract_bot_code(staging_dir, bot_code_dir)
+            manifest = build_manifest(bot_code_dir)
+            applied = {"written": len(manifest), "deleted": 0}
+        runtime, entrypoint = detect_runtime_and_entrypoint_cached(bot_code_dir, manifest_digest(manifest))
+        job.end_stage("extract", runtime=runtime, entrypoint=entrypoint, delta=delta, **applied)
+
+        job.begin_stage("create")
+        dep_hash = dependency_manifest_hash(bot_code_dir, runtime, BOT_IMAGE)
+        manifest_store.save(botoralo_bot_id, manifest, dep_hash)
+        if group is not None:
+            _deploy_shared(job, bot_code_dir, runtime, entrypoint, manifest, previous, dep_hash, memory_mb,
+                           auto_start, group)
+            return
+        shared = _shared_runtime_of(botoralo_bot_id)
+        if shared:
+            # Moving out of shared mode into a container of its own.
+            _leave_shared_runtime(botoralo_bot_id, shared, placement.node_of(botoralo_bot_id))
+        existing_container = get_container(botoralo_bot_id)
+        _resume_if_paused(existing_container, bot_registry.get(botoralo_bot_id))
+        previous_node = placement.node_of(botoralo_bot_id)
+        node = placement.place(botoralo_bot_id, memory_mb)
+        if (delta and existing_container and node is previous_node and previous and previous.get("dep_hash") == dep_hash
+                and _container_memory_mb(botoralo_bot_id, existing_container) == str(memory_mb)):
+            # Same dependencies and limits: keep the container and only restart the bot process.
+            job.end_stage("create", containerId=existing_container.id, reused=True)
+            job.begin_stage("install")
+            job.end_stage("install", cache="unchanged", depHash=dep_hash)
+            job.begin_stage("start")
+            _restart_bot_process(botoralo_bot_id, existing_container, auto_start)
+            job.end_stage("start", restarted=bool(auto_start))
+            _register_deploy(botoralo_bot_id, runtime, entrypoint, manifest, dep_hash, memory_mb, auto_start,
+                             existing_container.id)
+            job.succeed(containerId=existing_container.id)
+            return
+        cached_image = node.deps_cache.lookup(dep_hash)
+        if existing_container:
+            # Bound to the bot's previous node, in case placement moved it.
+            existing_container.remove(force=True)
+        container_name = get_container_name(botoralo_bot_id)
+        # Pooled containers run the bare BOT_IMAGE on the primary node, so they only
+        # help there, and when there is no cached dependency image to start from.
+        pool_usable = node is primary_node and not cached_image
+        container = warm_pool.claim(memory_mb, container_name, bot_code_dir) if pool_usable else None
+        pooled = container is not None
+        waited = 0.0
+        if not pooled:
+            with admission.acquire(CREATE_WEIGHT, "create", ADMISSION_TIMEOUT) as waited:
+                container = _create_bot_container(cached_image or BOT_IMAGE, container_name, memory_mb, bot_code_dir,
+                                                  node=node)
+        job.end_stage("create", containerId=container.id, image=cached_image or BOT_IMAGE, pooled=pooled,
+                      node=node.name, admissionWaitMs=round(waited * 1000, 1))
+
+        job.begin_stage("install")
+        if cached_image:
+            _link_node_modules(container, runtime)
+            job.end_stage("install", cache="hit", depHash=dep_hash)
+        else:
+            with admission.acquire(INSTALL_WEIGHT, "install", ADMISSION_TIMEOUT) as waited:
+                install_report = _install_dependencies(container, runtime, bot_code_dir)
+                node.deps_cache.store(container, dep_hash, BOT_IMAGE)
+            job.end_stage("install", cache="miss", depHash=dep_hash, admissionWaitMs=round(waited * 1000, 1),
+                          **install_report)
+
+        # Recorded before the start so the exec id written by _start_bot_process isn't overwritten.
+        _register_deploy(botoralo_bot_id, runtime, entrypoint, manifest, dep_hash, memory_mb, auto_start,
+                         container.id)
+        if auto_start:
+            job.begin_stage("start")
+            _start_bot_process(botoralo_bot_id)
+            job.end_stage("start")
+        else:
+            job.skip_stage("start")
+        job.succeed(containerId=container.id)
+    except Exception as e:
+        app.logger.error(f"Deploy {job.id} for bot {botoralo_bot_id} failed: {e}")
+        # Failed first, so /deploy/status and /deploy/events end whatever the cleanup does.
+        job.fail(str(e), traceback.format_exc())
+        _cleanup_failed_deploy(job, botoralo_bot_id, bot_code_dir, before)
+    finally:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        if before and before["code"]:
+            shutil.rmtree(before["code"], ignore_errors=True)
+
+def _set_aside_code(job, bot_code_dir, delta):
+    backup_dir = os.path.join(STAGING_DIR, f"{job.id}-previous")
+    if delta:
+        # The delta is applied to the live directory, so it is copied.
+        shutil.copytree(bot_code_dir, backup_dir, symlinks=True)
+    else:
+        # extract_bot_code would remove it anyway.
+        os.rename(bot_code_dir, backup_dir)
+    return backup_dir
+
+def _restore_code(bot_code_dir, backup_dir, delta):
+    # Into the directory a still-running container has bind-mounted: the original one, or
+    # for a delta the live one, refilled in place.
+    if not delta:
+        shutil.rmtree(bot_code_dir, ignore_errors=True)
+        os.rename(backup_dir, bot_code_dir)
+        return
+    for entry in os.listdir(bot_code_dir):
+        path = os.path.join(bot_code_dir, entry)
+        if os.path.isdir(path) and not os.path.islink(path):
+            shutil.rmtree(path)
+        else:
+            os.remove(path)
+    for entry in os.listdir(backup_dir):
+        os.rename(os.path.join(backup_dir, entry), os.path.join(bot_code_dir, entry))
+
+def _cleanup_failed_deploy(job, bot_id, bot_code_dir, before=None):
+    # A first deploy leaves nothing behind. A redeploy gets its previous code, manifest and
+    # registry row back, and only leaves a shared runtime it joined during this deploy.
+    def leave_shared_runtime():
+        shared = _shared_runtime_of(bot_id)
+        if shared and shared != (before["row"]["shared_runtime"] if before else None):
+            _leave_shared_runtime(bot_id, shared, placement.node_of(bot_id))
+    def restore_code():
+        if before["code"]:
+            _restore_code(bot_code_dir, before["code"], before["delta"])
+    def restore_manifest():
+        manifest = before["manifest"]
+        if manifest:
+            manifest_store.save(bot_id, manifest["files"], manifest["dep_hash"])
+        else:
+            manifest_store.forget(bot_id)
+    if before is None:
+        steps = [
+            ("removing code", lambda: shutil.rmtree(bot_code_dir, ignore_errors=True)),
+            ("forgetting manifest", lambda: manifest_store.forget(bot_id)),
+            ("leaving shared runtime", leave_shared_runtime),
+            ("forgetting registry row", lambda: bot_registry.forget(bot_id)),
+        ]
+    else:
+        steps = [
+            ("restoring code", restore_code),
+            ("restoring manifest", restore_manifest),
+            ("leaving shared runtime", leave_shared_runtime),
+            ("restoring registry row", lambda: bot_registry.restore(before["row"])),
+        ]
+    for step, fn in steps:
+        try:
+            fn()
+        except Exception as e:
+            app.logger.warning(f"Deploy {job.id} cleanup for bot {bot_id}: {step} failed: {e}")
+
+def _run_deploy_exclusive(job, *args):
+    # Waits for any start/stop/delete of the same bot; _run_deploy records its own failures.
+    lifecycle.run(job.bot_id, "deploy", _run_deploy, job, *args)
 
 @app.route('/deploy', methods=['POST'])
 @require_master_key
@@ -227,125 +939,403 @@ def _start_bot_process(botoralo_bot_id: str):
 def deploy_bot():
     data = request.data_json
     botoralo_bot_id = data['botoraloBotId']
+    if not isinstance(botoralo_bot_id, str) or not BOT_ID_RE.fullmatch(botoralo_bot_id):
+        return jsonify({'error': BOT_ID_ERROR}), 400
     memory_mb = int(data.get('memory_mb', 128))
     auto_start = data.get('auto_start', False)
     debug_mode = data.get('debug', False)
-    bot_code_dir = get_bot_code_dir(botoralo_bot_id)
-    if os.path.exists(bot_code_dir):
-        shutil.rmtree(bot_code_dir)
-    os.makedirs(bot_code_dir, exist_ok=True)
+    density = data.get('density', DENSITY_MODE)
+    if density not in DENSITY_MODES:
+        return jsonify({'error': f"'density' must be one of {', '.join(DENSITY_MODES)}"}), 400
+    # Bots of one tenant group share runtime containers; a user is a group unless the deploy names one.
+    group = str(data.get('tenantGroup') or data['userId']) if density == 'shared' else None
     try:
-        save_bot_code(bot_code_dir, request.files)
-        runtime, entrypoint = detect_runtime_and_entrypoint_cached(bot_code_dir)
-        existing_container = get_container(botoralo_bot_id)
-        if existing_container:
-            existing_container.remove(force=True)
-        container_name = get_container_name(botoralo_bot_id)
-        container = docker_client.containers.create(
-            BOT_IMAGE,
-            command=["bash", "-c", "tail -f /dev/null"],
-            name=container_name,
-            detach=True,
-            mem_limit=f"{memory_mb}m",
-            network_mode='bridge',
-            volumes={bot_code_dir: {'bind': '/bot', 'mode': 'rw'}},
-            working_dir='/bot',
-            read_only=False,
-            tty=True,
-            user='1000:1000'
-        )
-        container.start()
-        log_buffers[botoralo_bot_id] = Queue()          # Reset buffer
-        log_history[botoralo_bot_id] = deque(maxlen=100)
-        install_cmd = (
-            "if [ -f requirements.txt ]; then pip install -r requirements.txt; else pip install python-telegram-bot; fi"
-            if runtime == "python" else
-            "if [ -f package.json ]; then npm install; else npm install node-telegram-bot-api telegraf; fi"
-        )
-        exit_code, output = container.exec_run(
-            cmd=["bash", "-lc", f"{install_cmd} > /proc/1/fd/1 2>&1"],
-            workdir="/bot",
-            user="1000:1000",
-        )
-
-        if exit_code != 0:
-            raise RuntimeError("Dependency installation failed.")
-        if auto_start:
-            thread = threading.Thread(target=_start_bot_process, args=(botoralo_bot_id,))
-            thread.daemon = True
-            thread.start()
+        job = deploy_queue.reserve(botoralo_bot_id, debug=debug_mode)
+    except DeployQueueFull as e:
+        return jsonify({'error': str(e)}), 503, {'Retry-After': '5'}
+    staging_dir = os.path.join(STAGING_DIR, job.id)
+    manifest = uploaded = None
+    try:
+        job.begin_stage("upload")
+        if data.get('manifest') is not None:
+            manifest = validate_manifest(data['manifest'])
+            uploaded = save_delta_files(staging_dir, request.files, manifest)
+            missing = missing_on_disk(get_bot_code_dir(botoralo_bot_id), manifest, uploaded)
+            if missing:
+                shutil.rmtree(staging_dir, ignore_errors=True)
+                job.fail("Files missing from delta upload")
+                deploy_queue.release(job)
+                return jsonify({'error': 'Files missing from delta upload', 'missing': missing, 'jobId': job.id}), 409
+            job.end_stage("upload", files=len(uploaded), delta=True)
+        else:
+            report = save_bot_code(staging_dir, request.files)
+            job.end_stage("upload", **report)
     except Exception as e:
-        shutil.rmtree(bot_code_dir, ignore_errors=True)
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        job.fail(str(e), traceback.format_exc())
+        deploy_queue.release(job)
         if debug_mode:
-            trace = traceback.format_exc()
-            return jsonify({'error': str(e), 'trace': trace}), 500
-        return jsonify({'error': str(e)}), 500
+            return jsonify({'error': str(e), 'trace': job.trace, 'jobId': job.id}), 400
+        return jsonify({'error': str(e), 'jobId': job.id}), 400
+    deploy_queue.submit(job, _run_deploy_exclusive, staging_dir, memory_mb, auto_start, manifest, uploaded, group)
     return jsonify({
-        'status': 'starting' if auto_start else 'deployed',
+        'status': 'queued',
         'botoraloBotId': botoralo_bot_id,
-        'containerId': container.id,
-    }), 201
+        'jobId': job.id,
+    }), 202
 
-@app.route("/start", methods=["POST"])
+@app.route("/deploy/manifest", methods=["POST"])
 @require_master_key
-@parse_json_body(required_fields=["userId", "botoraloBotId"])
-def start_bot():
-    log_buffers[bot_id] = Queue()
-    log_history[bot_id] = deque(maxlen=100)
-    bot_id = request.data_json["botoraloBotId"]
-    container = get_container(bot_id)
-    if not container:
-        return jsonify({"error": "Bot not deployed"}), 404
+@parse_json_body(required_fields=["userId", "botoraloBotId", "files"])
+def deploy_manifest():
+    # Step one of a delta deploy: the client sends {path: sha256} and uploads only `missing`.
+    data = request.data_json
+    if not isinstance(data["botoraloBotId"], str) or not BOT_ID_RE.fullmatch(data["botoraloBotId"]):
+        return jsonify({"error": BOT_ID_ERROR}), 400
+    try:
+        manifest = validate_manifest(data["files"])
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    missing, deleted = manifest_store.diff(data["botoraloBotId"], manifest)
+    return jsonify({"missing": missing, "deleted": deleted, "unchanged": len(manifest) - len(missing)})
+
+def _find_deploy_job(data):
+    if data.get("jobId"):
+        return deploy_queue.get(data["jobId"])
+    if data.get("botoraloBotId"):
+        return deploy_queue.latest_for_bot(data["botoraloBotId"])
+    return None
+
+@app.route("/deploy/status", methods=["POST"])
+@require_master_key
+@parse_json_body(required_fields=["userId"])
+def deploy_status():
+    job = _find_deploy_job(request.data_json)
+    if not job:
+        return jsonify({"error": "Deploy job not found"}), 404
+    return jsonify({"job": job.to_dict(), "queue": deploy_queue.stats()})
+
+@app.route("/deploy/events", methods=["POST"])
+@require_master_key
+@parse_json_body(required_fields=["userId"])
+def deploy_events():
+    job = _find_deploy_job(request.data_json)
+    if not job:
+        return jsonify({"error": "Deploy job not found"}), 404
+    def event_stream():
+        version = -1
+        while True:
+            current = job.wait_for_change(version, timeout=5.0)
+            if current == version:
+                yield f"data: [heartbeat] {time.strftime('%H:%M:%S')}\n\n"
+                continue
+            version = current
+            yield f"event: progress\ndata: {json.dumps(job.to_dict())}\n\n"
+            if job.done:
+                break
+    return Response(
+        stream_with_context(event_stream()),
+        mimetype='text/event-stream',
+        headers={"Cache-Control": "no-cache", "Connection": "keep-alive", "X-Accel-Buffering": "no"}
+    )
+
+@app.route("/cache/stats", methods=["GET"])
+@require_master_key
+def cache_stats():
+    return jsonify({
+        "deps_images": primary_node.deps_cache.stats(),
+        "deps_images_by_node": {name: node.deps_cache.stats() for name, node in nodes.items()},
+        "packages": package_cache.stats(),
+        "warm_pool": warm_pool.stats(),
+    })
+
+@app.route("/sampler/stats", methods=["GET"])
+@require_master_key
+def sampler_stats():
+    return jsonify(resource_sampler.stats())
+
+@app.route("/registry/stats", methods=["GET"])
+@require_master_key
+def registry_stats():
+    with log_captures_lock:
+        reattached = sum(1 for capture in log_captures.values() if capture["exec_id"])
+    return jsonify({**bot_registry.stats(), "reattached_captures": reattached})
+
+@app.route("/cache/seed", methods=["POST"])
+@require_master_key
+def cache_seed():
+    if package_cache.seeding:
+        return jsonify({"status": "already_seeding"}), 409
+    threading.Thread(target=package_cache.seed, daemon=True).start()
+    return jsonify({"status": "seeding"}), 202
+
+def _exec_running(bot_id, exec_id):
     try:
-        container.reload()
-    except Exception:
-        pass
+        return bool(placement.node_of(bot_id).api.exec_inspect(exec_id).get("Running"))
+    except docker.errors.NotFound:
+        return False
+
+def _start_shared_bot(bot_id, row):
+    node = placement.node_of(bot_id)
+    container = _runtime_container(row["shared_runtime"], node)
+    if not container:
+        return {"error": "Bot not deployed"}, 404
     if container.status != "running":
+        try:
+            _start_runtime(container, node)
+        except Exception as e:
+            return {"error": "Failed to start runtime container", "details": str(e)}, 500
+    elif row["exec_id"] and _exec_running(bot_id, row["exec_id"]):
+        bot_registry.update(bot_id, desired_state="running")
+        return {"status": "already_running"}, 200
+    bot_registry.update(bot_id, desired_state="running")
+    _start_bot_process(bot_id)
+    return {"status": "starting"}, 200
+
+def _start_bot(bot_id):
+    row = bot_registry.get(bot_id)
+    if row and row["shared_runtime"]:
+        return _start_shared_bot(bot_id, row)
+    container = get_container(bot_id)
+    if not container:
+        return {"error": "Bot not deployed"}, 404
+    if row and row["hibernated"]:
+        return _wake_bot(bot_id)
+    if not placement.node_of(bot_id).index.ready:
+        try:
+            container.reload()
+        except Exception:
+            pass
+    if container.status == "running":
+        row = bot_registry.get(bot_id)
+        if row and row["exec_id"] and _exec_running(bot_id, row["exec_id"]):
+            # A second exec would run the bot twice in one container.
+            bot_registry.update(bot_id, desired_state="running")
+            return {"status": "already_running"}, 200
+    else:
         try:
             container.start()
         except Exception as e:
-            return jsonify({"error": "Failed to start container", "details": str(e)}), 500
-    thread = threading.Thread(target=_start_bot_process, args=(bot_id,))
-    thread.daemon = True
-    thread.start()
-    return jsonify({"status": "starting"})
+            return {"error": "Failed to start container", "details": str(e)}, 500
+    bot_registry.update(bot_id, desired_state="running")
+    _start_bot_process(bot_id)
+    return {"status": "starting"}, 200
 
-@app.route("/stop", methods=["POST"])
-@require_master_key
-@parse_json_body(required_fields=["userId", "botoraloBotId"])
-def stop_bot():
-    bot_id = request.data_json["botoraloBotId"]
+def _stop_bot(bot_id):
+    row = bot_registry.get(bot_id)
+    if row:
+        bot_registry.update(bot_id, desired_state="stopped", hibernated=None, hibernated_mb=None)
+    if row and row["shared_runtime"]:
+        # Only the bot's own process; the runtime keeps running its other bots.
+        try:
+            stopped = _stop_shared_process(bot_id, row["shared_runtime"], placement.node_of(bot_id))
+        except docker.errors.NotFound:
+            stopped = False
+        except Exception as e:
+            return {"error": "Failed to stop bot process", "details": str(e)}, 500
+        return {"status": "stopped" if stopped else "already_stopped"}, 200
     container = get_container(bot_id)
-    if not container or container.status != "running":
-        return jsonify({"status": "already_stopped"}), 200
+    unpaused = _resume_if_paused(container, row)
+    if not container or (container.status != "running" and not unpaused):
+        return {"status": "already_stopped"}, 200
     try:
         container.stop(timeout=10)
-        return jsonify({"status": "stopped"})
+        return {"status": "stopped"}, 200
     except Exception as e:
-        return jsonify({"error": "Failed to stop container", "details": str(e)}), 500
+        return {"error": "Failed to stop container", "details": str(e)}, 500
 
-@app.route("/delete", methods=["POST"])
-@require_master_key
-@parse_json_body(required_fields=["userId", "botoraloBotId"])
-def delete_bot():
-    bot_id = request.data_json["botoraloBotId"]
+def _delete_bot(bot_id):
+    shared = _shared_runtime_of(bot_id)
+    if shared:
+        _leave_shared_runtime(bot_id, shared, placement.node_of(bot_id))
     container = get_container(bot_id)
     if container:
         try:
+            _resume_if_paused(container, bot_registry.get(bot_id))
             container.remove(force=True)
         except Exception:
             pass
     shutil.rmtree(get_bot_code_dir(bot_id), ignore_errors=True)
-    log_buffers.pop(bot_id, None)
-    log_history.pop(bot_id, None)
-    active_connections.pop(bot_id, None)
-    return jsonify({"status": "deleted"})
+    with log_brokers_lock:
+        log_brokers.pop(bot_id, None)
+    with log_stores_lock:
+        store = log_stores.pop(bot_id, None)
+        log_indexes.pop(bot_id, None)
+    if store:
+        store.destroy()
+    else:
+        shutil.rmtree(os.path.join(LOG_STORE_DIR, str(bot_id)), ignore_errors=True)
+    resource_sampler.forget(bot_id)
+    hibernator.forget(bot_id)
+    log_followers.close(bot_id)
+    with log_governors_lock:
+        log_governors.pop((bot_id, "capture"), None)
+        log_governors.pop((bot_id, "follower"), None)
+    _detach_log_capture(bot_id)
+    manifest_store.forget(bot_id)
+    bot_registry.forget(bot_id)
+    return {"status": "deleted"}, 200
+
+# --- Idle hibernation ---
+# Bots idle for their tier's window are paused (process frozen, memory kept) or have
+# their container stopped (memory freed, process restarted on wake). The registry's
+# `hibernated` column holds the mode; every path that needs the bot awake wakes it.
+def _resume_if_paused(container, row):
+    # Docker won't stop or replace a paused container. True if it was unpaused.
+    if not container or not row or row["hibernated"] != "pause":
+        return False
+    try:
+        container.unpause()
+        return True
+    except docker.errors.APIError:
+        return False    # not paused after all
+
+def _hibernate_bot(bot_id, mode, idle_seconds):
+    # Runs under the bot's lifecycle lock; the state is re-checked now that nothing else can change it.
+    row = bot_registry.get(bot_id)
+    if not row or row["desired_state"] != "running" or row["hibernated"]:
+        return False
+    container = get_container(bot_id)
+    if not container or container.status != "running":
+        return False
+    observed = _observed_memory_mb(bot_id)
+    publish_log(bot_id, f"[info] idle for {idle_seconds / 60:g} min, hibernating ({mode})")
+    if mode == "pause":
+        container.pause()
+    else:
+        container.stop(timeout=10)
+    bot_registry.update(bot_id, hibernated=mode, hibernated_mb=round(observed, 1) if observed is not None else None)
+    resource_sampler.forget(bot_id)
+    app.logger.info(f"Hibernated bot {bot_id} ({mode}), {observed or 0:.0f} MB in use")
+    return True
+
+def _wake_bot(bot_id):
+    row = bot_registry.get(bot_id)
+    if not row or not row["hibernated"]:
+        return {"status": "awake"}, 200
+    container = get_container(bot_id)
+    if not container:
+        return {"error": "Bot not deployed"}, 404
+    mode = row["hibernated"]
+    started = time.perf_counter()
+    try:
+        if mode == "pause":
+            container.unpause()
+        else:
+            container.start()
+    except Exception as e:
+        return {"error": "Failed to wake bot", "details": str(e)}, 500
+    bot_registry.update(bot_id, desired_state="running", hibernated=None, hibernated_mb=None)
+    if mode == "stop":
+        _start_bot_process(bot_id)
+    waited = time.perf_counter() - started
+    hibernator.record_wake(bot_id, mode, waited)
+    publish_log(bot_id, f"[info] woke from hibernation ({mode}) in {waited * 1000:.0f} ms")
+    return {"status": "woken", "mode": mode, "wake_ms": round(waited * 1000, 1)}, 200
+
+def _wake_for_request(bot_id):
+    # A dict lookup unless the bot is actually hibernated.
+    row = bot_registry.get(bot_id)
+    if row and row["hibernated"]:
+        lifecycle.run(bot_id, "wake", _wake_bot, bot_id, coalesce=True)
+
+def _get_container_awake(bot_id):
+    _wake_for_request(bot_id)
+    return get_container(bot_id)
+
+def _hibernation_usage(bot_id, window):
+    history = resource_sampler.history(bot_id, window, 1)
+    return history[-1] if history else None
+
+hibernator = IdleHibernator(
+    HIBERNATE_POLICY,
+    rows_fn=bot_registry.all,
+    usage_fn=_hibernation_usage,
+    hibernate_fn=lambda bot_id, mode, idle_seconds: lifecycle.run(
+        bot_id, "hibernate", _hibernate_bot, bot_id, mode, idle_seconds)[0],
+    busy_fn=lifecycle.busy,
+    cpu_percent=HIBERNATE_CPU_PERCENT,
+    net_bps=HIBERNATE_NET_BPS,
+    interval=HIBERNATE_CHECK_INTERVAL,
+)
+
+def _lifecycle_response(bot_id, op, fn):
+    # Runs under the bot's lifecycle lock; a duplicate of the in-flight operation gets its result.
+    (body, status), coalesced = lifecycle.run(bot_id, op, fn, bot_id, coalesce=True)
+    if coalesced:
+        body = {**body, "coalesced": True}
+    return jsonify(body), status
+
+@app.route("/start", methods=["POST"])
+@require_master_key
+@parse_json_body(required_fields=["userId", "botoraloBotId"])
+def start_bot():
+    return _lifecycle_response(request.data_json["botoraloBotId"], "start", _start_bot)
+
+@app.route("/stop", methods=["POST"])
+@require_master_key
+@parse_json_body(required_fields=["userId", "botoraloBotId"])
+def stop_bot():
+    return _lifecycle_response(request.data_json["botoraloBotId"], "stop", _stop_bot)
+
+@app.route("/delete", methods=["POST"])
+@require_master_key
+@parse_json_body(required_fields=["userId", "botoraloBotId"])
+def delete_bot():
+    return _lifecycle_response(request.data_json["botoraloBotId"], "delete", _delete_bot)
+
+@app.route("/wake", methods=["POST"])
+@require_master_key
+@parse_json_body(required_fields=["userId", "botoraloBotId"])
+def wake_bot():
+    return _lifecycle_response(request.data_json["botoraloBotId"], "wake", _wake_bot)
+
+@app.route("/hibernation/stats", methods=["GET"])
+@require_master_key
+def hibernation_stats():
+    return jsonify(hibernator.stats())
+
+@app.route("/shared/stats", methods=["GET"])
+@require_master_key
+def shared_stats():
+    # Adds each runtime container's own memory use, so it can be compared with the bots' sum.
+    result = shared_runtimes.stats()
+    members = shared_runtimes.members()
+    for name, runtime in result["runtimes"].items():
+        try:
+            stats = nodes.get(runtime["node"], primary_node).api.stats(name, stream=False, one_shot=True)
+            runtime["container_mb"] = round(stats.get("memory_stats", {}).get("usage", 0) / (1024 * 1024), 1)
+        except Exception:
+            runtime["container_mb"] = None
+        bots_mb = [_observed_memory_mb(bot_id) for bot_id in members.get(name, {}).get("bots", [])]
+        runtime["bots_mb"] = round(sum(mb for mb in bots_mb if mb is not None), 1)
+    result["limit_mb"] = SHARED_RUNTIME_MEMORY_MB
+    return jsonify(result)
+
+@app.route("/nodes/stats", methods=["GET"])
+@require_master_key
+def nodes_stats():
+    return jsonify(placement.stats())
+
+@app.route("/lifecycle/stats", methods=["GET"])
+@require_master_key
+def lifecycle_stats():
+    return jsonify({"admission": admission.stats(), "locks": lifecycle.stats()})
 
 @app.route("/info", methods=["POST"])
 @require_master_key
 @parse_json_body(required_fields=["userId", "botoraloBotId"])
 def info_bot():
     bot_id = request.data_json["botoraloBotId"]
+    row = bot_registry.get(bot_id)
+    if row and row["shared_runtime"]:
+        return jsonify({"bot": _shared_info(bot_id, row)})
+    index = placement.node_of(bot_id).index
+    if index.ready:
+        state = index.get(get_container_name(bot_id))
+        if not state:
+            return jsonify({"bot": {"status": "stopped", "botoraloBotId": bot_id}})
+        return jsonify({"bot": _indexed_info(bot_id, state, index)})
     container = get_container(bot_id)
     if not container:
         return jsonify({"bot": {"status": "stopped", "botoraloBotId": bot_id}})
@@ -355,134 +1345,818 @@ def info_bot():
         "container_id": container.id,
         "status": container.status,
         "uptime_started_at": container.attrs.get("State", {}).get("StartedAt"),
-        "memory_mb": int(container.attrs.get("HostConfig", {}).get("Memory", 0) / 1024 / 1024)
+        "memory_mb": int(container.attrs.get("HostConfig", {}).get("Memory", 0) / 1024 / 1024),
+        **_hibernation_fields(bot_id),
     }
     return jsonify({"bot": info})
 
+def _shared_info(bot_id, row):
+    # The runtime container's state says nothing about one bot in it; its exec does.
+    running = bool(row["exec_id"]) and _exec_running(bot_id, row["exec_id"])
+    return {
+        "botoraloBotId": bot_id,
+        "container_id": row["container_id"],
+        "status": "running" if running else "exited",
+        "uptime_started_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(row["started_at"]))
+                             if running and row["started_at"] else None,
+        "memory_mb": row["memory_mb"],
+        "shared_runtime": row["shared_runtime"],
+    }
+
+def _shared_rows(bot_ids):
+    rows = {}
+    for bot_id in bot_ids:
+        row = bot_registry.get(bot_id)
+        if row and row["shared_runtime"]:
+            rows[bot_id] = row
+    return rows
+
+def _hibernation_fields(bot_id):
+    # A hibernated bot's container is paused or exited; tell clients it wasn't a crash.
+    row = bot_registry.get(bot_id)
+    return {"hibernated": row["hibernated"]} if row and row["hibernated"] else {}
+
+def _indexed_info(bot_id, state, index):
+    if (state.status == "running" and not state.started_at) or MEMORY_LABEL not in state.labels:
+        index.fill_details(state)
+    return {
+        "botoraloBotId": bot_id,
+        "container_id": state.id,
+        "status": state.status,
+        "uptime_started_at": state.started_at,
+        "memory_mb": int(state.labels.get(MEMORY_LABEL, 0)),
+        "exit_code": state.exit_code,
+        "finished_at": state.finished_at,
+        "oom_killed": state.oom_killed,
+        "oom_count": state.oom_count,
+        **_hibernation_fields(bot_id),
+    }
+
+def _list_bot_containers():
+    # One daemon round trip per node for every bot container, keyed by botoraloBotId.
+    # These are list summaries (State, Labels, Id), not full inspect results,
+    # tagged with the "Node" they came from. Unreachable nodes are skipped.
+    by_bot_id = {}
+    for node in nodes.values():
+        try:
+            summaries = node.api.containers(all=True, filters={"name": f"^/{CONTAINER_NAME_PREFIX}"})
+        except Exception as e:
+            if len(nodes) == 1:
+                raise
+            app.logger.warning(f"Listing containers on node {node.name} failed: {e}")
+            continue
+        for summary in summaries:
+            summary["Node"] = node.name
+            for name in summary.get("Names", []):
+                name = name.lstrip("/")
+                if name.startswith(CONTAINER_NAME_PREFIX):
+                    by_bot_id[name[len(CONTAINER_NAME_PREFIX):]] = summary
+    return by_bot_id
+
+_container_pids = {}    # container_id -> host pid of its init process
+_container_nodes = {}   # container_id -> Node, for the sampler's stats fallback
+
+def _running_bot_containers():
+    # Pids are only meaningful (and only read, for network counters) on this host's daemons.
+    running = {}
+    listed = None
+    for node in nodes.values():
+        if node.index.ready:
+            for state in node.index.running():
+                if node.local and state.pid is None:
+                    node.index.fill_details(state)
+                running[state.name[len(CONTAINER_NAME_PREFIX):]] = (state.id, state.pid if node.local else None)
+                _container_nodes[state.id] = node
+            continue
+        if listed is None:
+            listed = _list_bot_containers()
+        for bot_id, summary in listed.items():
+            if summary.get("State") != "running" or summary["Node"] != node.name:
+                continue
+            container_id = summary["Id"]
+            if node.local and container_id not in _container_pids:
+                _container_pids[container_id] = node.api.inspect_container(container_id).get("State", {}).get("Pid")
+            running[bot_id] = (container_id, _container_pids.get(container_id))
+            _container_nodes[container_id] = node
+    live = {cid for cid, _ in running.values()}
+    for container_id in set(_container_pids) - live:
+        del _container_pids[container_id]
+    for container_id in set(_container_nodes) - live:
+        del _container_nodes[container_id]
+    return running
+
+def _read_runtime(name, node):
+    return parse_readings(_runtime_exec(node, name, ["python3", "-c", READ_SCRIPT]))
+
+def _enforce_soft_limits(bot_id, name, node, counters):
+    # Without a cgroup per bot, its limits are checked here, once per sampling round.
+    if counters.get("limits") == "cgroup":
+        return
+    row = bot_registry.get(bot_id)
+    limit_mb = (row and row["memory_mb"]) or 128
+    used_mb = counters["mem_bytes"] / (1024 * 1024)
+    if used_mb > limit_mb:
+        reason = f"{used_mb:.0f} MB, over its {limit_mb} MB limit"
+    elif counters["procs"] > SHARED_RUNTIME_BOT_PIDS:
+        reason = f"{counters['procs']} processes, over its limit of {SHARED_RUNTIME_BOT_PIDS}"
+    else:
+        return
+    publish_log(bot_id, f"[error] bot used {reason}; killed")
+    try:
+        _stop_shared_process(bot_id, name, node, timeout=0)
+        shared_runtimes.enforced += 1
+    except Exception as e:
+        app.logger.warning(f"Killing bot {bot_id} in shared runtime {name} failed: {e}")
+
+def _shared_processes():
+    # One exec per shared runtime per sampling round reads every bot process in it.
+    runtimes = shared_runtimes.members()
+    futures = {
+        name: (stats_executor.submit(_read_runtime, name, nodes.get(entry["node"], primary_node)), entry)
+        for name, entry in runtimes.items()
+    }
+    readings = {}
+    for name, (future, entry) in futures.items():
+        try:
+            counters_by_bot = future.result()
+        except Exception as e:
+            app.logger.debug(f"Reading shared runtime {name} failed: {e}")
+            continue
+        for bot_id, counters in counters_by_bot.items():
+            if bot_id not in entry["bots"] or not counters.get("procs"):
+                continue
+            # The runtime's name stands in for a container id; the sampler only compares it between rounds.
+            readings[bot_id] = (name, counters)
+            _enforce_soft_limits(bot_id, name, nodes.get(entry["node"], primary_node), counters)
+    return readings
+
+resource_sampler = ResourceSampler(
+    list_fn=_running_bot_containers,
+    stats_fn=lambda container_id: _container_nodes.get(container_id, primary_node).api.stats(
+        container_id, stream=False, one_shot=True),
+    executor=stats_executor,
+    interval=SAMPLER_INTERVAL,
+    capacity=SAMPLER_HISTORY,
+    process_fn=_shared_processes,
+)
+
+def _sampled_stats(bot_id):
+    # Latest background sample, or None if there is no fresh one (not running, or not sampled yet).
+    sample = resource_sampler.latest(bot_id)
+    if not sample or time.time() - sample["t"] > SAMPLER_INTERVAL * 3:
+        return None
+    return {
+        "memory_usage_mb": round(sample["mem_bytes"] / (1024 * 1024), 2),
+        "cpu_percent": round(sample["cpu_percent"], 2),
+        "net_rx_bps": round(sample["net_rx_bps"], 1),
+        "net_tx_bps": round(sample["net_tx_bps"], 1),
+        "blk_read_bps": round(sample["blk_read_bps"], 1),
+        "blk_write_bps": round(sample["blk_write_bps"], 1),
+        "net_rx_bytes": sample["net_rx_bytes"],
+        "net_tx_bytes": sample["net_tx_bytes"],
+        "sampled_at": sample["t"],
+    }
+
+def _observed_memory_mb(bot_id):
+    sample = resource_sampler.latest(bot_id)
+    if not sample or time.time() - sample["t"] > SAMPLER_INTERVAL * 3:
+        return None
+    return sample["mem_bytes"] / (1024 * 1024)
+
+def _batch_bot_ids():
+    bot_ids = request.data_json.get("botoraloBotIds")
+    if not isinstance(bot_ids, list) or not all(isinstance(b, str) for b in bot_ids):
+        return None, (jsonify({"error": "'botoraloBotIds' must be a list of strings"}), 400)
+    if len(bot_ids) > BATCH_MAX_BOTS:
+        return None, (jsonify({"error": f"At most {BATCH_MAX_BOTS} bots per batch"}), 400)
+    return list(dict.fromkeys(bot_ids)), None
+
+def _summary_info(bot_id, summary):
+    info = {
+        "botoraloBotId": bot_id,
+        "container_id": summary["Id"],
+        "status": summary.get("State"),
+        "uptime_started_at": None,
+        **_hibernation_fields(bot_id),
+    }
+    memory_label = summary.get("Labels", {}).get(MEMORY_LABEL)
+    info["memory_mb"] = int(memory_label) if memory_label else None
+    if info["status"] == "running" or info["memory_mb"] is None:
+        # The list summary has no StartedAt, and older containers have no memory label.
+        attrs = nodes[summary["Node"]].api.inspect_container(summary["Id"])
+        info["uptime_started_at"] = attrs.get("State", {}).get("StartedAt")
+        info["memory_mb"] = int(attrs.get("HostConfig", {}).get("Memory", 0) / 1024 / 1024)
+    return info
+
+def _summary_stats(bot_id, summary):
+    if summary.get("State") != "running":
+        return {"memory_usage_mb": 0}
+    sampled = _sampled_stats(bot_id)
+    if sampled:
+        return sampled
+    # one_shot skips the second sample Docker otherwise waits ~1s for (it only matters for CPU%).
+    stats = nodes[summary["Node"]].api.stats(summary["Id"], stream=False, one_shot=True)
+    mem = stats.get("memory_stats", {}).get("usage", 0) / (1024 * 1024)
+    return {"memory_usage_mb": round(mem, 2)}
+
+def _run_batch(bot_ids, containers, fn, missing):
+    futures = {
+        bot_id: stats_executor.submit(fn, bot_id, containers[bot_id])
+        for bot_id in bot_ids if bot_id in containers
+    }
+    results = {}
+    for bot_id in bot_ids:
+        if bot_id not in futures:
+            results[bot_id] = missing(bot_id)
+            continue
+        try:
+            results[bot_id] = futures[bot_id].result()
+        except Exception as e:
+            results[bot_id] = {"botoraloBotId": bot_id, "error": str(e)}
+    return results
+
+@app.route("/info/batch", methods=["POST"])
+@require_master_key
+@parse_json_body(required_fields=["userId", "botoraloBotIds"])
+def info_batch():
+    bot_ids, error = _batch_bot_ids()
+    if error:
+        return error
+    shared = _shared_rows(bot_ids)
+    bot_ids = [bot_id for bot_id in bot_ids if bot_id not in shared]
+    if _indexes_ready():
+        bots = {}
+        for bot_id in bot_ids:
+            index = placement.node_of(bot_id).index
+            state = index.get(get_container_name(bot_id))
+            try:
+                bots[bot_id] = _indexed_info(bot_id, state, index) if state else {"status": "stopped", "botoraloBotId": bot_id}
+            except Exception as e:
+                bots[bot_id] = {"botoraloBotId": bot_id, "error": str(e)}
+    else:
+        try:
+            containers = _list_bot_containers()
+        except Exception as e:
+            return jsonify({"error": "Failed to list containers", "details": str(e)}), 500
+        bots = _run_batch(
+            bot_ids, containers, _summary_info,
+            missing=lambda bot_id: {"status": "stopped", "botoraloBotId": bot_id},
+        )
+    bots.update(_run_batch(list(shared), shared, _shared_info, missing=None))
+    return jsonify({"bots": bots})
+
+@app.route("/stats/batch", methods=["POST"])
+@require_master_key
+@parse_json_body(required_fields=["userId", "botoraloBotIds"])
+def stats_batch():
+    bot_ids, error = _batch_bot_ids()
+    if error:
+        return error
+    shared = _shared_rows(bot_ids)
+    bot_ids = [bot_id for bot_id in bot_ids if bot_id not in shared]
+    try:
+        if _indexes_ready():
+            containers = {}
+            for bot_id in bot_ids:
+                node = placement.node_of(bot_id)
+                state = node.index.get(get_container_name(bot_id))
+                if state:
+                    containers[bot_id] = {"Id": state.id, "State": state.status, "Node": node.name}
+        else:
+            containers = _list_bot_containers()
+    except Exception as e:
+        return jsonify({"error": "Failed to list containers", "details": str(e)}), 500
+    stats = _run_batch(
+        bot_ids, containers, _summary_stats,
+        missing=lambda bot_id: {"memory_usage_mb": 0},
+    )
+    for bot_id in shared:
+        # Only the sampler can tell one process's usage from the rest of its runtime.
+        stats[bot_id] = _sampled_stats(bot_id) or {"memory_usage_mb": 0}
+    return jsonify({"stats": stats})
+
 @app.route("/stats", methods=["POST"])
 @require_master_key
 @parse_json_body(required_fields=["userId", "botoraloBotId"])
 def stats_bot():
-    bot_id = request.data_json["botoraloBotId"]
+    data = request.data_json
+    bot_id = data["botoraloBotId"]
+    result = _sampled_stats(bot_id)
+    if result is None:
+        container = get_container(bot_id)
+        if not container or container.status != "running":
+            result = {"memory_usage_mb": 0}
+        else:
+            try:
+                stats = container.stats(stream=False)
+                mem = stats.get("memory_stats", {}).get("usage", 0) / (1024 * 1024)
+                result = {"memory_usage_mb": round(mem, 2)}
+            except Exception:
+                result = {"memory_usage_mb": 0}
+    if data.get("window"):
+        try:
+            window = min(float(data["window"]), SAMPLER_INTERVAL * SAMPLER_HISTORY)
+            points = max(1, min(int(data.get("points", 60)), 1000))
+        except (TypeError, ValueError):
+            return jsonify({"error": "'window' and 'points' must be numbers"}), 400
+        result["history"] = [
+            {
+                "t": point["t"],
+                "memory_usage_mb": round(point["mem_bytes"] / (1024 * 1024), 2),
+                "cpu_percent": round(point["cpu_percent"], 2),
+                "net_rx_bps": round(point["net_rx_bps"], 1),
+                "net_tx_bps": round(point["net_tx_bps"], 1),
+                "blk_read_bps": round(point["blk_read_bps"], 1),
+                "blk_write_bps": round(point["blk_write_bps"], 1),
+            }
+            for point in resource_sampler.history(bot_id, window, points)
+        ]
+    return jsonify(result)
+
+def _open_log_follow(bot_id):
     container = get_container(bot_id)
-    if not container or container.status != "running":
-        return jsonify({"memory_usage_mb": 0}), 200
+    if not container:
+        return None
+    return container.logs(stream=True, follow=True, tail=LOG_REPLAY_LINES)
+
+log_followers = LogFollowerHub(
+    _open_log_follow,
+    capacity=LOG_BUFFER_LINES,
+    replay=LOG_REPLAY_LINES,
+    max_line_bytes=LOG_MAX_LINE_BYTES,
+    linger=LOG_FOLLOW_LINGER,
+    governor_fn=lambda bot_id: get_log_governor(bot_id, "follower"),
+)
+
+def _broker_event_stream(broker, framing=None):
+    framing = framing or SseFraming()
+    broker.subscribe()
+    cursor = broker.replay_cursor(LOG_REPLAY_LINES)   # Only lines from current run
+    last_message_time = time.time()
+    try:
+        while True:
+            lines, cursor, dropped = broker.read(cursor)
+            if lines or dropped:
+                if framing.batched:
+                    yield framing.encode("".join(framing.lines(lines, cursor, dropped)))
+                    # Whatever arrives within the window goes out as the next event.
+                    broker.wait_closed(framing.window)
+                else:
+                    for event in framing.lines(lines, cursor, dropped):
+                        yield framing.encode(event)
+            if lines:
+                last_message_time = time.time()
+            elif not broker.wait(cursor, timeout=5.0):
+                yield framing.encode(framing.heartbeat())
+                if time.time() - last_message_time > 300:
+                    yield framing.encode(framing.info("[info] Log stream timeout"))
+                    break
+        yield framing.finish()
+    finally:
+        broker.unsubscribe()
+
+def _follow_event_stream(bot_id, not_found_message, framing=None):
+    # All /logs and /logs_raw clients of a bot share one Docker follow stream.
+    framing = framing or SseFraming()
+    if _shared_runtime_of(bot_id):
+        # A shared runtime's container log mixes its bots; each bot's output comes off its exec stream.
+        yield from _broker_event_stream(get_log_broker(bot_id), framing)
+        return
+    if not _get_container_awake(bot_id):
+        yield framing.encode(framing.info(not_found_message))
+        yield framing.finish()
+        return
+    subscription = log_followers.subscribe(bot_id)
     try:
-        stats = container.stats(stream=False)
-        mem = stats.get("memory_stats", {}).get("usage", 0) / (1024 * 1024)
-        return jsonify({"memory_usage_mb": round(mem, 2)})
-    except Exception:
-        return jsonify({"memory_usage_mb": 0})
+        while not subscription.finished:
+            lines, dropped = subscription.read(timeout=15.0)
+            if lines or dropped:
+                if framing.batched:
+                    yield framing.encode("".join(framing.lines(lines, subscription.cursor, dropped)))
+                    subscription.follower.broker.wait_closed(framing.window)
+                else:
+                    for event in framing.lines(lines, subscription.cursor, dropped):
+                        yield framing.encode(event)
+            else:
+                # SSE comment: ignored by EventSource, but finds clients that have gone away.
+                yield framing.encode(": keep-alive\n\n")
+        yield framing.finish()
+    finally:
+        subscription.close()
+
+def _sse_response(events, framing):
+    return Response(stream_with_context(events), mimetype="text/event-stream", headers=framing.headers)
+
+def _request_framing():
+    # Raises ValueError for a bad "framing", "batch_ms" or "batch_bytes".
+    return parse_framing(request.data_json, request.headers.get("Accept-Encoding", ""), SSE_BATCH_MS, SSE_BATCH_BYTES)
+
+# --- Container log capture ---
+# A dedicated bot's process writes to /proc/1/fd/1, so its output reaches the container's log
+# rather than its exec stream. Capture follows that log into publish_log from when the process
+# started, until the exec exits or the bot restarts. After a backend restart the exec stream
+# can't be reopened, so the same capture is re-attached from the last stored line and the exec
+# is polled to notice the exit.
+log_captures = {}    # bot_id -> {"exec_id", "stream"}; exec_id only for re-attached captures
+log_captures_lock = threading.Lock()
+
+def _attach_log_capture(bot_id, since_fn, exec_id=None, notice=None):
+    capture = {"exec_id": exec_id, "stream": None}
+    with log_captures_lock:
+        log_captures[bot_id] = capture
+
+    def attached():
+        return log_captures.get(bot_id) is capture
+
+    def follow():
+        framer = LineFramer(max_line_bytes=LOG_MAX_LINE_BYTES)
+        governor = get_log_governor(bot_id, "capture")
+        def publish_lines(lines):
+            for line in lines:
+                text = line.text.strip()
+                if text:
+                    suffix = " [truncated]" if line.truncated else ""
+                    for admitted in governor.admit(f"[stdout] {text}{suffix}"):
+                        publish_log(bot_id, admitted)
+        try:
+            since = since_fn()
+            stream = placement.node_of(bot_id).api.logs(get_container_name(bot_id), stream=True, follow=True,
+                                     **({"since": since} if since else {"tail": 0}))
+            with log_captures_lock:
+                capture["stream"] = stream
+                detached = not attached()
+            if detached:
+                stream.close()
+                return
+            if notice:
+                publish_log(bot_id, notice)
+            for chunk in stream:
+                publish_lines(framer.feed(chunk))
+                if not attached():
+                    break
+                # This doesn't slow the bot: Docker keeps logging, and lines rotated out before
+                # they are read are lost. It only bounds the work spent on a flood.
+                delay = governor.read_delay(len(chunk))
+                if delay:
+                    time.sleep(delay)
+            publish_lines(framer.flush())
+            for admitted in governor.flush():
+                publish_log(bot_id, admitted)
+        except Exception as e:
+            if attached():
+                publish_log(bot_id, f"[error] Stream error: {e}")
+        finally:
+            _detach_log_capture(bot_id, capture)
+
+    threading.Thread(target=follow, name=f"log-capture-{bot_id}", daemon=True).start()
+    return capture
+
+def _reattach_log_capture(bot_id, row):
+    _attach_log_capture(bot_id, lambda: get_log_store(bot_id).stats()["last_ts"] or row["started_at"],
+                        exec_id=row["exec_id"], notice="[info] log capture re-attached after backend restart")
+
+def _detach_log_capture(bot_id, capture=None):
+    # True if a capture (or the given one) was running and is now closed.
+    with log_captures_lock:
+        current = log_captures.get(bot_id)
+        if current is None or (capture is not None and current is not capture):
+            return False
+        del log_captures[bot_id]
+    if current["stream"] is not None:
+        try:
+            current["stream"].close()
+        except Exception:
+            pass
+    return True
+
+def _reattached_exec_loop():
+    # The container keeps running after the bot process exits, so watch the exec itself.
+    while True:
+        time.sleep(REATTACH_POLL_INTERVAL)
+        with log_captures_lock:
+            captures = [(bot_id, c) for bot_id, c in log_captures.items() if c["exec_id"]]
+        for bot_id, capture in captures:
+            try:
+                info = placement.node_of(bot_id).api.exec_inspect(capture["exec_id"])
+            except docker.errors.NotFound:
+                info = {"Running": False, "ExitCode": None}
+            except Exception:
+                continue
+            if not info.get("Running") and _detach_log_capture(bot_id, capture):
+                publish_log(bot_id, f"[info] process exited with code {info.get('ExitCode')}")
+
+def _shared_bot_summaries():
+    # Shared-mode bots have no container of their own; each is reported as its runtime's.
+    runtimes = {}
+    for node in nodes.values():
+        try:
+            summaries = node.api.containers(all=True, filters={"name": f"^/{RUNTIME_NAME_PREFIX}"})
+        except Exception as e:
+            app.logger.warning(f"Listing shared runtimes on node {node.name} failed: {e}")
+            continue
+        for summary in summaries:
+            summary["Node"] = node.name
+            for name in summary.get("Names", []):
+                runtimes[name.lstrip("/")] = summary
+    return {
+        bot_id: {**runtimes[name], "Labels": {}}
+        for name, entry in shared_runtimes.members().items() if name in runtimes
+        for bot_id in entry["bots"]
+    }
 
+def _reattach_or_restart(bot_id, row):
+    if not row["shared_runtime"]:
+        _reattach_log_capture(bot_id, row)
+        return
+    # A shared bot's output only ever reached the backend over its exec stream, which can't
+    # be reopened, so its process is restarted; the launcher ends the old one first.
+    threading.Thread(target=lifecycle.run, args=(bot_id, "start", _start_bot_process, bot_id),
+                     name=f"shared-restart-{bot_id}", daemon=True).start()
+
+def _reconcile_registry():
+    # One Docker list call against every registered bot, before the server accepts requests.
+    started = time.perf_counter()
+    try:
+        containers = _list_bot_containers()
+    except Exception as e:
+        app.logger.error(f"Registry reconcile skipped, listing containers failed: {e}")
+        return None
+    containers.update(_shared_bot_summaries())
+    list_ms = round((time.perf_counter() - started) * 1000, 1)
+    report = bot_registry.reconcile(containers, _reattach_or_restart, MEMORY_LABEL)
+    report["docker_list_ms"] = list_ms
+    report["startup_ms"] = round(bot_registry.load_ms + (time.perf_counter() - started) * 1000, 1)
+    app.logger.info(f"Registry reconciled: {report}")
+    return report
 
 @app.route("/logs", methods=["POST"])
 @require_master_key
 @parse_json_body(required_fields=["userId", "botoraloBotId"])
 def logs():
     bot_id = request.data_json["botoraloBotId"]
+    try:
+        framing = _request_framing()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return _sse_response(_follow_event_stream(bot_id, "[info] Bot not found or stopped", framing), framing)
 
-    def event_stream():
-        container = get_container(bot_id)
-        if not container:
-            yield "data: [info] Bot not found or stopped\n\n"
-            return
-
-        # Send last 100 lines
-        past_logs = container.logs(stream=False, tail=100).decode("utf-8", errors="replace")
-        for line in past_logs.splitlines():
-            yield f"data: {line}\n\n"
-
-        # --- LIVE STREAM FIX ---
-        buffer = ""
-        for chunk in container.logs(stream=True, follow=True):
-            text = chunk.decode("utf-8", errors="replace")
-            buffer += text
-            while "\n" in buffer:
-                line, buffer = buffer.split("\n", 1)
-                line = line.strip()
-                if line:
-                    yield f"data: {line}\n\n"
-
-        # Flush any trailing text
-        if buffer.strip():
-            yield f"data: {buffer.strip()}\n\n"
+@app.route("/logs/followers", methods=["GET"])
+@require_master_key
+def log_followers_stats():
+    return jsonify(log_followers.stats())
 
-    return Response(
-        stream_with_context(event_stream()),
-        mimetype="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-            "X-Accel-Buffering": "no",
-        },
-    )
 
+@app.route("/logs/governors", methods=["GET"])
+@require_master_key
+def log_governors_stats():
+    with log_governors_lock:
+        governors = list(log_governors.items())
+    bots = {}
+    for (bot_id, source), governor in governors:
+        bots.setdefault(bot_id, {})[source] = governor.stats()
+    return jsonify({"default": LOG_RATE_DEFAULT, "policy": LOG_RATE_POLICY, "sample_every": LOG_SAMPLE_EVERY,
+                    "read_factor": LOG_READ_FACTOR, "bots": bots})
 
 @app.route("/logs2", methods=["POST"])
 @require_master_key
 @parse_json_body(required_fields=["userId", "botoraloBotId"])
 def logs2():
     botoralo_bot_id = request.data_json["botoraloBotId"]
-    active_connections[botoralo_bot_id] += 1
-    def event_stream():
-        q = log_buffers.setdefault(botoralo_bot_id, Queue())
-        history = log_history.setdefault(botoralo_bot_id, deque(maxlen=100))
-        for line in list(history):   # Only lines from current run
-            yield f"data: {line}\n\n"
-        last_message_time = time.time()
+    try:
+        framing = _request_framing()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    _wake_for_request(botoralo_bot_id)
+    return _sse_response(_broker_event_stream(get_log_broker(botoralo_bot_id), framing), framing)
+
+@app.route("/logs/range", methods=["POST"])
+@require_master_key
+@parse_json_body(required_fields=["userId", "botoraloBotId"])
+def logs_range():
+    data = request.data_json
+    bot_id = data["botoraloBotId"]
+    try:
+        since = float(data["since"]) if data.get("since") is not None else None
+        until = float(data["until"]) if data.get("until") is not None else None
+        after_seq = int(data["after_seq"]) if data.get("after_seq") is not None else None
+        limit = max(1, min(int(data.get("limit", 1000)), 10000))
+    except (TypeError, ValueError):
+        return jsonify({"error": "'since'/'until' must be unix timestamps, 'after_seq'/'limit' integers"}), 400
+    if not os.path.isdir(os.path.join(LOG_STORE_DIR, str(bot_id))):
+        return jsonify({"lines": [], "next_after_seq": after_seq})
+    records = get_log_store(bot_id).range(since=since, until=until, after_seq=after_seq, limit=limit)
+    return jsonify({
+        "lines": [{"seq": seq, "t": ts, "line": line} for seq, ts, line in records],
+        # Pass back as after_seq to fetch the next page.
+        "next_after_seq": records[-1][0] if records else after_seq,
+    })
+
+@app.route("/logs/search", methods=["POST"])
+@require_master_key
+@parse_json_body(required_fields=["userId", "botoraloBotId"])
+def logs_search():
+    data = request.data_json
+    bot_id = data["botoraloBotId"]
+    try:
+        since = float(data["since"]) if data.get("since") is not None else None
+        until = float(data["until"]) if data.get("until") is not None else None
+        before_seq = int(data["before_seq"]) if data.get("before_seq") is not None else None
+        limit = max(1, min(int(data.get("limit", 100)), 1000))
+        errors = max(0, min(int(data.get("errors", 0)), 50))
+        context = max(0, min(int(data.get("context", 3)), 20))
+    except (TypeError, ValueError):
+        return jsonify({"error": "'since'/'until' must be unix timestamps, 'before_seq'/'limit'/'errors'/'context' integers"}), 400
+    level = data.get("level")
+    if level is not None and level not in LEVELS:
+        return jsonify({"error": f"'level' must be one of {', '.join(LEVELS)}"}), 400
+    regex = data.get("regex")
+    if regex:
         try:
-            while True:
-                try:
-                    line = q.get(timeout=5.0)
-                    yield f"data: {line}\n\n"
-                    last_message_time = time.time()
-                except Empty:
-                    yield f"data: [heartbeat] {time.strftime('%H:%M:%S')}\n\n"
-                    if time.time() - last_message_time > 300:
-                        yield f"data: [info] Log stream timeout\n\n"
-                        break
-        finally:
-            active_connections[botoralo_bot_id] -= 1
-            if active_connections[botoralo_bot_id] <= 0:
-                log_buffers.pop(botoralo_bot_id, None)
-                active_connections.pop(botoralo_bot_id, None)
-    return Response(
-        stream_with_context(event_stream()),
-        mimetype='text/event-stream',
-        headers={"Cache-Control": "no-cache", "Connection": "keep-alive", "X-Accel-Buffering": "no"}
+            re.compile(regex)
+        except re.error as e:
+            return jsonify({"error": f"Invalid regex: {e}"}), 400
+    if not os.path.isdir(os.path.join(LOG_STORE_DIR, str(bot_id))):
+        empty = {"lines": [], "next_before_seq": None, "scanned": 0}
+        return jsonify({**empty, "error_blocks": []} if errors else empty)
+    index = get_log_index(bot_id)
+    started = time.time()
+    lines, next_before_seq, scanned = index.search(
+        query=data.get("query"), regex=regex, level=level, case_sensitive=bool(data.get("case_sensitive")),
+        since=since, until=until, before_seq=before_seq, limit=limit,
     )
+    result = {
+        "lines": [{"seq": seq, "t": ts, "line": line} for seq, ts, line in lines],
+        # Pass back as before_seq for the next, older page; null once there is nothing older.
+        "next_before_seq": next_before_seq,
+        "scanned": scanned,
+        "took_ms": round((time.time() - started) * 1000, 2),
+    }
+    if errors:
+        result["error_blocks"] = [
+            {"kind": kind, "first_seq": first_seq, "last_seq": last_seq,
+             "lines": [{"seq": seq, "t": ts, "line": line} for seq, ts, line in records]}
+            for kind, first_seq, last_seq, records in index.error_blocks(errors, context, since=since, until=until)
+        ]
+    return jsonify(result)
+
+@app.route("/logs/download", methods=["POST"])
+@require_master_key
+@parse_json_body(required_fields=["userId", "botoraloBotId"])
+def logs_download():
+    data = request.data_json
+    bot_id = data["botoraloBotId"]
+    try:
+        since = float(data["since"]) if data.get("since") is not None else None
+        until = float(data["until"]) if data.get("until") is not None else None
+    except (TypeError, ValueError):
+        return jsonify({"error": "'since'/'until' must be unix timestamps"}), 400
+    encoding = data.get("encoding", "gzip")
+    if encoding not in ("gzip", "zstd") or not codec_available(encoding):
+        return jsonify({"error": f"Unsupported encoding {encoding!r}"}), 400
+    extension = "gz" if encoding == "gzip" else "zst"
+    headers = {"Content-Disposition": f'attachment; filename="{bot_id}.log.{extension}"'}
+    mimetype = "application/gzip" if encoding == "gzip" else "application/zstd"
+    if not os.path.isdir(os.path.join(LOG_STORE_DIR, str(bot_id))):
+        return Response(empty_archive(encoding), mimetype=mimetype, headers=headers)
+    # Archived segments inside the range go out as stored; only the edges are compressed here.
+    chunks, info = get_log_store(bot_id).download(since=since, until=until, codec=encoding, level=LOG_ARCHIVE_LEVEL)
+    headers["X-Log-Segments"] = str(info["segments"])
+    headers["X-Log-Segments-Passthrough"] = str(info["passthrough"])
+    return Response(stream_with_context(chunks), mimetype=mimetype, headers=headers)
 
 @app.route('/logs_raw', methods=['POST'])
 @require_master_key
 @parse_json_body(required_fields=["userId", "botoraloBotId"])
 def logs_raw():
     botoralo_bot_id = request.data_json["botoraloBotId"]
-    def event_stream():
+    try:
+        framing = _request_framing()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    event_stream = _follow_event_stream(botoralo_bot_id, "[info] Bot is not running or does not exist.", framing)
+    return _sse_response(event_stream, framing)
+
+def _probe_nodes():
+    node_status = {}
+    for name, node in nodes.items():
         try:
-            container = get_container(botoralo_bot_id)
-            if not container:
-                yield 'data: [info] Bot is not running or does not exist.\n\n'
-                return
-            past_logs = container.logs(stream=False, tail=100).decode('utf-8', errors='replace')
-            for line in past_logs.splitlines():
-                yield f"data: {line}\n\n"
-            for chunk in container.logs(stream=True, follow=True):
-                yield f"data: {chunk.decode('utf-8', errors='replace').strip()}\n\n"
-        except Exception as e:
-            yield f"data: [error] Stream error: {str(e)}\n\n"
-    response = Response(stream_with_context(event_stream()), mimetype='text/event-stream')
-    response.headers["Cache-Control"] = "no-cache"
-    response.headers["Connection"] = "keep-alive"
-    response.headers["X-Accel-Buffering"] = "no"
-    return response
+            node.client.ping()
+            node_status[name] = "ok"
+        except Exception:
+            node_status[name] = "not connected"
+    return node_status
+
+# Load balancers poll /_health; they read the prober's last result instead of pinging Docker.
+health_prober = HealthProber(_probe_nodes, interval=HEALTH_PROBE_INTERVAL)
 
 @app.route("/_health")
 def health():
-    try:
-        docker_client.ping()
-        return jsonify({"status": "ok", "docker": "ok"})
-    except Exception:
-        return jsonify({"status": "error", "docker": "not connected"}), 503
+    node_status, checked_at, probe_ms, stale = health_prober.get()
+    probe = {"checked_at": checked_at, "probe_ms": probe_ms, "stale": stale}
+    if stale or not node_status or node_status.get(primary_node.name) != "ok":
+        return jsonify({"status": "error", "docker": "not connected", "nodes": node_status, **probe}), 503
+    return jsonify({"status": "ok", "docker": "ok", "index": primary_node.index.stats(), "nodes": node_status,
+                    **probe})
+
+@metrics.collector
+def _log_metrics():
+    with log_brokers_lock:
+        brokers = list(log_brokers.items())
+    with log_stores_lock:
+        stores = list(log_stores.items())
+    followers = log_followers.stats()
+    with log_governors_lock:
+        governors = list(log_governors.items())
+    yield Family("botoralo_log_lines_total", "counter", "Log lines published since the backend started.",
+                 [({"bot": bot_id}, broker.next_seq) for bot_id, broker in brokers])
+    yield Family("botoralo_log_bytes_total", "counter", "Log line bytes stored since the backend started.",
+                 [({"bot": bot_id}, store.bytes_appended) for bot_id, store in stores])
+    yield Family("botoralo_log_subscribers", "gauge", "Open log streams per bot.",
+                 [({"bot": bot_id, "source": "broker"}, broker.subscribers) for bot_id, broker in brokers]
+                 + [({"bot": bot_id, "source": "follower"}, f["subscribers"]) for bot_id, f in followers["bots"].items()])
+    yield Family("botoralo_log_queue_depth", "gauge", "Lines the slowest follower subscriber is behind.",
+                 [({"bot": bot_id}, f["max_lag"]) for bot_id, f in followers["bots"].items()])
+    yield Family("botoralo_log_archived_bytes_total", "counter", "Log segment bytes archived, before and after compression.",
+                 [({"state": "raw"}, sum(store.archived_raw_bytes for _, store in stores)),
+                  ({"state": "compressed"}, sum(store.archived_bytes for _, store in stores))])
+    yield Family("botoralo_log_archive_cpu_seconds_total", "counter", "CPU time spent compressing log segments.",
+                 [({}, sum(store.archive_seconds for _, store in stores))])
+    yield Family("botoralo_log_dropped_lines_total", "counter",
+                 "Bot output lines not published: over the rate limit, or folded into a repeat count.",
+                 [({"bot": bot_id, "source": source, "reason": "rate_limit"}, g.dropped_lines) for (bot_id, source), g in governors]
+                 + [({"bot": bot_id, "source": source, "reason": "repeated"}, g.collapsed) for (bot_id, source), g in governors])
+    yield Family("botoralo_log_sampled_lines_total", "counter", "Lines kept as samples while over the rate limit.",
+                 [({"bot": bot_id, "source": source}, g.sampled) for (bot_id, source), g in governors])
+    yield Family("botoralo_log_throttled_seconds_total", "counter", "Time log readers waited to apply backpressure.",
+                 [({"bot": bot_id, "source": source}, g.throttled_s) for (bot_id, source), g in governors])
+    yield Family("botoralo_log_upstream_connections", "gauge", "Open Docker log follow streams.",
+                 [({}, followers["upstream_connections"])])
+
+@metrics.collector
+def _process_metrics():
+    deploys = deploy_queue.stats()
+    admitted = admission.stats()
+    yield Family("botoralo_threads", "gauge", "Live Python threads.", [({}, threading.active_count())])
+    yield Family("botoralo_deploys_pending", "gauge", "Deploys queued or running.", [({}, deploys["pending"])])
+    yield Family("botoralo_deploys_total", "counter", "Finished deploys.",
+                 [({"status": "succeeded"}, deploys["completed"]), ({"status": "failed"}, deploys["failed"])])
+    yield Family("botoralo_admission_queue_depth", "gauge", "Operations waiting for admission.",
+                 [({}, admitted["queue_depth"])])
+    yield Family("botoralo_admission_units_in_use", "gauge", "Admission units held.", [({}, admitted["in_use"])])
+    node_status, _, _, _ = health_prober.get()
+    yield Family("botoralo_docker_up", "gauge", "Whether the last health probe reached the node.",
+                 [({"node": name}, int(status == "ok")) for name, status in (node_status or {}).items()])
+
+@app.route("/metrics", methods=["GET"])
+@require_master_key
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
+def _log_retention_loop():
+    # Rolling a segment applies retention too; this catches bots that have gone quiet.
+    while True:
+        time.sleep(600)
+        with log_stores_lock:
+            stores = list(log_stores.values())
+        for store in stores:
+            try:
+                store.enforce_retention()
+            except Exception as e:
+                app.logger.warning(f"Log retention failed for {store.directory}: {e}")
+        with log_stores_lock:
+            indexes = list(log_indexes.values())
+        for index in indexes:
+            index.prune(index.store.stats()["first_seq"])
+
+def _log_archive_loop():
+    while True:
+        store = log_archive_queue.get()
+        try:
+            store.archive_sealed(LOG_ARCHIVE_CODEC, LOG_ARCHIVE_LEVEL)
+        except Exception as e:
+            app.logger.warning(f"Log archival failed for {store.directory}: {e}")
+
+def start_background_services():
+    health_prober.start()
+    _reconcile_registry()
+    threading.Thread(target=_reattached_exec_loop, name="reattach-exec-watch", daemon=True).start()
+    for node in nodes.values():
+        node.index.start()
+    threading.Thread(target=_log_retention_loop, name="log-retention", daemon=True).start()
+    if LOG_ARCHIVE_CODEC != "none":
+        threading.Thread(target=_log_archive_loop, name="log-archive", daemon=True).start()
+    warm_pool.start()
+    resource_sampler.start()
+    hibernator.start()
+    if ASYNC_LOG_PORT:
+        # aiohttp is only needed when the async log server is enabled.
+        from log_sse_server import LogStreamServer
+        LogStreamServer(
+            MASTER_BACKEND_KEY, get_log_broker, log_followers, _get_container_awake, replay_lines=LOG_REPLAY_LINES,
+            broker_only=lambda bot_id: bool(_shared_runtime_of(bot_id)), batch_ms=SSE_BATCH_MS,
+            batch_bytes=SSE_BATCH_BYTES,
+        ).start(FLASK_HOST, ASYNC_LOG_PORT)
 
 
 # --- Main execution ---
@@ -495,6 +2169,9 @@ if __name__ == '__main__':
     print(f"Starting Flask worker on {FLASK_HOST}:{FLASK_PORT}")
     print(f"Storing bot code under: {BOTS_DIR}")
     print("WARNING: This is a development server. Do not use in a production environment.")
-    app.run(host=FLAST_HOST, port=FLASK_PORT, debug=True)
+    # debug=True runs this file twice under the reloader; only the serving child starts workers.
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_background_services()
+    app.run(host=FLASK_HOST, port=FLASK_PORT, debug=True)
 
     
\ No newline at end of file
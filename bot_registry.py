@@ -0,0 +1,176 @@
+import time
+import sqlite3
+import threading
+
+COLUMNS = ("bot_id", "runtime", "entrypoint", "content_hash", "dep_hash", "memory_mb", "desired_state",
+           "container_id", "exec_id", "started_at", "node", "hibernated", "hibernated_mb", "shared_runtime", "updated_at")
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS bots (
+    bot_id TEXT PRIMARY KEY,
+    runtime TEXT,
+    entrypoint TEXT,
+    content_hash TEXT,
+    dep_hash TEXT,
+    memory_mb INTEGER,
+    desired_state TEXT NOT NULL DEFAULT 'stopped',
+    container_id TEXT,
+    exec_id TEXT,
+    started_at REAL,
+    node TEXT,
+    hibernated TEXT,
+    hibernated_mb REAL,
+    shared_runtime TEXT,
+    updated_at REAL NOT NULL
+)
+"""
+UPSERT = (f"INSERT OR REPLACE INTO bots ({', '.join(COLUMNS)}) "
+          f"VALUES ({', '.join('?' for _ in COLUMNS)})")
+
+
+class BotRegistry:
+    """Every deployed bot's runtime, entrypoint, hashes, memory tier and desired state, kept across restarts.
+
+    Rows live in SQLite (WAL, synchronous=NORMAL, so a write is one append
+    to the log) and are all loaded into memory on open: reads never touch the
+    database, writes go through to it.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        started = time.perf_counter()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(SCHEMA)
+        existing = {row[1] for row in self._db.execute("PRAGMA table_info(bots)")}
+        for column in COLUMNS:
+            if column not in existing:
+                # Registries from before the column existed.
+                self._db.execute(f"ALTER TABLE bots ADD COLUMN {column}")
+        self._rows = {
+            row[0]: dict(zip(COLUMNS, row))
+            for row in self._db.execute(f"SELECT {', '.join(COLUMNS)} FROM bots")
+        }
+        self.load_ms = round((time.perf_counter() - started) * 1000, 1)
+        self.last_reconcile = None
+
+    def get(self, bot_id):
+        with self._lock:
+            row = self._rows.get(bot_id)
+            return dict(row) if row else None
+
+    def all(self):
+        with self._lock:
+            return {bot_id: dict(row) for bot_id, row in self._rows.items()}
+
+    def _merge(self, bot_id, fields):
+        unknown = set(fields) - set(COLUMNS[1:-1])
+        if unknown:
+            raise ValueError(f"Unknown registry fields: {', '.join(sorted(unknown))}")
+        row = self._rows.get(bot_id) or dict.fromkeys(COLUMNS)
+        row = {**row, **fields, "bot_id": bot_id, "updated_at": time.time()}
+        row["desired_state"] = row["desired_state"] or "stopped"
+        return row
+
+    def update(self, bot_id, **fields):
+        with self._lock:
+            row = self._merge(bot_id, fields)
+            self._db.execute(UPSERT, [row[c] for c in COLUMNS])
+            self._rows[bot_id] = row
+            return dict(row)
+
+    def update_many(self, updates: dict):
+        """{bot_id: fields}, written in one transaction."""
+        with self._lock:
+            rows = {bot_id: self._merge(bot_id, fields) for bot_id, fields in updates.items()}
+            with self._db:
+                self._db.execute("BEGIN")
+                self._db.executemany(UPSERT, ([row[c] for c in COLUMNS] for row in rows.values()))
+            self._rows.update(rows)
+
+    def restore(self, row):
+        """Writes back a row as get() returned it, e.g. the one a failed redeploy started from."""
+        with self._lock:
+            row = {**row, "updated_at": time.time()}
+            self._db.execute(UPSERT, [row[c] for c in COLUMNS])
+            self._rows[row["bot_id"]] = row
+
+    def forget(self, bot_id):
+        with self._lock:
+            self._rows.pop(bot_id, None)
+            self._db.execute("DELETE FROM bots WHERE bot_id = ?", (bot_id,))
+
+    def reconcile(self, containers: dict, attach, memory_label: str = None):
+        """Compares desired state with what Docker reports, once, at startup.
+
+        `containers` is {bot_id: container list summary} from one list call
+        per node, each summary tagged with its "Node". Containers with no row
+        are adopted (their state becomes the desired state); changed container
+        ids and nodes are recorded. attach(bot_id, row) is called for every bot
+        that should be running and is (or is paused by hibernation), so its log
+        capture can be re-attached.
+        Nothing is started or stopped here.
+        """
+        started = time.perf_counter()
+        report = {"registered": 0, "adopted": 0, "reattached": 0, "missing": 0,
+                  "exited": 0, "unexpected_running": 0, "stopped": 0, "hibernated": 0}
+        updates = {}
+        with self._lock:
+            rows = dict(self._rows)
+        for bot_id, summary in containers.items():
+            row = rows.get(bot_id)
+            if row is None:
+                labels = summary.get("Labels") or {}
+                memory = labels.get(memory_label) if memory_label else None
+                updates[bot_id] = {
+                    "desired_state": "running" if summary.get("State") == "running" else "stopped",
+                    "memory_mb": int(memory) if memory else None,
+                    "container_id": summary.get("Id"),
+                    "node": summary.get("Node"),
+                }
+                report["adopted"] += 1
+            elif row["container_id"] != summary.get("Id") or row["node"] != summary.get("Node", row["node"]):
+                updates[bot_id] = {"container_id": summary.get("Id"), "node": summary.get("Node", row["node"])}
+        if updates:
+            self.update_many(updates)
+        for bot_id, row in self.all().items():
+            report["registered"] += 1
+            summary = containers.get(bot_id)
+            running = summary is not None and summary.get("State") == "running"
+            if summary is None:
+                report["missing"] += 1
+            elif row["hibernated"]:
+                report["hibernated"] += 1
+                if row["hibernated"] == "pause" and summary.get("State") == "paused":
+                    # The frozen process's exec is still alive; its output resumes on wake.
+                    attach(bot_id, row)
+            elif row["desired_state"] == "running" and running:
+                attach(bot_id, row)
+                report["reattached"] += 1
+            elif row["desired_state"] == "running":
+                report["exited"] += 1
+            elif running:
+                report["unexpected_running"] += 1
+            else:
+                report["stopped"] += 1
+        report["duration_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        self.last_reconcile = report
+        return report
+
+    def stats(self):
+        with self._lock:
+            desired = {}
+            for row in self._rows.values():
+                desired[row["desired_state"]] = desired.get(row["desired_state"], 0) + 1
+            return {
+                "path": self.path,
+                "bots": len(self._rows),
+                "desired_state": desired,
+                "load_ms": self.load_ms,
+                "last_reconcile": self.last_reconcile,
+            }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,167 @@
+import os
+import re
+import json
+import hashlib
+import posixpath
+import threading
+
+SHA256_RE = re.compile(r"^[0-9a-f]{64}$")
+# Never part of a bot's manifest: installed deps (node_modules is a symlink into the container's /deps).
+IGNORED_NAMES = {"node_modules", "__pycache__"}
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def safe_relpath(path: str) -> str:
+    """Normalized POSIX path relative to the bot root; ValueError for anything that could escape it."""
+    if not isinstance(path, str) or not path or "\0" in path or "\\" in path:
+        raise ValueError(f"Invalid file path: {path!r}")
+    normalized = posixpath.normpath(path)
+    if normalized.startswith("/") or normalized in (".", "..") or normalized.startswith("../"):
+        raise ValueError(f"File path escapes the bot directory: {path!r}")
+    return normalized
+
+
+def validate_manifest(files) -> dict:
+    """{path: sha256} from a client, with paths normalized; raises ValueError."""
+    if not isinstance(files, dict) or not files:
+        raise ValueError("'files' must be a non-empty object of path -> sha256.")
+    manifest = {}
+    for path, sha in files.items():
+        if not isinstance(sha, str) or not SHA256_RE.match(sha):
+            raise ValueError(f"Invalid sha256 for {path!r}")
+        relpath = safe_relpath(path)
+        if any(part in IGNORED_NAMES for part in relpath.split("/")):
+            raise ValueError(f"File path is reserved: {path!r}")
+        manifest[relpath] = sha
+    return manifest
+
+
+def build_manifest(root: str) -> dict:
+    manifest = {}
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if d not in IGNORED_NAMES and not os.path.islink(os.path.join(dirpath, d))]
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            if os.path.islink(path) or not os.path.isfile(path):
+                continue
+            manifest[os.path.relpath(path, root).replace(os.sep, "/")] = file_sha256(path)
+    return manifest
+
+
+def manifest_digest(manifest: dict) -> str:
+    digest = hashlib.sha256()
+    for path in sorted(manifest):
+        digest.update(f"{path}\0{manifest[path]}\n".encode())
+    return digest.hexdigest()
+
+
+def _make_parent(root: str, relpath: str) -> str:
+    # The bot can create symlinks in its own (mounted) directory; never write through one.
+    current = root
+    for part in relpath.split("/")[:-1]:
+        current = os.path.join(current, part)
+        if os.path.islink(current) or (os.path.exists(current) and not os.path.isdir(current)):
+            raise ValueError(f"Something other than a directory is in the way of {relpath}")
+        if not os.path.exists(current):
+            os.mkdir(current)
+    return current
+
+
+def missing_on_disk(bot_code_dir: str, manifest: dict, uploaded) -> list:
+    """Manifest paths that were not uploaded and whose file on disk doesn't match."""
+    missing = []
+    for relpath, sha in manifest.items():
+        if relpath in uploaded:
+            continue
+        path = os.path.join(bot_code_dir, *relpath.split("/"))
+        if os.path.islink(path) or not os.path.isfile(path) or file_sha256(path) != sha:
+            missing.append(relpath)
+    return sorted(missing)
+
+
+def apply_delta(staging_dir: str, bot_code_dir: str, manifest: dict, uploaded) -> dict:
+    """Moves the uploaded files into place and deletes files the manifest no longer lists.
+
+    Writes happen in place (the directory is bind-mounted into a running
+    container, so it must not be replaced), each file via an atomic rename.
+    Returns {"written": n, "deleted": n}.
+    """
+    os.makedirs(bot_code_dir, exist_ok=True)
+    written = deleted = 0
+    for relpath in uploaded:
+        dest = os.path.join(_make_parent(bot_code_dir, relpath), relpath.split("/")[-1])
+        if os.path.isdir(dest) and not os.path.islink(dest):
+            raise ValueError(f"A directory is in the way of {relpath}")
+        os.replace(os.path.join(staging_dir, *relpath.split("/")), dest)
+        written += 1
+    for relpath in build_manifest(bot_code_dir):
+        if relpath not in manifest:
+            os.remove(os.path.join(bot_code_dir, *relpath.split("/")))
+            deleted += 1
+    for dirpath, dirnames, filenames in os.walk(bot_code_dir, topdown=False):
+        if dirpath != bot_code_dir and not dirnames and not filenames and not os.path.islink(dirpath):
+            os.rmdir(dirpath)
+    return {"written": written, "deleted": deleted}
+
+
+class ManifestStore:
+    """Last deployed manifest per bot, with its digest and dependency hash, as one JSON file each."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._cache = {}        # bot_id -> record
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, bot_id):
+        return os.path.join(self.directory, f"{bot_id}.json")
+
+    def load(self, bot_id):
+        with self._lock:
+            if bot_id in self._cache:
+                return self._cache[bot_id]
+        try:
+            with open(self._path(bot_id)) as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            record = None
+        with self._lock:
+            self._cache[bot_id] = record
+        return record
+
+    def save(self, bot_id, files: dict, dep_hash: str):
+        record = {"files": files, "digest": manifest_digest(files), "dep_hash": dep_hash}
+        tmp_path = self._path(bot_id) + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(record, f)
+        os.replace(tmp_path, self._path(bot_id))
+        with self._lock:
+            self._cache[bot_id] = record
+        return record
+
+    def forget(self, bot_id):
+        with self._lock:
+            self._cache.pop(bot_id, None)
+        try:
+            os.remove(self._path(bot_id))
+        except OSError:
+            pass
+
+    def diff(self, bot_id, files: dict):
+        """(paths the backend needs uploaded, paths it will delete)."""
+        record = self.load(bot_id) or {"files": {}}
+        current = record["files"]
+        missing = sorted(path for path, sha in files.items() if current.get(path) != sha)
+        deleted = sorted(path for path in current if path not in files)
+        return missing, deleted
+
+    def digest(self, bot_id):
+        record = self.load(bot_id)
+        return record["digest"] if record else None
@@ -0,0 +1,180 @@
+import time
+import threading
+import logging
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+
+def _iso(time_nano):
+    return datetime.fromtimestamp(time_nano / 1e9, tz=timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+class ContainerState:
+    __slots__ = ("id", "name", "status", "labels", "started_at", "finished_at",
+                 "exit_code", "oom_killed", "oom_count", "pid", "updated_at")
+
+    def __init__(self, container_id, name, status, labels=None):
+        self.id = container_id
+        self.name = name
+        self.status = status
+        self.labels = labels or {}
+        self.started_at = None
+        self.finished_at = None
+        self.exit_code = None
+        self.oom_killed = False
+        self.oom_count = 0
+        self.pid = None
+        self.updated_at = time.time()
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class ContainerIndex:
+    """In-process view of every bot container, kept current from the Docker event stream.
+
+    Seeded with one list call; after that create/start/die/oom/destroy/rename
+    events keep it up to date, so lookups never touch the Docker socket.
+    `ready` is False until the event consumer is running; callers fall back
+    to asking Docker directly until then (or after the stream drops).
+    """
+
+    def __init__(self, docker_api, name_prefix: str):
+        self.docker_api = docker_api
+        self.name_prefix = name_prefix
+        self.ready = False
+        self.events_seen = 0
+        self.reconnects = 0
+        self._by_name = {}      # container name -> ContainerState
+        self._by_id = {}        # container id -> ContainerState
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def start(self):
+        threading.Thread(target=self._run, name="container-index", daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+
+    def seed(self):
+        summaries = self.docker_api.containers(all=True, filters={"name": f"^/{self.name_prefix}"})
+        by_name, by_id = {}, {}
+        for summary in summaries:
+            name = summary["Names"][0].lstrip("/")
+            state = ContainerState(summary["Id"], name, summary.get("State"), summary.get("Labels"))
+            by_name[name] = by_id[state.id] = state
+        with self._lock:
+            self._by_name, self._by_id = by_name, by_id
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                since = int(time.time())
+                self.seed()
+                events = self.docker_api.events(since=since, decode=True, filters={"type": "container"})
+                self.ready = True
+                for event in events:
+                    self.apply(event)
+                    if self._stop.is_set():
+                        break
+            except Exception as e:
+                logger.warning(f"Docker event stream lost: {e}")
+            self.ready = False
+            self.reconnects += 1
+            self._stop.wait(1.0)
+
+    def apply(self, event):
+        action = event.get("Action", event.get("status", ""))
+        actor = event.get("Actor", {})
+        attrs = actor.get("Attributes", {})
+        container_id = actor.get("ID") or event.get("id")
+        time_nano = event.get("timeNano") or int(event.get("time", time.time()) * 1e9)
+        self.events_seen += 1
+        with self._lock:
+            state = self._by_id.get(container_id)
+            if action == "create":
+                name = attrs.get("name", "")
+                if not name.startswith(self.name_prefix):
+                    return
+                labels = {k: v for k, v in attrs.items() if k not in ("name", "image")}
+                state = ContainerState(container_id, name, "created", labels)
+                self._by_id[container_id] = self._by_name[name] = state
+                return
+            if action == "rename":
+                # Pooled containers are renamed into bot containers when claimed.
+                old_name = attrs.get("oldName", "").lstrip("/")
+                new_name = attrs.get("name", "")
+                if state is None:
+                    if not new_name.startswith(self.name_prefix):
+                        return
+                    labels = {k: v for k, v in attrs.items() if k not in ("name", "oldName", "image")}
+                    state = ContainerState(container_id, new_name, "running", labels)
+                    self._by_id[container_id] = state
+                self._by_name.pop(old_name, None)
+                if new_name.startswith(self.name_prefix):
+                    state.name = new_name
+                    self._by_name[new_name] = state
+                else:
+                    self._by_id.pop(container_id, None)
+                return
+            if state is None:
+                return
+            state.updated_at = time.time()
+            if action == "start":
+                state.status = "running"
+                state.started_at = _iso(time_nano)
+                state.oom_killed = False
+                state.pid = None
+            elif action == "die":
+                state.status = "exited"
+                state.finished_at = _iso(time_nano)
+                if "exitCode" in attrs:
+                    state.exit_code = int(attrs["exitCode"])
+                state.pid = None
+            elif action == "oom":
+                state.oom_killed = True
+                state.oom_count += 1
+            elif action == "pause":
+                state.status = "paused"
+            elif action == "unpause":
+                state.status = "running"
+            elif action == "destroy":
+                self._by_id.pop(container_id, None)
+                if self._by_name.get(state.name) is state:
+                    del self._by_name[state.name]
+
+    def get(self, name):
+        with self._lock:
+            return self._by_name.get(name)
+
+    def fill_details(self, state):
+        """One-time inspect for fields the list summary doesn't carry (StartedAt, Pid, ...)."""
+        attrs = self.docker_api.inspect_container(state.id)
+        docker_state = attrs.get("State", {})
+        with self._lock:
+            state.started_at = state.started_at or docker_state.get("StartedAt")
+            state.finished_at = state.finished_at or docker_state.get("FinishedAt")
+            if state.exit_code is None and docker_state.get("Status") == "exited":
+                state.exit_code = docker_state.get("ExitCode")
+            state.oom_killed = state.oom_killed or bool(docker_state.get("OOMKilled"))
+            if state.status == "running":
+                state.pid = docker_state.get("Pid")
+            if "botoralo.memory_mb" not in state.labels:
+                memory = attrs.get("HostConfig", {}).get("Memory", 0)
+                state.labels["botoralo.memory_mb"] = str(int(memory / 1024 / 1024))
+        return state
+
+    def running(self):
+        with self._lock:
+            return [state for state in self._by_name.values() if state.status == "running"]
+
+    def stats(self):
+        with self._lock:
+            containers = len(self._by_name)
+        return {
+            "ready": self.ready,
+            "containers": containers,
+            "events_seen": self.events_seen,
+            "reconnects": self.reconnects,
+        }
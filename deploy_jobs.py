@@ -0,0 +1,185 @@
+import os
+import time
+import uuid
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+DEPLOY_STAGES = ("upload", "extract", "create", "install", "start")
+
+
+class DeployQueueFull(RuntimeError):
+    pass
+
+
+class DeployJob:
+    def __init__(self, bot_id: str, debug: bool = False, on_stage_end=None):
+        self.id = uuid.uuid4().hex
+        self.bot_id = bot_id
+        self.debug = debug
+        self.on_stage_end = on_stage_end    # (stage, status, seconds), e.g. for metrics
+        self.status = "queued"          # queued -> running -> succeeded | failed
+        self.stage = None
+        self.stages = OrderedDict((name, {"status": "pending"}) for name in DEPLOY_STAGES)
+        self.result = {}
+        self.error = None
+        self.trace = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.version = 0
+        self._cond = threading.Condition()
+
+    @property
+    def done(self):
+        return self.status in ("succeeded", "failed")
+
+    def _changed(self):
+        self.version += 1
+        self._cond.notify_all()
+
+    def begin_stage(self, name: str):
+        with self._cond:
+            if self.status == "queued" and name != "upload":
+                self.status = "running"
+                self.started_at = time.time()
+            self.stage = name
+            self.stages[name] = {"status": "running", "started_at": time.time()}
+            self._changed()
+
+    def end_stage(self, name: str, status: str = "done", **extra):
+        with self._cond:
+            entry = self.stages[name]
+            entry["status"] = status
+            if "started_at" in entry:
+                seconds = time.time() - entry["started_at"]
+                entry["duration_ms"] = round(seconds * 1000, 1)
+                if self.on_stage_end:
+                    self.on_stage_end(name, status, seconds)
+            entry.update(extra)
+            self._changed()
+
+    def skip_stage(self, name: str):
+        with self._cond:
+            self.stages[name] = {"status": "skipped"}
+            self._changed()
+
+    def succeed(self, **result):
+        with self._cond:
+            self.result.update(result)
+            self.status = "succeeded"
+            self.stage = None
+            self.finished_at = time.time()
+            self._changed()
+
+    def fail(self, error: str, trace: str = None):
+        with self._cond:
+            if self.stage and self.stages[self.stage]["status"] == "running":
+                self.stages[self.stage]["status"] = "failed"
+                if self.on_stage_end:
+                    self.on_stage_end(self.stage, "failed", time.time() - self.stages[self.stage]["started_at"])
+            self.status = "failed"
+            self.error = error
+            self.trace = trace if self.debug else None
+            self.finished_at = time.time()
+            self._changed()
+
+    def wait_for_change(self, version: int, timeout: float) -> int:
+        with self._cond:
+            if self.version == version and not self.done:
+                self._cond.wait(timeout)
+            return self.version
+
+    def to_dict(self):
+        with self._cond:
+            data = {
+                "jobId": self.id,
+                "botoraloBotId": self.bot_id,
+                "status": self.status,
+                "stage": self.stage,
+                "stages": {name: dict(entry) for name, entry in self.stages.items()},
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+            }
+            data.update(self.result)
+            if self.error:
+                data["error"] = self.error
+            if self.trace:
+                data["trace"] = self.trace
+            return data
+
+
+class DeployQueue:
+    """Bounded pool of deploy workers; jobs past max_pending are rejected instead of piling up."""
+
+    def __init__(self, max_workers: int = None, max_pending: int = None, history: int = 500, on_stage_end=None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_pending = max_pending or self.max_workers * 4
+        self.history = history
+        self.on_stage_end = on_stage_end
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="deploy")
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()      # job_id -> DeployJob, oldest first
+        self._latest = {}               # bot_id -> job_id
+        self._pending = 0
+        self.completed = 0
+        self.failed = 0
+
+    def reserve(self, bot_id: str, debug: bool = False) -> DeployJob:
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise DeployQueueFull(f"Deploy queue is full ({self._pending} pending)")
+            self._pending += 1
+            job = DeployJob(bot_id, debug=debug, on_stage_end=self.on_stage_end)
+            self._jobs[job.id] = job
+            self._latest[bot_id] = job.id
+            self._trim()
+            return job
+
+    def release(self, job: DeployJob):
+        # Give back a reservation for a job that never made it to the executor.
+        with self._lock:
+            self._pending -= 1
+
+    def submit(self, job: DeployJob, fn, *args):
+        self._executor.submit(self._run, job, fn, *args)
+
+    def _run(self, job, fn, *args):
+        try:
+            fn(job, *args)
+        finally:
+            with self._lock:
+                self._pending -= 1
+                if job.status == "failed":
+                    self.failed += 1
+                else:
+                    self.completed += 1
+
+    def _trim(self):
+        while len(self._jobs) > self.history:
+            oldest_id, oldest = next(iter(self._jobs.items()))
+            if not oldest.done:
+                break
+            del self._jobs[oldest_id]
+            if self._latest.get(oldest.bot_id) == oldest_id:
+                del self._latest[oldest.bot_id]
+
+    def get(self, job_id: str):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def latest_for_bot(self, bot_id: str):
+        with self._lock:
+            job_id = self._latest.get(bot_id)
+            return self._jobs.get(job_id) if job_id else None
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "max_pending": self.max_pending,
+                "pending": self._pending,
+                "completed": self.completed,
+                "failed": self.failed,
+            }
@@ -0,0 +1,152 @@
+import os
+import json
+import time
+import hashlib
+import threading
+import logging
+import docker
+
+from warm_pool import POOL_LABEL
+
+logger = logging.getLogger(__name__)
+
+DEPS_IMAGE_REPO = "botoralo-deps"
+
+
+def _normalized_requirements(raw: bytes) -> bytes:
+    lines = []
+    for line in raw.decode("utf-8", errors="replace").splitlines():
+        line = line.split("#", 1)[0].strip()
+        if line:
+            lines.append(line)
+    return "\n".join(lines).encode()
+
+
+def dependency_manifest_hash(bot_code_dir: str, runtime: str, base_image: str) -> str:
+    """Hash of everything that decides what the install step produces."""
+    digest = hashlib.sha256()
+    digest.update(f"{base_image}\0{runtime}\0".encode())
+    if runtime == "python":
+        path = os.path.join(bot_code_dir, "requirements.txt")
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                digest.update(_normalized_requirements(f.read()))
+        else:
+            digest.update(b"<default>")
+    else:
+        found = False
+        for name in ("package.json", "package-lock.json"):
+            path = os.path.join(bot_code_dir, name)
+            if os.path.exists(path):
+                found = True
+                digest.update(f"\0{name}\0".encode())
+                with open(path, "rb") as f:
+                    digest.update(f.read())
+        if not found:
+            digest.update(b"<default>")
+    return digest.hexdigest()
+
+
+class DepsImageCache:
+    """Post-install containers committed as images, tagged by dependency hash, evicted LRU by disk budget."""
+
+    def __init__(self, docker_client, index_path: str, budget_bytes: int, repository: str = DEPS_IMAGE_REPO):
+        self.docker_client = docker_client
+        self.index_path = index_path
+        self.budget_bytes = budget_bytes
+        self.repository = repository
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._entries = self._load()    # dep_hash -> {"tag", "size", "created_at", "last_used"}
+
+    def _load(self):
+        try:
+            with open(self.index_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self):
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._entries, f)
+        os.replace(tmp_path, self.index_path)
+
+    def tag_for(self, dep_hash: str) -> str:
+        return f"{self.repository}:{dep_hash[:32]}"
+
+    def lookup(self, dep_hash: str):
+        """Image tag to create the container from, or None on a miss."""
+        if self.budget_bytes <= 0:
+            return None
+        with self._lock:
+            entry = self._entries.get(dep_hash)
+            if entry:
+                try:
+                    self.docker_client.images.get(entry["tag"])
+                except docker.errors.ImageNotFound:
+                    # Removed behind our back (docker image prune, etc.)
+                    del self._entries[dep_hash]
+                    self._save()
+                    entry = None
+            if not entry:
+                self.misses += 1
+                return None
+            self.hits += 1
+            entry["last_used"] = time.time()
+            self._save()
+            return entry["tag"]
+
+    def store(self, container, dep_hash: str, base_image: str):
+        if self.budget_bytes <= 0:
+            return None
+        tag = self.tag_for(dep_hash)
+        repository, image_tag = tag.split(":", 1)
+        # A container claimed from the warm pool still carries the pool label; clear
+        # it so bots started from this image aren't taken for idle pool containers.
+        image = container.commit(repository=repository, tag=image_tag, changes=[f"LABEL {POOL_LABEL}="])
+        size = image.attrs.get("Size", 0)
+        try:
+            size -= self.docker_client.images.get(base_image).attrs.get("Size", 0)
+        except docker.errors.ImageNotFound:
+            pass
+        now = time.time()
+        with self._lock:
+            self._entries[dep_hash] = {"tag": tag, "size": max(size, 0), "created_at": now, "last_used": now}
+            self._evict(keep=dep_hash)
+            self._save()
+        return tag
+
+    def _evict(self, keep=None):
+        total = sum(e["size"] for e in self._entries.values())
+        for dep_hash, entry in sorted(self._entries.items(), key=lambda kv: kv[1]["last_used"]):
+            if total <= self.budget_bytes:
+                break
+            if dep_hash == keep:
+                continue
+            try:
+                self.docker_client.images.remove(entry["tag"])
+            except docker.errors.ImageNotFound:
+                pass
+            except docker.errors.APIError as e:
+                # Still referenced by a bot container; try the next one.
+                logger.info(f"Keeping cached image {entry['tag']}: {e}")
+                continue
+            del self._entries[dep_hash]
+            total -= entry["size"]
+            self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "images": len(self._entries),
+                "bytes": sum(e["size"] for e in self._entries.values()),
+                "budget_bytes": self.budget_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,538 @@
+import re
+import json
+import time
+import queue
+import random
+import threading
+import itertools
+from collections import Counter
+
+import docker
+
+# An in-memory stand-in for the parts of the Docker daemon the backend uses, for
+# load benchmarks without a daemon or network. Containers don't run anything: an
+# exec'd bot process prints `log_rate` lines a second until its container stops. Each
+# line starts with the time it was printed, so readers can measure delivery latency.
+# Execs started without stream=True are quick commands; the shared-runtime scripts
+# (prepare, stop, read) get plausible output so shared mode can run here too.
+
+
+def _parse_mem_limit(value) -> int:
+    if isinstance(value, int):
+        return value
+    match = re.match(r"^(\d+)([bkmg]?)$", str(value).lower())
+    if not match:
+        return 0
+    return int(match.group(1)) * {"": 1, "b": 1, "k": 1024, "m": 1024 ** 2, "g": 1024 ** 3}[match.group(2)]
+
+
+def _iso(ts):
+    return time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(ts)) + f".{int(ts % 1 * 1e9):09d}Z" if ts else ""
+
+
+class FakeImage:
+    def __init__(self, tag: str, size: int):
+        self.tags = [tag]
+        self.attrs = {"Size": size}
+
+
+class FakeExec:
+    def __init__(self, exec_id, container, cmd):
+        self.id = exec_id
+        self.container = container
+        self.cmd = cmd
+        self.running = False
+        self.stopped = False        # ended by the shared-runtime stop script
+        self.exit_code = None
+
+    @property
+    def argv(self):
+        return list(self.cmd) if isinstance(self.cmd, (list, tuple)) else str(self.cmd).split()
+
+
+class FakeContainer:
+    """A container model; every method acts on the daemon's state, like a docker-py Container bound to a client."""
+
+    def __init__(self, daemon, container_id, name, image, labels, memory_bytes):
+        self._daemon = daemon
+        self.id = container_id
+        self.name = name
+        self.image = image
+        self.labels = dict(labels or {})
+        self.memory_bytes = memory_bytes
+        self.status = "created"
+        self.started_at = None
+        self.finished_at = None
+        self.exit_code = None
+        # Resident memory this container settles at, as a share of its limit.
+        self.usage_share = random.uniform(0.2, 0.6)
+        self.cpu_usec = 0
+        self.net_bytes = 0
+        self.output = []            # lines (bytes) written to the container's stdout
+        self.output_times = []      # when each entry of `output` was written
+        self.output_cond = threading.Condition()
+
+    @property
+    def attrs(self):
+        return {
+            "Id": self.id,
+            "Name": f"/{self.name}",
+            "State": {
+                "Status": self.status,
+                "Running": self.status == "running",
+                "Paused": self.status == "paused",
+                "Pid": None,
+                "StartedAt": _iso(self.started_at),
+                "FinishedAt": _iso(self.finished_at),
+                "ExitCode": self.exit_code or 0,
+                "OOMKilled": False,
+            },
+            "HostConfig": {"Memory": self.memory_bytes},
+            "Config": {"Labels": dict(self.labels), "Image": self.image},
+        }
+
+    def _live(self):
+        return self._daemon._container(self.id)
+
+    def start(self):
+        self._daemon._start(self._live())
+
+    def stop(self, timeout=10):
+        self._daemon._stop(self._live())
+
+    def restart(self, timeout=10):
+        container = self._live()
+        self._daemon._stop(container)
+        self._daemon._start(container)
+
+    def pause(self):
+        container = self._live()
+        if container.status != "running":
+            raise docker.errors.APIError(f"Container {self.id} is not running")
+        self._daemon._set_status(container, "paused", "pause")
+
+    def unpause(self):
+        container = self._live()
+        if container.status != "paused":
+            raise docker.errors.APIError(f"Container {self.id} is not paused")
+        self._daemon._set_status(container, "running", "unpause")
+
+    def remove(self, force=False):
+        self._daemon._remove(self._live(), force)
+
+    def rename(self, name):
+        self._daemon._rename(self._live(), name)
+
+    def reload(self):
+        self._live()
+
+    def exec_run(self, cmd, **kwargs):
+        return self._daemon._exec_run(self._live(), cmd)
+
+    def commit(self, repository=None, tag=None, **kwargs):
+        return self._daemon._commit(self._live(), f"{repository}:{tag}")
+
+    def stats(self, stream=False, **kwargs):
+        return self._daemon.api.stats(self.id, stream=stream)
+
+    def logs(self, **kwargs):
+        return self._daemon.api.logs(self.id, **kwargs)
+
+    def put_archive(self, path, data):
+        self._daemon._call("put_archive")
+        self._live()
+        return True
+
+
+class FakeContainers:
+    def __init__(self, daemon):
+        self._daemon = daemon
+
+    def get(self, name_or_id):
+        return self._daemon._container(name_or_id)
+
+    def create(self, image, command=None, name=None, mem_limit=None, labels=None, **kwargs):
+        return self._daemon._create(image, name, labels, _parse_mem_limit(mem_limit or 0))
+
+    def run(self, image, command=None, remove=False, **kwargs):
+        # Only the package cache helper uses this; it's a throwaway download container.
+        self._daemon._call("run")
+        time.sleep(self._daemon.install_latency)
+        return b""
+
+    def list(self, all=False, filters=None):
+        return [c for c in self._daemon._list(all, filters)]
+
+    def prepare_model(self, attrs):
+        return self._daemon._container(attrs["Id"])
+
+
+class FakeImages:
+    def __init__(self, daemon):
+        self._daemon = daemon
+
+    def get(self, tag):
+        with self._daemon._lock:
+            image = self._daemon.images.get(tag)
+        if image is None:
+            raise docker.errors.ImageNotFound(f"No such image: {tag}")
+        return image
+
+    def remove(self, tag, **kwargs):
+        with self._daemon._lock:
+            if self._daemon.images.pop(tag, None) is None:
+                raise docker.errors.ImageNotFound(f"No such image: {tag}")
+
+
+class FakeClient:
+    """docker.DockerClient surface."""
+
+    def __init__(self, daemon):
+        self.api = daemon.api
+        self.containers = FakeContainers(daemon)
+        self.images = FakeImages(daemon)
+
+    def ping(self):
+        return self.api.ping()
+
+
+class FakeAPI:
+    """docker.APIClient surface."""
+
+    def __init__(self, daemon):
+        self._daemon = daemon
+
+    def request(self, method, url, *args, **kwargs):
+        raise NotImplementedError("FakeDocker has no HTTP transport")
+
+    def ping(self):
+        self._daemon._call("ping")
+        return True
+
+    def info(self):
+        self._daemon._call("info")
+        return {"MemTotal": self._daemon.memory_mb * 1024 * 1024, "NCPU": self._daemon.cpus}
+
+    def containers(self, all=False, filters=None):
+        self._daemon._call("list")
+        return [
+            {"Id": c.id, "Names": [f"/{c.name}"], "State": c.status, "Labels": dict(c.labels)}
+            for c in self._daemon._list(all, filters)
+        ]
+
+    def inspect_container(self, container):
+        self._daemon._call("inspect")
+        return self._daemon._container(container).attrs
+
+    def stats(self, container, stream=False, one_shot=None):
+        daemon = self._daemon
+        daemon._call("stats")
+        time.sleep(daemon.stats_latency)
+        c = daemon._container(container)
+        if c.status == "running":
+            # Enough activity that a running bot never looks idle to the hibernator.
+            c.cpu_usec += int(daemon.cpu_percent * 10_000)
+            c.net_bytes += 4096
+        usage = int(c.memory_bytes * c.usage_share) if c.status in ("running", "paused") else 0
+        return {
+            "memory_stats": {"usage": usage, "limit": c.memory_bytes},
+            "cpu_stats": {"cpu_usage": {"total_usage": c.cpu_usec * 1000}},
+            "blkio_stats": {"io_service_bytes_recursive": []},
+            "networks": {"eth0": {"rx_bytes": c.net_bytes, "tx_bytes": c.net_bytes // 4}},
+        }
+
+    def logs(self, container, stream=False, follow=False, tail="all", since=None, **kwargs):
+        daemon = self._daemon
+        daemon._call("logs")
+        c = daemon._container(container)
+        with c.output_cond:
+            start = len(c.output) if tail == 0 else max(0, len(c.output) - tail) if isinstance(tail, int) else 0
+            if since is not None:
+                start = max(start, next((i for i, t in enumerate(c.output_times) if t >= float(since)),
+                                        len(c.output)))
+        if not stream:
+            with c.output_cond:
+                return b"".join(c.output[start:])
+        return daemon._follow_output(c, start, follow)
+
+    def events(self, since=None, decode=True, filters=None):
+        return self._daemon._subscribe_events()
+
+    def exec_create(self, container, cmd, **kwargs):
+        daemon = self._daemon
+        daemon._call("exec_create")
+        time.sleep(daemon.exec_latency)
+        c = daemon._container(container)
+        if c.status != "running":
+            raise docker.errors.APIError(f"Container {c.id} is not running")
+        exec_id = f"exec-{next(daemon._ids):012x}"
+        with daemon._lock:
+            daemon.execs[exec_id] = FakeExec(exec_id, c, cmd)
+        return {"Id": exec_id}
+
+    def exec_start(self, exec_id, stream=False, demux=False, **kwargs):
+        daemon = self._daemon
+        daemon._call("exec_start")
+        exec_ = daemon._exec(exec_id)
+        exec_.running = True
+        if stream:
+            return daemon._run_exec(exec_, demux)
+        output = daemon._exec_output(exec_)
+        return (output, None) if demux else output
+
+    def exec_inspect(self, exec_id):
+        self._daemon._call("exec_inspect")
+        exec_ = self._daemon._exec(exec_id)
+        return {"ID": exec_id, "Running": exec_.running, "ExitCode": exec_.exit_code}
+
+
+class FakeDocker:
+    """One fake daemon. `client` and `api` stand in for docker.DockerClient and docker.APIClient.
+
+    Latencies are seconds slept inside the matching call. `calls` counts
+    Engine API operations, so a benchmark can see how often it hit "Docker".
+    """
+
+    def __init__(self, log_rate: float = 10.0, log_line_bytes: int = 80, stats_latency: float = 0.005,
+                 create_latency: float = 0.05, start_latency: float = 0.02, exec_latency: float = 0.002,
+                 install_latency: float = 0.2, cpu_percent: float = 2.0, memory_mb: int = 65536, cpus: int = 16,
+                 images=("bot_runtime:latest",)):
+        self.log_rate = log_rate
+        self.log_line_bytes = log_line_bytes
+        self.stats_latency = stats_latency
+        self.create_latency = create_latency
+        self.start_latency = start_latency
+        self.exec_latency = exec_latency
+        self.install_latency = install_latency
+        self.cpu_percent = cpu_percent
+        self.memory_mb = memory_mb
+        self.cpus = cpus
+        self.calls = Counter()
+        self.containers = {}        # id -> FakeContainer
+        self.names = {}             # name -> id
+        self.execs = {}             # exec id -> FakeExec
+        self.images = {tag: FakeImage(tag, 500 * 1024 * 1024) for tag in images}
+        self._ids = itertools.count(random.randrange(1 << 32))
+        self._subscribers = []      # event queues
+        self._lock = threading.RLock()
+        self.api = FakeAPI(self)
+        self.client = FakeClient(self)
+
+    def install(self):
+        """Makes docker.from_env(), docker.APIClient() and docker.DockerClient() return this daemon's clients.
+
+        Call before importing bot_backend, which connects at import time.
+        """
+        docker.from_env = lambda *args, **kwargs: self.client
+        docker.APIClient = lambda *args, **kwargs: self.api
+        docker.DockerClient = lambda *args, **kwargs: self.client
+
+    # --- Internals the models call ---
+    def _call(self, op):
+        self.calls[op] += 1
+
+    def _container(self, name_or_id):
+        with self._lock:
+            container_id = self.names.get(name_or_id, name_or_id)
+            container = self.containers.get(container_id)
+        if container is None:
+            raise docker.errors.NotFound(f"No such container: {name_or_id}")
+        return container
+
+    def _exec(self, exec_id):
+        with self._lock:
+            exec_ = self.execs.get(exec_id)
+        if exec_ is None:
+            raise docker.errors.NotFound(f"No such exec instance: {exec_id}")
+        return exec_
+
+    def _list(self, all, filters):
+        filters = filters or {}
+        name_re = re.compile(filters["name"]) if "name" in filters else None
+        with self._lock:
+            containers = list(self.containers.values())
+        return [
+            c for c in containers
+            if (all or c.status == "running")
+            and (name_re is None or name_re.search(f"/{c.name}"))
+            and ("label" not in filters or filters["label"] in c.labels)
+        ]
+
+    def _emit(self, action, container, **attributes):
+        event = {
+            "Type": "container", "Action": action, "status": action, "id": container.id,
+            "Actor": {"ID": container.id, "Attributes": {**container.labels, "name": container.name,
+                                                          "image": container.image, **attributes}},
+            "time": int(time.time()), "timeNano": time.time_ns(),
+        }
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            subscriber.put(event)
+
+    def _subscribe_events(self):
+        self._call("events")
+        events = queue.Queue()
+        with self._lock:
+            self._subscribers.append(events)
+        try:
+            while True:
+                yield events.get()
+        finally:
+            with self._lock:
+                self._subscribers.remove(events)
+
+    def _create(self, image, name, labels, memory_bytes):
+        self._call("create")
+        time.sleep(self.create_latency)
+        with self._lock:
+            if image not in self.images:
+                raise docker.errors.ImageNotFound(f"No such image: {image}")
+            if name in self.names:
+                raise docker.errors.APIError(f"Conflict. The container name \"/{name}\" is already in use")
+            container = FakeContainer(self, f"{next(self._ids):064x}", name, image, labels, memory_bytes)
+            self.containers[container.id] = container
+            self.names[name] = container.id
+        self._emit("create", container)
+        return container
+
+    def _set_status(self, container, status, action, **attributes):
+        with container.output_cond:
+            container.status = status
+            container.output_cond.notify_all()
+        self._emit(action, container, **attributes)
+
+    def _start(self, container):
+        self._call("start")
+        time.sleep(self.start_latency)
+        if container.status == "running":
+            return
+        container.started_at = time.time()
+        self._set_status(container, "running", "start")
+
+    def _stop(self, container):
+        self._call("stop")
+        if container.status not in ("running", "paused"):
+            return
+        container.finished_at = time.time()
+        container.exit_code = 137
+        self._set_status(container, "exited", "die", exitCode="137")
+
+    def _remove(self, container, force):
+        self._call("remove")
+        if container.status in ("running", "paused"):
+            if not force:
+                raise docker.errors.APIError(f"You cannot remove a running container {container.id}")
+            self._stop(container)
+        with self._lock:
+            self.containers.pop(container.id, None)
+            if self.names.get(container.name) == container.id:
+                del self.names[container.name]
+        self._emit("destroy", container)
+
+    def _rename(self, container, name):
+        self._call("rename")
+        with self._lock:
+            if name in self.names:
+                raise docker.errors.APIError(f"Conflict. The container name \"/{name}\" is already in use")
+            old_name = container.name
+            del self.names[old_name]
+            container.name = name
+            self.names[name] = container.id
+        self._emit("rename", container, oldName=f"/{old_name}")
+
+    def _exec_run(self, container, cmd):
+        self._call("exec_run")
+        if container.status != "running":
+            raise docker.errors.APIError(f"Container {container.id} is not running")
+        text = " ".join(cmd) if isinstance(cmd, (list, tuple)) else str(cmd)
+        # Dependency installs are the only slow exec_run; everything else is a quick shell command.
+        time.sleep(self.install_latency if ("install" in text or "ci" in text.split()) else self.exec_latency)
+        return 0, b""
+
+    def _commit(self, container, tag):
+        self._call("commit")
+        image = FakeImage(tag, 600 * 1024 * 1024)
+        with self._lock:
+            self.images[tag] = image
+        return image
+
+    def _follow_output(self, container, start, follow):
+        position = start
+        while True:
+            with container.output_cond:
+                if position >= len(container.output) and follow and container.status in ("running", "paused"):
+                    container.output_cond.wait(1.0)
+                chunks = container.output[position:]
+                position += len(chunks)
+                ended = not follow or container.status not in ("running", "paused") or container.id not in self.containers
+            for chunk in chunks:
+                yield chunk
+            if ended and position >= len(container.output):
+                return
+
+    def _run_exec(self, exec_, demux):
+        container = exec_.container
+        text = " ".join(exec_.cmd) if isinstance(exec_.cmd, (list, tuple)) else str(exec_.cmd)
+        to_container_stdout = "/proc/1/fd/1" in text     # the backend redirects bot output to the container log
+        tick = max(1.0 / self.log_rate, 0.05) if self.log_rate > 0 else 1.0
+        per_tick = self.log_rate * tick
+        owed = 0.0
+        line = 0
+        try:
+            while container.status in ("running", "paused") and container.id in self.containers and not exec_.stopped:
+                time.sleep(tick)
+                if container.status == "paused":
+                    continue
+                owed += per_tick
+                count, owed = int(owed), owed - int(owed)
+                if not count:
+                    continue
+                lines = []
+                for _ in range(count):
+                    line += 1
+                    prefix = f"{time.time():.6f} line {line} "
+                    lines.append((prefix + "x" * max(0, self.log_line_bytes - len(prefix) - 1) + "\n").encode())
+                if to_container_stdout:
+                    with container.output_cond:
+                        container.output.extend(lines)
+                        container.output_times.extend([time.time()] * len(lines))
+                        container.output_cond.notify_all()
+                else:
+                    chunk = b"".join(lines)
+                    yield (chunk, None) if demux else chunk
+        finally:
+            exec_.running = False
+            exec_.exit_code = 137 if container.status != "running" or exec_.stopped else 0
+
+    def _launched(self, container):
+        # Shared-runtime bot processes in `container`: running execs of the launch script, by bot id.
+        with self._lock:
+            execs = list(self.execs.values())
+        return {e.argv[4]: e for e in execs
+                if e.container is container and e.running and e.argv[3:4] == ["launch"] and len(e.argv) > 4}
+
+    def _exec_output(self, exec_):
+        container = exec_.container
+        time.sleep(self.exec_latency)
+        argv = exec_.argv
+        try:
+            if argv[3:4] == ["stop"] and len(argv) > 4:
+                launched = self._launched(container).get(argv[4])
+                if launched is None:
+                    return b"not_running\n"
+                launched.stopped = True
+                return b"stopped\n"
+            if argv[:2] == ["python3", "-c"]:
+                # The read script: cumulative counters per shared bot process.
+                return json.dumps({
+                    bot_id: {"mem_bytes": int(16 * 1024 * 1024 * container.usage_share), "cpu_usec": 0,
+                             "blk_read": 0, "blk_write": 0, "net_rx": 0, "net_tx": 0, "procs": 1, "limits": "soft"}
+                    for bot_id in self._launched(container)
+                }).encode()
+            if "subtree_control" in " ".join(argv):
+                return b"soft\n"       # the prepare script: no writable cgroup fs here
+            return b""
+        finally:
+            exec_.running = False
+            exec_.exit_code = 0
@@ -0,0 +1,155 @@
+import time
+import threading
+import logging
+from collections import deque
+
+from metrics import percentile
+
+logger = logging.getLogger(__name__)
+
+MODES = ("pause", "stop")
+
+
+def parse_policy(spec: str) -> dict:
+    """"128=stop:3600,512=pause:7200" -> {128: ("stop", 3600.0), 512: ("pause", 7200.0)}.
+
+    Keys are memory tiers (one per plan); tiers not listed never hibernate.
+    """
+    policy = {}
+    for part in (spec or "").split(","):
+        if not part.strip():
+            continue
+        try:
+            tier, _, rule = part.partition("=")
+            mode, _, idle = rule.partition(":")
+            tier, mode, idle = int(tier), mode.strip(), float(idle)
+        except ValueError:
+            raise ValueError(f"Invalid hibernation rule {part.strip()!r}, expected <tier>=<mode>:<idle seconds>")
+        if mode not in MODES:
+            raise ValueError(f"Invalid hibernation mode {mode!r}, expected one of {', '.join(MODES)}")
+        policy[tier] = (mode, idle)
+    return policy
+
+
+class IdleHibernator:
+    """Finds running bots that have been idle for their tier's policy window and hibernates them.
+
+    A bot is active when it logs a line (touch()) or when its sampled CPU or
+    network rate, averaged over the time since the previous sweep, is at or
+    above the thresholds. rows_fn() -> registry rows; usage_fn(bot_id, window)
+    -> averaged sample dict or None if the bot wasn't sampled (not running);
+    hibernate_fn(bot_id, mode, idle_seconds) does the Docker side and returns
+    False if it decided not to. Waking is the backend's job; it reports each
+    wake through record_wake().
+    """
+
+    def __init__(self, policy: dict, rows_fn, usage_fn, hibernate_fn, busy_fn,
+                 cpu_percent: float = 1.0, net_bps: float = 1024.0, interval: float = 60.0, history: int = 512):
+        self.policy = policy
+        self.rows_fn = rows_fn
+        self.usage_fn = usage_fn
+        self.hibernate_fn = hibernate_fn
+        self.busy_fn = busy_fn
+        self.cpu_percent = cpu_percent
+        self.net_bps = net_bps
+        self.interval = interval
+        self.hibernations = {mode: 0 for mode in MODES}
+        self.wakes = {mode: 0 for mode in MODES}
+        self.failures = 0
+        self.last_sweep_ms = 0.0
+        self._last_active = {}      # bot_id -> time of the last log line or busy sample
+        self._last_sweep = None
+        self._wake_ms = {mode: deque(maxlen=history) for mode in MODES}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def start(self):
+        if not self.policy:
+            return
+        threading.Thread(target=self._loop, name="idle-hibernator", daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.warning(f"Idle sweep failed: {e}")
+
+    def touch(self, bot_id, now: float = None):
+        # Called for every published log line, so it only does a dict store.
+        self._last_active[bot_id] = now or time.time()
+
+    def forget(self, bot_id):
+        self._last_active.pop(bot_id, None)
+
+    def sweep(self, now: float = None):
+        """One pass over the registry; returns the bot ids that were hibernated."""
+        now = now or time.time()
+        started = time.perf_counter()
+        window = min(now - self._last_sweep, self.interval * 2) if self._last_sweep else self.interval
+        self._last_sweep = now
+        hibernated = []
+        for bot_id, row in self.rows_fn().items():
+            rule = self.policy.get(row["memory_mb"])
+            if rule is None or row["desired_state"] != "running" or row["hibernated"]:
+                continue
+            usage = self.usage_fn(bot_id, window)
+            if usage is None:
+                continue        # not running
+            if (bot_id not in self._last_active or usage["cpu_percent"] >= self.cpu_percent
+                    or usage["net_rx_bps"] + usage["net_tx_bps"] >= self.net_bps):
+                # First seen since startup, or busy: the idle window starts now.
+                self._last_active[bot_id] = max(self._last_active.get(bot_id, 0), now)
+                continue
+            mode, idle_seconds = rule
+            if now - self._last_active[bot_id] < idle_seconds or self.busy_fn(bot_id):
+                continue
+            try:
+                done = self.hibernate_fn(bot_id, mode, idle_seconds)
+            except Exception as e:
+                self.failures += 1
+                logger.warning(f"Hibernating bot {bot_id} ({mode}) failed: {e}")
+                continue
+            if done:
+                with self._lock:
+                    self.hibernations[mode] += 1
+                hibernated.append(bot_id)
+        self.last_sweep_ms = round((time.perf_counter() - started) * 1000, 1)
+        return hibernated
+
+    def record_wake(self, bot_id, mode: str, seconds: float):
+        self.touch(bot_id)
+        with self._lock:
+            self.wakes[mode] += 1
+            self._wake_ms[mode].append(seconds * 1000)
+
+    def stats(self):
+        hibernated = {mode: 0 for mode in MODES}
+        reclaimed_mb = 0.0
+        for row in self.rows_fn().values():
+            if row["hibernated"] in hibernated:
+                hibernated[row["hibernated"]] += 1
+                if row["hibernated"] == "stop":
+                    # A paused bot's memory stays charged to it; a stopped one's is freed.
+                    reclaimed_mb += row["hibernated_mb"] or 0
+        with self._lock:
+            return {
+                "policy": {str(tier): {"mode": mode, "idle_seconds": idle} for tier, (mode, idle) in self.policy.items()},
+                "hibernated": hibernated,
+                "reclaimed_mb": round(reclaimed_mb, 1),
+                "hibernations": dict(self.hibernations),
+                "wakes": dict(self.wakes),
+                "failures": self.failures,
+                "wake_ms": {
+                    mode: {
+                        "p50": percentile(waits, 0.5, 1),
+                        "p95": percentile(waits, 0.95, 1),
+                        "max": round(max(waits), 1) if waits else None,
+                    }
+                    for mode, waits in self._wake_ms.items()
+                },
+                "last_sweep_ms": self.last_sweep_ms,
+            }
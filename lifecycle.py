@@ -0,0 +1,178 @@
+import os
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import Future
+
+from metrics import percentile
+
+
+class AdmissionTimeout(RuntimeError):
+    pass
+
+
+def host_capacity(mb_per_unit: int = 1024) -> int:
+    """Admission units for this host: one per CPU, but no more than one per `mb_per_unit` of RAM."""
+    cpus = os.cpu_count() or 1
+    try:
+        ram_mb = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") // (1024 * 1024)
+    except (ValueError, OSError, AttributeError):
+        return cpus
+    return max(1, min(cpus, ram_mb // mb_per_unit))
+
+
+class WeightedSemaphore:
+    """FIFO semaphore where each holder takes `weight` of `capacity` units.
+
+    Waiters are admitted strictly in arrival order, so a heavy install at the
+    head of the queue is never starved by a stream of light ones behind it.
+    A weight above capacity is clamped, so one operation can always run alone.
+    """
+
+    def __init__(self, capacity: int, history: int = 512):
+        self.capacity = max(1, capacity)
+        self.in_use = 0
+        self.admitted = 0
+        self.timeouts = 0
+        self._queue = deque()       # tickets, head first
+        self._waiting = {}          # stage -> waiters
+        self._running = {}          # stage -> holders
+        self._waits = {}            # stage -> deque of recent wait times (ms)
+        self._history = history
+        self._cond = threading.Condition()
+
+    @contextmanager
+    def acquire(self, weight: int, stage: str, timeout: float = None):
+        """Yields the seconds spent waiting; raises AdmissionTimeout if not admitted within `timeout`."""
+        weight = min(max(1, weight), self.capacity)
+        ticket = object()
+        started = time.monotonic()
+        with self._cond:
+            self._queue.append(ticket)
+            self._waiting[stage] = self._waiting.get(stage, 0) + 1
+            try:
+                while self._queue[0] is not ticket or self.in_use + weight > self.capacity:
+                    remaining = None if timeout is None else timeout - (time.monotonic() - started)
+                    if remaining is not None and remaining <= 0:
+                        self._queue.remove(ticket)
+                        self.timeouts += 1
+                        self._cond.notify_all()
+                        raise AdmissionTimeout(f"Host is busy: {stage} was not admitted within {timeout:g}s")
+                    self._cond.wait(remaining)
+            finally:
+                self._waiting[stage] -= 1
+            self._queue.popleft()
+            self.in_use += weight
+            self.admitted += 1
+            self._running[stage] = self._running.get(stage, 0) + 1
+            waited = time.monotonic() - started
+            self._waits.setdefault(stage, deque(maxlen=self._history)).append(waited * 1000)
+            # The next waiter may fit in what's left.
+            self._cond.notify_all()
+        try:
+            yield waited
+        finally:
+            with self._cond:
+                self.in_use -= weight
+                self._running[stage] -= 1
+                self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "capacity": self.capacity,
+                "in_use": self.in_use,
+                "queue_depth": len(self._queue),
+                "admitted": self.admitted,
+                "timeouts": self.timeouts,
+                "stages": {
+                    stage: {
+                        "waiting": self._waiting.get(stage, 0),
+                        "running": self._running.get(stage, 0),
+                        "wait_ms_p50": percentile(waits, 0.5, 1),
+                        "wait_ms_p95": percentile(waits, 0.95, 1),
+                        "wait_ms_max": round(max(waits), 1) if waits else None,
+                    }
+                    for stage, waits in self._waits.items()
+                },
+            }
+
+
+class _BotLock:
+    __slots__ = ("lock", "users", "latest")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.users = 0
+        self.latest = None      # (op, Future) of the most recently queued operation
+
+
+class LifecycleCoordinator:
+    """One lifecycle operation at a time per bot (deploy, start, stop, delete).
+
+    run() takes the bot's mutex for the duration of the operation. With
+    coalesce=True, a call for the same operation as the bot's most recently
+    queued one, while that is still pending or running, doesn't queue again:
+    it waits for and returns the same result (or raises the same error). Only
+    the latest operation is joined, so start, stop, start still ends started.
+    """
+
+    def __init__(self, history: int = 512):
+        self.coalesced = 0
+        self.completed = 0
+        self._bots = {}         # bot_id -> _BotLock, only while someone holds or waits for it
+        self._lock_waits = deque(maxlen=history)
+        self._lock = threading.Lock()
+
+    def run(self, bot_id, op: str, fn, *args, coalesce: bool = False):
+        """Returns (result, coalesced)."""
+        with self._lock:
+            entry = self._bots.get(bot_id)
+            if entry is None:
+                entry = self._bots[bot_id] = _BotLock()
+            if coalesce and entry.latest and entry.latest[0] == op and not entry.latest[1].done():
+                self.coalesced += 1
+                future = entry.latest[1]
+                owner = False
+            else:
+                future = Future()
+                entry.latest = (op, future)
+                entry.users += 1
+                owner = True
+        if not owner:
+            return future.result(), True
+        started = time.monotonic()
+        try:
+            with entry.lock:
+                self._lock_waits.append((time.monotonic() - started) * 1000)
+                try:
+                    result = fn(*args)
+                except BaseException as e:
+                    future.set_exception(e)
+                    raise
+                future.set_result(result)
+                return result, False
+        finally:
+            with self._lock:
+                self.completed += 1
+                entry.users -= 1
+                if entry.users == 0 and self._bots.get(bot_id) is entry:
+                    del self._bots[bot_id]
+
+    def busy(self, bot_id) -> bool:
+        with self._lock:
+            return bot_id in self._bots
+
+    def stats(self):
+        with self._lock:
+            waits = list(self._lock_waits)
+            return {
+                "busy_bots": len(self._bots),
+                "queued_operations": sum(max(0, entry.users - 1) for entry in self._bots.values()),
+                "completed": self.completed,
+                "coalesced": self.coalesced,
+                "lock_wait_ms_p50": percentile(waits, 0.5, 1),
+                "lock_wait_ms_p95": percentile(waits, 0.95, 1),
+                "lock_wait_ms_max": round(max(waits), 1) if waits else None,
+            }
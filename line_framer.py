@@ -0,0 +1,121 @@
+import codecs
+from itertools import repeat
+from collections import namedtuple
+
+# One framed line: which stream it came from, its text, and whether it was cut at max_line_bytes.
+Line = namedtuple("Line", ("stream", "text", "truncated"))
+
+
+class LineFramer:
+    """Splits a byte stream into lines in time linear in the input.
+
+    Chunks are appended to one bytearray; each feed() cuts it at the last
+    b"\\n", decodes and splits the complete part in one pass and drops it with
+    a single del, so no byte is rescanned or recopied per line. The cut is
+    made on bytes before decoding (a newline byte never occurs inside a
+    multibyte UTF-8 sequence), so characters split across chunks come out intact.
+    A line longer than max_line_bytes is emitted truncated, at a character
+    boundary, and the rest of it is discarded up to the next newline, so the
+    buffer never holds more than max_line_bytes.
+    """
+
+    def __init__(self, stream: str = "stdout", max_line_bytes: int = 16384):
+        self.stream = stream
+        self.max_line_bytes = max_line_bytes
+        self.lines = 0
+        self.truncated = 0
+        self.dropped_bytes = 0
+        self._buf = bytearray()
+        self._discarding = False
+        self._decoder = codecs.getincrementaldecoder("utf-8")("replace")
+
+    def _truncated(self, view):
+        # final=False holds back a partial character at the cut instead of emitting U+FFFD.
+        text = self._decoder.decode(view, final=False)
+        self._decoder.reset()
+        self.truncated += 1
+        return Line(self.stream, text, True)
+
+    def _split(self, raw, lines):
+        limit = self.max_line_bytes
+        if len(raw) <= limit:
+            # Fast path: no line can be over the limit, decode once and split in C.
+            text = raw.decode("utf-8", "replace")
+            if "\r" in text:
+                text = text.replace("\r\n", "\n")
+            parts = text.split("\n")
+            lines.extend(map(Line._make, zip(repeat(self.stream, len(parts)), parts, repeat(False))))
+            return
+        for part in raw.split(b"\n"):
+            if len(part) > limit:
+                self.dropped_bytes += len(part) - limit
+                lines.append(self._truncated(memoryview(part)[:limit]))
+            else:
+                text = part.decode("utf-8", "replace")
+                if text.endswith("\r"):
+                    text = text[:-1]
+                lines.append(Line(self.stream, text, False))
+
+    def feed(self, data) -> list:
+        lines = []
+        if not data:
+            return lines
+        if self._discarding:
+            newline = data.find(b"\n")
+            if newline < 0:
+                self.dropped_bytes += len(data)
+                return lines
+            self.dropped_bytes += newline
+            data = memoryview(data)[newline + 1:]
+            self._discarding = False
+        buf = self._buf
+        buffered = len(buf)     # holds no newline, so only the new bytes need searching
+        buf += data
+        end = buf.rfind(b"\n", buffered)
+        if end >= 0:
+            self._split(buf[:end], lines)
+            del buf[:end + 1]
+        if len(buf) > self.max_line_bytes:
+            self.dropped_bytes += len(buf) - self.max_line_bytes
+            with memoryview(buf) as view:
+                lines.append(self._truncated(view[:self.max_line_bytes]))
+            buf.clear()
+            self._discarding = True
+        self.lines += len(lines)
+        return lines
+
+    def flush(self) -> list:
+        """Emits whatever is left without a trailing newline (end of stream)."""
+        lines = []
+        if self._buf and not self._discarding:
+            self._split(self._buf, lines)
+            self.lines += len(lines)
+        self._buf.clear()
+        self._discarding = False
+        return lines
+
+    def stats(self):
+        return {
+            "stream": self.stream,
+            "lines": self.lines,
+            "truncated": self.truncated,
+            "dropped_bytes": self.dropped_bytes,
+            "buffered_bytes": len(self._buf),
+        }
+
+
+class DemuxFramer:
+    """One LineFramer per stream for demuxed (stdout, stderr) chunk pairs, as exec_start(demux=True) yields."""
+
+    def __init__(self, max_line_bytes: int = 16384):
+        self.stdout = LineFramer("stdout", max_line_bytes)
+        self.stderr = LineFramer("stderr", max_line_bytes)
+
+    def feed(self, stdout, stderr) -> list:
+        lines = self.stdout.feed(stdout) if stdout else []
+        if stderr:
+            lines.extend(self.stderr.feed(stderr))
+        return lines
+
+    def flush(self) -> list:
+        return self.stdout.flush() + self.stderr.flush()
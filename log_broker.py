@@ -0,0 +1,102 @@
+import threading
+
+
+class LogBroker:
+    """Per-bot log fan-out: one bounded ring of lines with monotonically increasing sequence numbers.
+
+    Subscribers don't own queues; each just holds an integer cursor (the next
+    seq it wants), so memory is O(capacity) no matter how many are reading.
+    A subscriber that falls more than `capacity` lines behind skips ahead
+    and is told how many lines it missed.
+    """
+
+    def __init__(self, capacity: int = 1000):
+        self.capacity = capacity
+        self.subscribers = 0
+        self._lines = [None] * capacity
+        self._next_seq = 0
+        self._run_start = 0
+        self.closed = False
+        self._closed_event = threading.Event()
+        self._listeners = []
+        self._cond = threading.Condition()
+
+    @property
+    def next_seq(self):
+        return self._next_seq
+
+    def publish(self, line: str):
+        with self._cond:
+            self._lines[self._next_seq % self.capacity] = line
+            self._next_seq += 1
+            self._cond.notify_all()
+            for listener in self._listeners:
+                listener()
+
+    def mark_run(self):
+        """Start of a new bot process; replays only go back this far."""
+        with self._cond:
+            self._run_start = self._next_seq
+
+    def replay_cursor(self, lines: int) -> int:
+        with self._cond:
+            oldest = max(0, self._next_seq - self.capacity)
+            return max(oldest, self._run_start, self._next_seq - lines)
+
+    def read(self, cursor: int, limit: int = None):
+        """Returns (lines, new_cursor, dropped)."""
+        with self._cond:
+            oldest = max(0, self._next_seq - self.capacity)
+            dropped = 0
+            if cursor < oldest:
+                dropped = oldest - cursor
+                cursor = oldest
+            end = self._next_seq if limit is None else min(self._next_seq, cursor + limit)
+            lines = [self._lines[seq % self.capacity] for seq in range(cursor, end)]
+            return lines, end, dropped
+
+    def wait(self, cursor: int, timeout: float) -> bool:
+        """Block until there is something past `cursor`; False on timeout or close."""
+        with self._cond:
+            if self._next_seq <= cursor and not self.closed:
+                self._cond.wait(timeout)
+            return self._next_seq > cursor
+
+    def wait_closed(self, timeout: float) -> bool:
+        """Block until close() or `timeout`, without waking for each publish; True if closed."""
+        return self._closed_event.wait(timeout)
+
+    def close(self):
+        """No more lines will be published; wakes every waiter."""
+        with self._cond:
+            self.closed = True
+            self._closed_event.set()
+            self._cond.notify_all()
+            for listener in self._listeners:
+                listener()
+
+    def add_listener(self, listener):
+        """listener() is called, under the broker lock, after every publish and on close. Keep it cheap."""
+        with self._cond:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        with self._cond:
+            self._listeners.remove(listener)
+
+    def subscribe(self):
+        with self._cond:
+            self.subscribers += 1
+
+    def unsubscribe(self):
+        with self._cond:
+            self.subscribers -= 1
+
+    def stats(self):
+        with self._cond:
+            return {
+                "capacity": self.capacity,
+                "next_seq": self._next_seq,
+                "buffered": min(self._next_seq, self.capacity),
+                "subscribers": self.subscribers,
+            }
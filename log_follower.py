@@ -0,0 +1,210 @@
+import time
+import threading
+import logging
+
+from log_broker import LogBroker
+from line_framer import LineFramer
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    """One SSE client's cursor into a shared follower."""
+
+    def __init__(self, follower, cursor: int):
+        self.follower = follower
+        self.cursor = cursor
+        self.delivered = 0
+        self.dropped = 0
+        self.opened_at = time.time()
+
+    @property
+    def lag(self):
+        return max(0, self.follower.broker.next_seq - self.cursor)
+
+    def read(self, timeout: float):
+        """Returns (lines, dropped), waiting up to `timeout` when caught up."""
+        broker = self.follower.broker
+        lines, self.cursor, dropped = broker.read(self.cursor)
+        if not lines and not dropped and broker.wait(self.cursor, timeout):
+            lines, self.cursor, dropped = broker.read(self.cursor)
+        self.delivered += len(lines)
+        self.dropped += dropped
+        return lines, dropped
+
+    @property
+    def finished(self):
+        """The upstream has ended and everything it produced has been read."""
+        return self.follower.broker.closed and self.cursor >= self.follower.broker.next_seq
+
+    def close(self):
+        self.follower.hub._unsubscribe(self)
+
+
+class LogFollower:
+    """A single Docker follow stream for one bot, framed into lines and published to a LogBroker."""
+
+    def __init__(self, hub, bot_id):
+        self.hub = hub
+        self.bot_id = bot_id
+        self.broker = LogBroker(hub.capacity)
+        self.governor = None
+        self.subscriptions = set()
+        self.bytes = 0
+        self.opened_at = time.time()
+        self._stream = None
+        self._closing = False
+
+    def start(self):
+        threading.Thread(target=self._run, name=f"log-follower-{self.bot_id}", daemon=True).start()
+
+    def _publish(self, lines):
+        for line in lines:
+            text = line.text.strip()
+            if not text:
+                continue
+            text = f"{text} [truncated]" if line.truncated else text
+            if self.governor is None:
+                self.broker.publish(text)
+            else:
+                for admitted in self.governor.admit(text):
+                    self.broker.publish(admitted)
+
+    def _run(self):
+        try:
+            if self.hub.governor_fn:
+                self.governor = self.hub.governor_fn(self.bot_id)
+            self._stream = self.hub.open_fn(self.bot_id)
+            if self._stream is None:
+                self.broker.publish("[info] Bot not found or stopped")
+                return
+            self.hub._upstream_opened()
+            framer = LineFramer(max_line_bytes=self.hub.max_line_bytes)
+            for chunk in self._stream:
+                self.bytes += len(chunk)
+                self.hub.upstream_bytes += len(chunk)
+                self._publish(framer.feed(chunk))
+                if self._closing:
+                    break
+                if self.governor is not None:
+                    # Docker keeps the rest in the container's log file until it's read.
+                    delay = self.governor.read_delay(len(chunk))
+                    if delay:
+                        time.sleep(delay)
+            self._publish(framer.flush())
+            if self.governor is not None:
+                for line in self.governor.flush():
+                    self.broker.publish(line)
+        except Exception as e:
+            if not self._closing:
+                self.broker.publish(f"[error] Stream error: {e}")
+        finally:
+            if self._stream is not None:
+                self.hub._upstream_closed()
+            self.broker.close()
+            self.hub._follower_ended(self)
+
+    def close(self):
+        self._closing = True
+        stream = self._stream
+        if stream is not None and hasattr(stream, "close"):
+            try:
+                # Closing the socket unblocks the reader thread.
+                stream.close()
+            except Exception as e:
+                logger.debug(f"Closing log stream for {self.bot_id} failed: {e}")
+
+    def stats(self):
+        return {
+            "subscribers": len(self.subscriptions),
+            "upstream_bytes": self.bytes,
+            "next_seq": self.broker.next_seq,
+            "max_lag": max((s.lag for s in self.subscriptions), default=0),
+            "lags": sorted(s.lag for s in self.subscriptions),
+            "age_s": round(time.time() - self.opened_at, 1),
+        }
+
+
+class LogFollowerHub:
+    """At most one upstream Docker log stream per bot, shared by every /logs and /logs_raw client.
+
+    open_fn(bot_id) -> iterator of byte chunks (container.logs(stream=True, follow=True, tail=N)),
+    or None if the bot has no container. The first subscriber opens it; it's
+    closed `linger` seconds after the last one leaves, so a page reload
+    doesn't reconnect. New subscribers replay up to `replay` buffered lines.
+    governor_fn(bot_id), if given, returns the LogGovernor a follower passes
+    the bot's lines through.
+    """
+
+    def __init__(self, open_fn, capacity: int = 1000, replay: int = 100, max_line_bytes: int = 16384,
+                 linger: float = 5.0, governor_fn=None):
+        self.open_fn = open_fn
+        self.governor_fn = governor_fn
+        self.capacity = capacity
+        self.replay = replay
+        self.max_line_bytes = max_line_bytes
+        self.linger = linger
+        self.upstream_open = 0
+        self.upstream_opened_total = 0
+        self.upstream_bytes = 0
+        self._followers = {}    # bot_id -> LogFollower
+        self._lock = threading.Lock()
+
+    def subscribe(self, bot_id) -> Subscription:
+        with self._lock:
+            follower = self._followers.get(bot_id)
+            if follower is None or follower.broker.closed:
+                follower = self._followers[bot_id] = LogFollower(self, bot_id)
+                follower.start()
+            subscription = Subscription(follower, follower.broker.replay_cursor(self.replay))
+            follower.subscriptions.add(subscription)
+            return subscription
+
+    def _unsubscribe(self, subscription):
+        follower = subscription.follower
+        with self._lock:
+            follower.subscriptions.discard(subscription)
+            if follower.subscriptions:
+                return
+        timer = threading.Timer(self.linger, self._reap, args=(follower,))
+        timer.daemon = True
+        timer.start()
+
+    def _reap(self, follower):
+        with self._lock:
+            if follower.subscriptions:
+                return
+            if self._followers.get(follower.bot_id) is follower:
+                del self._followers[follower.bot_id]
+        follower.close()
+
+    def _follower_ended(self, follower):
+        with self._lock:
+            if self._followers.get(follower.bot_id) is follower and not follower.subscriptions:
+                del self._followers[follower.bot_id]
+
+    def _upstream_opened(self):
+        with self._lock:
+            self.upstream_open += 1
+            self.upstream_opened_total += 1
+
+    def _upstream_closed(self):
+        with self._lock:
+            self.upstream_open -= 1
+
+    def close(self, bot_id):
+        """Drops a bot's follower now (e.g. on /delete); its subscribers see the stream end."""
+        with self._lock:
+            follower = self._followers.pop(bot_id, None)
+        if follower:
+            follower.close()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "upstream_connections": self.upstream_open,
+                "upstream_opened_total": self.upstream_opened_total,
+                "upstream_bytes": self.upstream_bytes,
+                "subscribers": sum(len(f.subscriptions) for f in self._followers.values()),
+                "bots": {bot_id: f.stats() for bot_id, f in self._followers.items()},
+            }
@@ -0,0 +1,210 @@
+import time
+import threading
+
+
+def parse_rate_policy(spec: str) -> dict:
+    """"128=200:65536,512=1000:262144" -> {128: (200.0, 65536.0), 512: (1000.0, 262144.0)}.
+
+    Keys are memory tiers (one per plan), values lines/s and bytes/s; 0 means unlimited.
+    """
+    policy = {}
+    for part in (spec or "").split(","):
+        if not part.strip():
+            continue
+        try:
+            tier, _, rule = part.partition("=")
+            lines, _, nbytes = rule.partition(":")
+            policy[int(tier)] = (float(lines), float(nbytes))
+        except ValueError:
+            raise ValueError(f"Invalid log rate rule {part.strip()!r}, expected <tier>=<lines/s>:<bytes/s>")
+    return policy
+
+
+class TokenBucket:
+    """Refills at `rate` per second up to `burst`. A rate of 0 never runs out."""
+
+    def __init__(self, rate: float, burst: float, now: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def _refill(self, now):
+        if now > self.updated:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def available(self, amount: float, now: float) -> bool:
+        if not self.rate:
+            return True
+        self._refill(now)
+        return self.tokens >= amount
+
+    def take(self, amount: float):
+        if self.rate:
+            self.tokens -= amount
+
+    def debt(self, amount: float, now: float) -> float:
+        """Takes `amount` even if that goes negative; returns the seconds until the balance is back to zero."""
+        if not self.rate:
+            return 0.0
+        self._refill(now)
+        self.tokens -= amount
+        return -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+
+class LogGovernor:
+    """Ingestion limits for one reader of one bot's output, applied before lines are published.
+
+    admit(line) returns the lines to publish in its place. A line identical
+    to the previous one, within `repeat_window` seconds of it, is held back
+    and counted, and a different line (or flush()) first emits "last message
+    repeated N times". reset() forgets the previous line, e.g. when the bot's
+    process restarts, so its first line is never folded away. Lines within the
+    lines/s and bytes/s token buckets go through. Past them, one line in
+    `sample_every` still does, so the log shows what the bot is printing, and
+    the rest are dropped and reported in a notice at most once per
+    `notice_interval`. read_delay() paces a reader that calls it after every
+    chunk to at most `read_factor` times the byte rate. On an exec stream that
+    is backpressure: when the bot prints faster, its writes block instead of
+    the backend buffering or burning CPU on lines it would drop. A reader of
+    the container log only limits its own work; the bot isn't slowed.
+    Every method takes the governor's lock: a reader thread admits lines while
+    a request thread may reset or reconfigure it, or read its stats.
+    """
+
+    def __init__(self, lines_per_s: float = 0, bytes_per_s: float = 0, burst_seconds: float = 2.0,
+                 sample_every: int = 100, read_factor: float = 4.0, notice_interval: float = 5.0,
+                 repeat_flush: float = 5.0, repeat_window: float = 5.0, clock=time.monotonic):
+        self.clock = clock
+        self.sample_every = sample_every
+        self.read_factor = read_factor
+        self.notice_interval = notice_interval
+        self.repeat_flush = repeat_flush
+        self.repeat_window = repeat_window
+        self.lines_in = 0
+        self.bytes_in = 0
+        self.published = 0
+        self.collapsed = 0          # identical consecutive lines folded into a "repeated" line
+        self.dropped_lines = 0      # over the rate limit and not sampled
+        self.dropped_bytes = 0
+        self.sampled = 0            # over the rate limit but let through as a sample
+        self.throttled_s = 0.0      # time readers were told to wait
+        self._previous = None
+        self._previous_at = 0.0
+        self._repeats = 0
+        self._repeats_since = 0.0
+        self._over = 0
+        self._unreported_lines = 0
+        self._unreported_bytes = 0
+        self._last_notice = float("-inf")
+        self._lock = threading.Lock()
+        self.configure(lines_per_s, bytes_per_s, burst_seconds)
+
+    def configure(self, lines_per_s: float, bytes_per_s: float, burst_seconds: float = 2.0):
+        with self._lock:
+            now = self.clock()
+            self.lines_per_s = lines_per_s
+            self.bytes_per_s = bytes_per_s
+            self._lines = TokenBucket(lines_per_s, max(1.0, lines_per_s * burst_seconds), now)
+            self._bytes = TokenBucket(bytes_per_s, max(1.0, bytes_per_s * burst_seconds), now)
+            read_rate = bytes_per_s * self.read_factor
+            self._read = TokenBucket(read_rate, max(1.0, read_rate * burst_seconds), now)
+
+    @property
+    def limited(self):
+        return bool(self.lines_per_s or self.bytes_per_s)
+
+    def _flush_repeats(self, out):
+        if self._repeats:
+            out.append(f"[info] last message repeated {self._repeats} times")
+            self.published += 1
+            self._repeats = 0
+
+    def _notice(self, out, now, force=False):
+        if self._unreported_lines and (force or now - self._last_notice >= self.notice_interval):
+            out.append(f"[info] log rate limit: dropped {self._unreported_lines} lines "
+                       f"({self._unreported_bytes} bytes), kept 1 in {self.sample_every}")
+            self.published += 1
+            self._unreported_lines = self._unreported_bytes = 0
+            self._last_notice = now
+
+    def admit(self, line: str) -> list:
+        with self._lock:
+            now = self.clock()
+            size = len(line)
+            self.lines_in += 1
+            self.bytes_in += size
+            out = []
+            if line == self._previous and now - self._previous_at <= self.repeat_window:
+                self._previous_at = now
+                self.collapsed += 1
+                self._repeats += 1
+                if now - self._repeats_since >= self.repeat_flush:
+                    # A line repeating for ever still shows up every repeat_flush seconds.
+                    self._flush_repeats(out)
+                    self._repeats_since = now
+                self._notice(out, now)
+                return out
+            self._flush_repeats(out)
+            self._previous = line
+            self._previous_at = now
+            self._repeats_since = now
+            if self._lines.available(1, now) and self._bytes.available(size, now):
+                self._lines.take(1)
+                self._bytes.take(size)
+                self._over = 0
+                out.append(line)
+                self.published += 1
+            else:
+                self._over += 1
+                if self._over % self.sample_every == 1 or self.sample_every == 1:
+                    out.append(line)
+                    self.published += 1
+                    self.sampled += 1
+                else:
+                    self.dropped_lines += 1
+                    self.dropped_bytes += size
+                    self._unreported_lines += 1
+                    self._unreported_bytes += size
+            self._notice(out, now)
+            return out
+
+    def _flush(self):
+        out = []
+        self._flush_repeats(out)
+        self._notice(out, self.clock(), force=True)
+        return out
+
+    def flush(self) -> list:
+        """Pending repeat count and drop notice, e.g. when the stream ends."""
+        with self._lock:
+            return self._flush()
+
+    def reset(self) -> list:
+        """flush(), and forget the previous line so the next one isn't taken for a repeat."""
+        with self._lock:
+            self._previous = None
+            return self._flush()
+
+    def read_delay(self, nbytes: int) -> float:
+        """Seconds the reader should wait after taking in `nbytes` before it reads again."""
+        with self._lock:
+            delay = self._read.debt(nbytes, self.clock())
+            self.throttled_s += delay
+            return delay
+
+    def stats(self):
+        with self._lock:
+            return {
+                "lines_per_s": self.lines_per_s,
+                "bytes_per_s": self.bytes_per_s,
+                "lines_in": self.lines_in,
+                "bytes_in": self.bytes_in,
+                "published": self.published,
+                "collapsed": self.collapsed,
+                "dropped_lines": self.dropped_lines,
+                "dropped_bytes": self.dropped_bytes,
+                "sampled": self.sampled,
+                "throttled_s": round(self.throttled_s, 3),
+            }
@@ -0,0 +1,319 @@
+import re
+import math
+import bisect
+import threading
+from array import array
+
+BLOCK_LINES = 64            # postings name blocks of this many seqs; a query then checks the block's lines
+MAX_TOKEN = 32
+LONG_TOKEN = "\x00long"     # the block has a letter run longer than MAX_TOKEN, which isn't indexed itself
+STDERR_TOKEN = "\x00stderr"
+MAX_ERROR_BLOCKS = 10000
+LEVELS = ("stderr", "error", "traceback")
+
+# Tokens are runs of two or more ASCII letters in the lowercased line. Digits and punctuation
+# split them, so ids, counters and timestamps don't grow the vocabulary. Queries are
+# lowercased and split the same way, so every run in a query lines up with the line's.
+TOKEN_RE = re.compile(r"[a-z]{2,}")
+PREFIX_RE = re.compile(r"\[(stdout|stderr|error|info)\] ?")
+ERROR_RE = re.compile(r"\b(?:ERROR|CRITICAL|FATAL)\b|(?:Error|Exception):|^Unhandled|panicked at")
+ERROR_HINTS = ("ERROR", "CRITICAL", "FATAL", "Error:", "Exception:", "Unhandled", "panicked at")     # cheap pre-check
+TRACEBACK_START = "Traceback (most recent call last):"
+
+
+def _class_end(pattern: str, i: int) -> int:
+    """Index of the "]" closing the character class that opens at pattern[i]."""
+    i += 1
+    if pattern[i:i + 1] == "^":
+        i += 1
+    if pattern[i:i + 1] == "]":
+        i += 1                  # a leading "]" is a literal member
+    while i < len(pattern) and pattern[i] != "]":
+        i += 2 if pattern[i] == "\\" else 1
+    return i
+
+
+def regex_literals(pattern: str):
+    """Literal runs that every match of `pattern` contains; [] when nothing is certain.
+
+    Deliberately conservative: alternation or verbose mode gives up, groups and
+    classes split runs, and a quantified character is dropped from its run.
+    """
+    if "|" in pattern or re.search(r"\(\?[a-zA-Z]*x", pattern):
+        return []
+    literals, current = [], []
+
+    def cut():
+        if current:
+            literals.append("".join(current))
+            current.clear()
+
+    i = 0
+    while i < len(pattern):
+        ch = pattern[i]
+        if ch == "\\":
+            escaped = pattern[i + 1:i + 2]
+            if escaped and not escaped.isalnum():
+                current.append(escaped)
+            else:
+                cut()           # \d, \b, \n, a backreference, ...
+            i += 2
+            continue
+        if ch == "[":
+            cut()
+            i = _class_end(pattern, i)
+        elif ch == "(":
+            cut()
+            depth = 0
+            while i < len(pattern):
+                c = pattern[i]
+                if c == "\\":
+                    i += 1
+                elif c == "[":
+                    i = _class_end(pattern, i)
+                elif c == "(":
+                    depth += 1
+                elif c == ")":
+                    depth -= 1
+                    if depth == 0:
+                        break
+                i += 1
+        elif ch in "*?{":
+            if current:
+                current.pop()   # the quantified character may not be there at all
+            cut()
+            repeat = re.match(r"\{\d*,?\d*\}", pattern[i:]) if ch == "{" else None
+            if repeat:
+                i += len(repeat.group()) - 1
+        elif ch in "+.^$)":
+            cut()
+        else:
+            current.append(ch)
+        i += 1
+    cut()
+    return literals
+
+
+class LogIndex:
+    """Inverted token index over one bot's LogStore, kept up to date as lines are published.
+
+    Postings map each token to the sorted blocks (BLOCK_LINES seqs) it occurs
+    in, so memory grows with distinct tokens per block rather than with lines.
+    A query intersects the blocks every match must fall in and checks only
+    those blocks' lines. Error blocks (an error line or traceback and its
+    indented continuation) are tracked as seq ranges while indexing.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.next_seq = 0
+        self.building = True        # until the first catch_up() has read the store's history
+        self._postings = {}         # token -> array("I") of block numbers
+        self._blocks = []           # [first_seq, last_seq, kind], oldest first
+        self._open = None           # the error block still taking continuation lines
+        self._in_traceback = False
+        self._lock = threading.Lock()
+
+    def _add(self, seq, line):
+        block = seq // BLOCK_LINES
+        index = self._postings
+        for token in set(TOKEN_RE.findall(line.lower())):
+            if len(token) > MAX_TOKEN:
+                token = LONG_TOKEN
+            postings = index.get(token)
+            if postings is None:
+                index[token] = array("I", [block])
+            elif postings[-1] != block:
+                postings.append(block)
+        if line.startswith("[stderr]"):
+            postings = self._postings.setdefault(STDERR_TOKEN, array("I"))
+            if not postings or postings[-1] != block:
+                postings.append(block)
+        self._track_errors(seq, line)
+        self.next_seq = seq + 1
+
+    def _track_errors(self, seq, line):
+        prefix = PREFIX_RE.match(line)
+        payload = line[prefix.end():] if prefix else line
+        continuation = payload[:1] in (" ", "\t")
+        if self._in_traceback:
+            self._open[1] = seq
+            # Frames are indented; the first unindented line is the exception and ends it.
+            self._in_traceback = continuation or not payload
+            if not self._in_traceback:
+                self._open = None
+            return
+        if payload.startswith(TRACEBACK_START):
+            self._start_block(seq, "traceback")
+            self._in_traceback = True
+        elif self._open is not None and continuation:
+            self._open[1] = seq
+        elif ((prefix and prefix.group(1) == "error")
+              or (any(hint in payload for hint in ERROR_HINTS) and ERROR_RE.search(payload))):
+            self._start_block(seq, "error")
+        else:
+            self._open = None
+
+    def _start_block(self, seq, kind):
+        self._open = [seq, seq, kind]
+        self._blocks.append(self._open)
+        if len(self._blocks) > MAX_ERROR_BLOCKS:
+            del self._blocks[0]
+
+    def add(self, seq, line):
+        """Called with each line the store accepted. Lines out of order are read back from the store."""
+        with self._lock:
+            if seq == self.next_seq:
+                self._add(seq, line)
+            elif seq > self.next_seq and not self.building:
+                self._catch_up_locked()
+
+    def _catch_up_locked(self, limit=10000):
+        batch = self.store.range(after_seq=self.next_seq - 1, limit=limit)
+        for seq, _, line in batch:
+            if seq >= self.next_seq:
+                self._add(seq, line)
+        return len(batch) < limit
+
+    def catch_up(self):
+        """Indexes whatever the store holds past next_seq, a batch at a time so publishers aren't held up."""
+        while True:
+            with self._lock:
+                if self._catch_up_locked():
+                    self.building = False
+                    return
+
+    def prune(self, first_seq: int):
+        """Drops postings and error blocks for seqs the store no longer retains."""
+        first_block = first_seq // BLOCK_LINES
+        with self._lock:
+            for token in list(self._postings):
+                postings = self._postings[token]
+                cut = bisect.bisect_left(postings, first_block)
+                if cut == len(postings):
+                    del self._postings[token]
+                elif cut:
+                    del postings[:cut]
+            while self._blocks and self._blocks[0][1] < first_seq:
+                del self._blocks[0]
+
+    def _piece_blocks(self, piece, left_open, right_open):
+        """Blocks that can hold a match of a letter run from the query."""
+        if not left_open and not right_open:
+            return set(self._postings.get(piece if len(piece) <= MAX_TOKEN else LONG_TOKEN, ()))
+        # The run may be part of a longer token in the line: match it against the vocabulary.
+        blocks = set(self._postings.get(LONG_TOKEN, ()))
+        for token, postings in self._postings.items():
+            if ((left_open and right_open and piece in token)
+                    or (left_open and not right_open and token.endswith(piece))
+                    or (right_open and not left_open and token.startswith(piece))):
+                blocks.update(postings)
+        return blocks
+
+    def _candidates(self, literals, stderr):
+        """Sorted blocks every match falls in, or None when the whole range has to be checked."""
+        candidates = None
+        for literal in literals:
+            literal = literal.lower()
+            for m in TOKEN_RE.finditer(literal):
+                blocks = self._piece_blocks(m.group(), m.start() == 0, m.end() == len(literal))
+                candidates = blocks if candidates is None else candidates & blocks
+        if stderr:
+            blocks = set(self._postings.get(STDERR_TOKEN, ()))
+            candidates = blocks if candidates is None else candidates & blocks
+        return None if candidates is None else sorted(candidates)
+
+    def _seq_bounds(self, since, until, before_seq):
+        stats = self.store.stats()
+        first, last = stats["first_seq"], stats["next_seq"]
+        if since is not None:
+            head = self.store.range(since=since, limit=1)
+            first = head[0][0] if head else last
+        if until is not None:
+            tail = self.store.range(since=math.nextafter(until, math.inf), limit=1)
+            last = tail[0][0] if tail else last
+        if before_seq is not None:
+            last = min(last, before_seq)
+        return first, last
+
+    def search(self, query=None, regex=None, level=None, case_sensitive=False,
+               since=None, until=None, before_seq=None, limit=100):
+        """The newest `limit` matching (seq, ts, line), oldest first, plus paging and cost figures.
+
+        Returns (lines, next_before_seq, scanned): next_before_seq is None once
+        there is nothing older to match; scanned counts the lines checked.
+        """
+        checks = []
+        literals = []
+        if query:
+            flags = 0 if case_sensitive else re.IGNORECASE | re.ASCII
+            checks.append(re.compile(re.escape(query), flags).search)
+            literals.append(query)
+        if regex:
+            checks.append(re.compile(regex, 0 if case_sensitive else re.IGNORECASE).search)
+            literals.extend(regex_literals(regex))
+        if level == "stderr":
+            checks.append(lambda line: line.startswith("[stderr]"))
+        self.catch_up()
+        first, last = self._seq_bounds(since, until, before_seq)
+        with self._lock:
+            candidates = self._candidates(literals, level == "stderr")
+            blocks = None
+            if level in ("error", "traceback"):
+                blocks = [(s, e + 1) for s, e, kind in self._blocks if level == "error" or kind == level]
+
+        def ranges():
+            if blocks is not None:
+                for start, end in reversed(blocks):
+                    start, end = max(start, first), min(end, last)
+                    if start >= end:
+                        continue
+                    if candidates is not None:
+                        i = bisect.bisect_left(candidates, start // BLOCK_LINES)
+                        if i == len(candidates) or candidates[i] > (end - 1) // BLOCK_LINES:
+                            continue
+                    yield start, end
+                return
+            if candidates is None:
+                numbers = range((last - 1) // BLOCK_LINES, first // BLOCK_LINES - 1, -1)
+            else:
+                lo = bisect.bisect_left(candidates, first // BLOCK_LINES)
+                hi = bisect.bisect_right(candidates, (last - 1) // BLOCK_LINES)
+                numbers = reversed(candidates[lo:hi])
+            for number in numbers:
+                start, end = max(number * BLOCK_LINES, first), min((number + 1) * BLOCK_LINES, last)
+                if start < end:
+                    yield start, end
+
+        found, scanned = [], 0
+        for records in self.store.read_ranges(ranges()):
+            scanned += len(records)
+            for seq, ts, line in reversed(records):
+                if (since is not None and ts < since) or (until is not None and ts > until):
+                    continue
+                if all(check(line) for check in checks):
+                    found.append((seq, ts, line))
+                    if len(found) >= limit:
+                        return found[::-1], seq, scanned
+        return found[::-1], None, scanned
+
+    def error_blocks(self, count=5, context=3, since=None, until=None):
+        """The last `count` error blocks as (kind, first_seq, last_seq, lines), `context` lines either side."""
+        self.catch_up()
+        first, last = self._seq_bounds(since, until, None)
+        with self._lock:
+            picked = [tuple(b) for b in self._blocks if b[0] >= first and b[0] < last][-count:] if count else []
+        ranges = [(max(first_seq - context, 0), last_seq + 1 + context) for first_seq, last_seq, _ in picked]
+        return [(kind, first_seq, last_seq, records)
+                for (first_seq, last_seq, kind), records in zip(picked, self.store.read_ranges(ranges))]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "next_seq": self.next_seq,
+                "building": self.building,
+                "tokens": len(self._postings),
+                "postings": sum(len(p) for p in self._postings.values()),
+                "postings_bytes": sum(p.itemsize * len(p) for p in self._postings.values()),
+                "error_blocks": len(self._blocks),
+            }
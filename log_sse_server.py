@@ -0,0 +1,265 @@
+import json
+import time
+import asyncio
+import logging
+import resource
+import threading
+
+from aiohttp import web
+
+from sse_framing import parse_framing
+
+logger = logging.getLogger(__name__)
+
+class BrokerWaiter:
+    """Lets coroutines wait on a LogBroker that is published to from other threads.
+
+    The broker listener schedules at most one wake-up on the loop at a time,
+    so a chatty bot costs one loop callback per batch of lines, not one per
+    line per viewer.
+    """
+
+    def __init__(self, loop, broker):
+        self.loop = loop
+        self.broker = broker
+        self.users = 0
+        self._event = asyncio.Event()
+        self._pending = False
+        broker.add_listener(self._notify)
+
+    def _notify(self):
+        # Publisher thread.
+        if not self._pending:
+            self._pending = True
+            self.loop.call_soon_threadsafe(self._wake)
+
+    def _wake(self):
+        self._pending = False
+        event, self._event = self._event, asyncio.Event()
+        event.set()
+
+    async def wait(self, cursor: int, timeout: float) -> bool:
+        """False on timeout (or close) with nothing past `cursor`."""
+        if self.broker.next_seq > cursor or self.broker.closed:
+            return self.broker.next_seq > cursor
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return self.broker.next_seq > cursor
+
+    def detach(self):
+        self.broker.remove_listener(self._notify)
+
+
+def _rss_bytes():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+class LogStreamServer:
+    """aiohttp server for /logs, /logs_raw and /logs2, running on its own event loop thread.
+
+    It lives in the Flask process and reads the same LogBrokers and
+    LogFollowerHub, so there is still one Docker follow stream per watched
+    bot. What changes is the viewer side: each connection is a coroutine
+    holding a cursor instead of a WSGI thread, and heartbeats and idle
+    timeouts are timers on the loop. Bots for which broker_only(bot_id) is
+    true (shared-runtime bots) are served from their broker on /logs too.
+    Requests can ask for batched (and gzipped) events, as on Flask.
+    """
+
+    def __init__(self, master_key, get_log_broker, log_followers, get_container, replay_lines: int = 100,
+                 heartbeat: float = 15.0, idle_timeout: float = 300.0, broker_only=None, batch_ms: int = 50,
+                 batch_bytes: int = 65536):
+        self.master_key = master_key
+        self.get_log_broker = get_log_broker
+        self.log_followers = log_followers
+        self.get_container = get_container
+        self.broker_only = broker_only or (lambda bot_id: False)
+        self.replay_lines = replay_lines
+        self.heartbeat = heartbeat
+        self.idle_timeout = idle_timeout
+        self.batch_ms = batch_ms
+        self.batch_bytes = batch_bytes
+        self.loop = None
+        self.connections = {"logs": 0, "logs_raw": 0, "logs2": 0}
+        self.connections_total = 0
+        self._waiters = {}      # id(broker) -> BrokerWaiter
+        self.app = web.Application()
+        self.app.add_routes([
+            web.post("/logs", self.logs),
+            web.post("/logs_raw", self.logs_raw),
+            web.post("/logs2", self.logs2),
+            web.get("/_async/stats", self.stats),
+        ])
+
+    # --- Waiters ---
+    def _acquire_waiter(self, broker):
+        waiter = self._waiters.get(id(broker))
+        if waiter is None or waiter.broker is not broker:
+            waiter = self._waiters[id(broker)] = BrokerWaiter(self.loop, broker)
+        waiter.users += 1
+        return waiter
+
+    def _release_waiter(self, waiter):
+        waiter.users -= 1
+        if waiter.users == 0:
+            waiter.detach()
+            if self._waiters.get(id(waiter.broker)) is waiter:
+                del self._waiters[id(waiter.broker)]
+
+    # --- Request helpers ---
+    def _authorized(self, request):
+        auth_header = request.headers.get("Authorization", "")
+        if not auth_header.startswith("Bearer "):
+            return False
+        key = auth_header.split(None, 1)[1].strip()
+        return bool(self.master_key) and key == self.master_key
+
+    async def _parse_request(self, request):
+        """(bot_id, SseFraming) from an authorized request's JSON body."""
+        if not self._authorized(request):
+            raise web.HTTPUnauthorized(text='{"error": "Unauthorized: Invalid master key"}',
+                                       content_type="application/json")
+        try:
+            data = await request.json()
+        except Exception:
+            raise web.HTTPBadRequest(text='{"error": "Invalid or missing JSON body"}', content_type="application/json")
+        missing = [f for f in ("userId", "botoraloBotId") if f not in (data or {})]
+        if missing:
+            raise web.HTTPBadRequest(text=f'{{"error": "Missing required fields: {", ".join(missing)}"}}',
+                                     content_type="application/json")
+        try:
+            framing = parse_framing(data, request.headers.get("Accept-Encoding", ""), self.batch_ms, self.batch_bytes)
+        except ValueError as e:
+            raise web.HTTPBadRequest(text=json.dumps({"error": str(e)}), content_type="application/json")
+        return data["botoraloBotId"], framing
+
+    async def _open_stream(self, request, framing):
+        response = web.StreamResponse(headers=framing.headers)
+        response.content_type = "text/event-stream"
+        await response.prepare(request)
+        return response
+
+    # --- Handlers ---
+    async def _follow(self, request, kind, not_found_message):
+        bot_id, framing = await self._parse_request(request)
+        response = await self._open_stream(request, framing)
+        if self.broker_only(bot_id):
+            return await self._stream_broker(response, bot_id, kind, framing)
+        # get_container may fall back to a Docker call; keep it off the loop.
+        if not await self.loop.run_in_executor(None, self.get_container, bot_id):
+            await response.write(framing.encode(framing.info(not_found_message)) + framing.finish())
+            return response
+        subscription = self.log_followers.subscribe(bot_id)
+        broker = subscription.follower.broker
+        waiter = self._acquire_waiter(broker)
+        self.connections[kind] += 1
+        self.connections_total += 1
+        try:
+            while not subscription.finished:
+                lines, subscription.cursor, dropped = broker.read(subscription.cursor)
+                if dropped or lines:
+                    subscription.delivered += len(lines)
+                    subscription.dropped += dropped
+                    await response.write(framing.encode("".join(framing.lines(lines, subscription.cursor, dropped))))
+                    if framing.batched:
+                        await asyncio.sleep(framing.window)
+                elif not await waiter.wait(subscription.cursor, self.heartbeat):
+                    await response.write(framing.encode(": keep-alive\n\n"))
+            await response.write(framing.finish())
+        except ConnectionResetError:
+            pass
+        finally:
+            self.connections[kind] -= 1
+            self._release_waiter(waiter)
+            subscription.close()
+        return response
+
+    async def logs(self, request):
+        return await self._follow(request, "logs", "[info] Bot not found or stopped")
+
+    async def logs_raw(self, request):
+        return await self._follow(request, "logs_raw", "[info] Bot is not running or does not exist.")
+
+    async def logs2(self, request):
+        bot_id, framing = await self._parse_request(request)
+        response = await self._open_stream(request, framing)
+        return await self._stream_broker(response, bot_id, "logs2", framing)
+
+    async def _stream_broker(self, response, bot_id, kind, framing):
+        broker = self.get_log_broker(bot_id)
+        waiter = self._acquire_waiter(broker)
+        broker.subscribe()
+        self.connections[kind] += 1
+        self.connections_total += 1
+        cursor = broker.replay_cursor(self.replay_lines)   # Only lines from current run
+        last_message_time = time.time()
+        try:
+            while True:
+                lines, cursor, dropped = broker.read(cursor)
+                if dropped or lines:
+                    await response.write(framing.encode("".join(framing.lines(lines, cursor, dropped))))
+                    last_message_time = time.time()
+                    if framing.batched:
+                        await asyncio.sleep(framing.window)
+                elif not await waiter.wait(cursor, self.heartbeat):
+                    await response.write(framing.encode(framing.heartbeat()))
+                    if time.time() - last_message_time > self.idle_timeout:
+                        await response.write(framing.encode(framing.info("[info] Log stream timeout")))
+                        break
+            await response.write(framing.finish())
+        except ConnectionResetError:
+            pass
+        finally:
+            self.connections[kind] -= 1
+            broker.unsubscribe()
+            self._release_waiter(waiter)
+        return response
+
+    async def stats(self, request):
+        if not self._authorized(request):
+            raise web.HTTPUnauthorized()
+        open_connections = sum(self.connections.values())
+        return web.json_response({
+            "connections": dict(self.connections),
+            "open_connections": open_connections,
+            "connections_total": self.connections_total,
+            "watched_brokers": len(self._waiters),
+            "rss_bytes": _rss_bytes(),
+            "fd_limit": resource.getrlimit(resource.RLIMIT_NOFILE)[0],
+        })
+
+    # --- Lifecycle ---
+    @staticmethod
+    def _raise_fd_limit(wanted: int = 65536):
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        target = wanted if hard == resource.RLIM_INFINITY else min(wanted, hard)
+        if soft < target:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (target, hard))
+
+    def start(self, host: str, port: int):
+        """Serves on host:port from a daemon thread; returns once the socket is listening."""
+        self._raise_fd_limit()
+        ready = threading.Event()
+
+        def run():
+            self.loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self.loop)
+            runner = web.AppRunner(self.app, access_log=None)
+            self.loop.run_until_complete(runner.setup())
+            site = web.TCPSite(runner, host, port, backlog=4096)
+            self.loop.run_until_complete(site.start())
+            logger.info(f"Async log server listening on {host}:{port}")
+            ready.set()
+            self.loop.run_forever()
+
+        threading.Thread(target=run, name="log-sse-server", daemon=True).start()
+        ready.wait(timeout=10)
@@ -0,0 +1,506 @@
+import os
+import zlib
+import mmap
+import time
+import struct
+import bisect
+import shutil
+import calendar
+import threading
+
+try:
+    import zstandard            # optional: LOG_ARCHIVE_CODEC=zstd
+except ImportError:
+    zstandard = None
+
+# Record: seq (u64), timestamp (f64), payload length (u32), then the UTF-8 payload.
+RECORD = struct.Struct("<QdI")
+# Sparse index entry: seq (u64), timestamp (f64), byte offset into the segment (u64).
+INDEX_ENTRY = struct.Struct("<QdQ")
+# Sealed segments are archived as compressed text, one rendered line per record, so a
+# download can send them as they are. Each archive is a single gzip member or zstd frame,
+# and concatenated members/frames are still one valid stream.
+ARCHIVE_EXTENSIONS = {"gzip": ".log.gz", "zstd": ".log.zst"}
+STAMP_LEN = 27                  # 2026-01-31T12:00:00.000000Z
+
+
+def render_line(ts: float, payload: bytes) -> bytes:
+    """A record as one line of text: UTC timestamp with microseconds, a space, the line."""
+    whole = int(ts)
+    stamp = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(whole))
+    micros = min(999999, int(round((ts - whole) * 1e6)))
+    return f"{stamp}.{micros:06d}Z ".encode() + payload.replace(b"\n", b" ") + b"\n"
+
+
+def parse_line(line: bytes, seconds: dict):
+    """render_line's output back to (ts, payload). `seconds` caches the last whole-second stamp."""
+    stamp = line[:19]
+    whole = seconds.get(stamp)
+    if whole is None:
+        seconds.clear()
+        whole = seconds[stamp] = calendar.timegm((
+            int(stamp[0:4]), int(stamp[5:7]), int(stamp[8:10]),
+            int(stamp[11:13]), int(stamp[14:16]), int(stamp[17:19])))
+    return round(whole + int(line[20:26]) / 1e6, 6), line[STAMP_LEN + 1:]
+
+
+def codec_available(codec: str) -> bool:
+    return codec == "gzip" or (codec == "zstd" and zstandard is not None)
+
+
+def compressor(codec: str, level: int = 0):
+    """An object with compress()/flush() producing one gzip member or zstd frame."""
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("zstd needs `pip install zstandard`")
+        return zstandard.ZstdCompressor(level=level or 3).compressobj()
+    return zlib.compressobj(level or 6, zlib.DEFLATED, 31)     # wbits 31: gzip framing
+
+
+def decompress(codec: str, data: bytes) -> bytes:
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("zstd needs `pip install zstandard`")
+        return zstandard.ZstdDecompressor().decompressobj().decompress(data)
+    return zlib.decompress(data, 31)
+
+
+def empty_archive(codec: str) -> bytes:
+    c = compressor(codec)
+    return c.compress(b"") + c.flush()
+
+
+class Segment:
+    def __init__(self, directory: str, base_seq: int):
+        self.directory = directory
+        self.base_seq = base_seq
+        self.raw_path = os.path.join(directory, f"{base_seq:020d}.log")
+        self.index_path = os.path.join(directory, f"{base_seq:020d}.idx")
+        self.index = []             # [(seq, ts, offset)], sorted by seq and ts
+        self.size = 0               # bytes on disk
+        self.codec = None           # set once the segment is archived
+        self.next_seq = base_seq
+        self.first_ts = None
+        self.last_ts = None
+
+    @property
+    def path(self):
+        return self.raw_path if self.codec is None else self.archive_path(self.codec)
+
+    def archive_path(self, codec):
+        return os.path.join(self.directory, f"{self.base_seq:020d}{ARCHIVE_EXTENSIONS[codec]}")
+
+    def _read_index(self):
+        if not os.path.exists(self.index_path):
+            return []
+        with open(self.index_path, "rb") as f:
+            data = f.read()
+        usable = len(data) - len(data) % INDEX_ENTRY.size
+        return [INDEX_ENTRY.unpack_from(data, pos) for pos in range(0, usable, INDEX_ENTRY.size)]
+
+    def load_archived(self, codec):
+        # An archive's index ends with an entry for its last record.
+        self.codec = codec
+        self.size = os.path.getsize(self.path)
+        self.index = self._read_index()
+        if not self.index:
+            entries = [(seq, ts, 0) for seq, ts, _ in self.records()]
+            self.index = entries[:1] + entries[1:][-1:]
+        if self.index:
+            self.first_ts = self.index[0][1]
+            self.last_ts = self.index[-1][1]
+            self.next_seq = self.index[-1][0] + 1
+
+    def load(self):
+        self.index = self._read_index()
+        self.size = os.path.getsize(self.raw_path)
+        # Scan forward from the last index point to recover next_seq/last_ts,
+        # cutting off a torn record left by a crash.
+        self.index = [e for e in self.index if e[2] < self.size]
+        offset = self.index[-1][2] if self.index else 0
+        good_end = offset
+        for seq, ts, _, end in self._scan(offset):
+            self.next_seq = seq + 1
+            self.last_ts = ts
+            if self.first_ts is None and not self.index:
+                self.first_ts = ts
+            good_end = end
+        if self.index:
+            self.first_ts = self.index[0][1]
+        if good_end < self.size:
+            with open(self.raw_path, "r+b") as f:
+                f.truncate(good_end)
+            self.size = good_end
+
+    def _scan(self, offset, until_offset=None):
+        if self.size == 0:
+            return
+        with open(self.raw_path, "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                end = len(mm) if until_offset is None else min(until_offset, len(mm))
+                while offset + RECORD.size <= end:
+                    seq, ts, length = RECORD.unpack_from(mm, offset)
+                    stop = offset + RECORD.size + length
+                    if stop > end:
+                        return
+                    yield seq, ts, mm[offset + RECORD.size:stop], stop
+                    offset = stop
+
+    def start_offset(self, since_ts=None, since_seq=None):
+        """Offset of the last index point at or before the requested position."""
+        if not self.index:
+            return 0
+        if since_seq is not None:
+            pos = bisect.bisect_right([e[0] for e in self.index], since_seq) - 1
+        elif since_ts is not None:
+            pos = bisect.bisect_right([e[1] for e in self.index], since_ts) - 1
+        else:
+            return 0
+        return self.index[pos][2] if pos >= 0 else 0
+
+    def records(self, since_ts=None, since_seq=None):
+        """(seq, ts, payload) from the last index point at or before the position, oldest first."""
+        if self.codec is None:
+            try:
+                offset = self.start_offset(since_ts=since_ts, since_seq=since_seq)
+                for seq, ts, payload, _ in self._scan(offset):
+                    yield seq, ts, payload
+                return
+            except FileNotFoundError:
+                if self.codec is None:
+                    raise
+                # Archived between the check and the open; read the archive instead.
+        lines = self.archived_lines()
+        start = 0
+        if since_seq is not None:
+            start = max(0, since_seq - self.base_seq)
+        elif since_ts is not None and self.index:
+            pos = bisect.bisect_right([e[1] for e in self.index], since_ts) - 1
+            start = self.index[pos][0] - self.base_seq if pos >= 0 else 0
+        seconds = {}
+        for i in range(start, len(lines)):
+            yield (self.base_seq + i, *parse_line(lines[i], seconds))
+
+    def archived_lines(self):
+        """The archive's rendered lines, one per record, in seq order."""
+        with open(self.path, "rb") as f:
+            return decompress(self.codec, f.read()).split(b"\n")[:-1]
+
+    def compress_to(self, codec, level=0):
+        """Writes the archive next to the raw segment as <archive>.tmp; returns the last record's index entry."""
+        c = compressor(codec, level)
+        last = None
+        with open(self.archive_path(codec) + ".tmp", "wb") as out:
+            batch = []
+            for seq, ts, payload, end in self._scan(0):
+                batch.append(render_line(ts, payload))
+                last = (seq, ts, end - RECORD.size - len(payload))
+                if len(batch) >= 1024:
+                    out.write(c.compress(b"".join(batch)))
+                    batch = []
+            out.write(c.compress(b"".join(batch)) + c.flush())
+        return last
+
+
+class LogStore:
+    """Append-only per-bot log on disk: rolling segments, each with a sparse seq/time index.
+
+    Range reads binary-search the index and mmap the segment, so a query costs
+    O(log n + index_every + result size) however much history is retained.
+    """
+
+    def __init__(self, directory: str, segment_bytes: int = 4 * 1024 * 1024, index_every: int = 64,
+                 retention_bytes: int = 64 * 1024 * 1024, retention_seconds: float = 72 * 3600,
+                 on_seal=None):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.index_every = index_every
+        self.retention_bytes = retention_bytes
+        self.retention_seconds = retention_seconds
+        self.on_seal = on_seal      # on_seal(store) once a segment is sealed and can be archived
+        self.bytes_appended = 0     # line bytes written since this process opened the store
+        self.archived_raw_bytes = 0     # raw segment bytes archived since the store was opened
+        self.archived_bytes = 0         # the same segments, compressed
+        self.archive_seconds = 0.0      # CPU time spent compressing them
+        self._lock = threading.Lock()
+        self._segments = []
+        self._writer = None
+        self._index_writer = None
+        self._since_index = 0
+        os.makedirs(directory, exist_ok=True)
+        found = {}                  # base_seq -> codec, or None for a raw segment
+        for name in sorted(os.listdir(directory)):
+            base, _, extension = name.partition(".")
+            if extension.endswith(".tmp"):
+                os.remove(os.path.join(directory, name))    # an archive cut short by a crash
+            elif extension == "log":
+                found.setdefault(int(base), None)
+            for codec, archive_extension in ARCHIVE_EXTENSIONS.items():
+                if "." + extension == archive_extension:
+                    found[int(base)] = codec
+        for base_seq in sorted(found):
+            segment = Segment(directory, base_seq)
+            if found[base_seq] is None:
+                segment.load()
+            else:
+                # The archive was complete before the raw segment was removed.
+                if os.path.exists(segment.raw_path):
+                    os.remove(segment.raw_path)
+                segment.load_archived(found[base_seq])
+            self._segments.append(segment)
+        if not self._segments:
+            self._segments.append(Segment(directory, 0))
+        self._open_active()
+        if on_seal and any(s.codec is None for s in self._segments[:-1]):
+            on_seal(self)
+
+    @property
+    def next_seq(self):
+        return self._segments[-1].next_seq
+
+    def _open_active(self):
+        active = self._segments[-1]
+        self._writer = open(active.path, "ab")
+        self._index_writer = open(active.index_path, "ab")
+        self._since_index = self.index_every    # first record of a reopened segment gets an entry
+
+    def append(self, line: str, ts: float = None):
+        payload = line.encode("utf-8", errors="replace")
+        with self._lock:
+            active = self._segments[-1]
+            # Keep timestamps monotonic so the time index can be binary-searched, and in
+            # whole microseconds, so an archived segment gives back the same timestamps.
+            ts = round(max(ts or time.time(), active.last_ts or 0.0), 6)
+            seq = active.next_seq
+            if self._since_index >= self.index_every:
+                entry = (seq, ts, active.size)
+                active.index.append(entry)
+                self._index_writer.write(INDEX_ENTRY.pack(*entry))
+                self._since_index = 0
+            self._writer.write(RECORD.pack(seq, ts, len(payload)))
+            self._writer.write(payload)
+            self.bytes_appended += len(payload)
+            self._since_index += 1
+            active.size += RECORD.size + len(payload)
+            active.next_seq = seq + 1
+            active.last_ts = ts
+            if active.first_ts is None:
+                active.first_ts = ts
+            if active.size >= self.segment_bytes:
+                self._roll()
+            return seq
+
+    def _roll(self):
+        self._writer.close()
+        self._index_writer.close()
+        previous = self._segments[-1]
+        segment = Segment(self.directory, previous.next_seq)
+        segment.last_ts = previous.last_ts
+        self._segments.append(segment)
+        open(segment.path, "ab").close()
+        self._open_active()
+        self._apply_retention()
+        if self.on_seal:
+            self.on_seal(self)
+
+    def _apply_retention(self):
+        cutoff = time.time() - self.retention_seconds
+        total = sum(s.size for s in self._segments)
+        while len(self._segments) > 1:
+            oldest = self._segments[0]
+            if total <= self.retention_bytes and (oldest.last_ts or 0) >= cutoff:
+                break
+            total -= oldest.size
+            for path in (oldest.raw_path, oldest.path, oldest.index_path):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            self._segments.pop(0)
+
+    def enforce_retention(self):
+        with self._lock:
+            self._apply_retention()
+
+    def archive_sealed(self, codec: str = "gzip", level: int = 0):
+        """Compresses sealed segments that are still raw; returns how many were archived.
+
+        Compression runs outside the lock. Readers that picked up a segment
+        before the swap fall back to its archive if the raw file is gone.
+        """
+        with self._lock:
+            pending = [s for s in self._segments[:-1] if s.codec is None]
+        archived = 0
+        for segment in pending:
+            started = time.process_time()
+            try:
+                last = segment.compress_to(codec, level)
+            except FileNotFoundError:
+                continue            # removed by retention meanwhile
+            tmp = segment.archive_path(codec) + ".tmp"
+            with self._lock:
+                self.archive_seconds += time.process_time() - started
+                if segment not in self._segments:
+                    os.remove(tmp)
+                    continue
+                if last is not None and (not segment.index or segment.index[-1] != last):
+                    with open(segment.index_path, "ab") as f:
+                        f.write(INDEX_ENTRY.pack(*last))
+                    segment.index.append(last)
+                os.replace(tmp, segment.archive_path(codec))
+                raw_size = segment.size
+                segment.codec = codec
+                segment.size = os.path.getsize(segment.path)
+                os.remove(segment.raw_path)
+                self.archived_raw_bytes += raw_size
+                self.archived_bytes += segment.size
+                archived += 1
+        return archived
+
+    def flush(self):
+        with self._lock:
+            self._writer.flush()
+            self._index_writer.flush()
+
+    def range(self, since: float = None, until: float = None, after_seq: int = None, limit: int = 1000):
+        """Records as (seq, ts, line) with ts in [since, until] and seq > after_seq, oldest first."""
+        since_seq = after_seq + 1 if after_seq is not None else None
+        with self._lock:
+            self._writer.flush()
+            self._index_writer.flush()
+            segments = list(self._segments)
+        results = []
+        for i, segment in enumerate(segments):
+            following = segments[i + 1] if i + 1 < len(segments) else None
+            # Skip whole segments that end before the requested position.
+            if following is not None:
+                if since_seq is not None and following.base_seq <= since_seq:
+                    continue
+                if since is not None and since_seq is None and (segment.last_ts or 0) < since:
+                    continue
+            if until is not None and segment.first_ts is not None and segment.first_ts > until:
+                break
+            for seq, ts, payload in segment.records(since_ts=since, since_seq=since_seq):
+                if since_seq is not None and seq < since_seq:
+                    continue
+                if since is not None and ts < since:
+                    continue
+                if until is not None and ts > until:
+                    return results
+                results.append((seq, ts, payload.decode("utf-8", errors="replace")))
+                if len(results) >= limit:
+                    return results
+        return results
+
+    def read_ranges(self, ranges):
+        """One list of (seq, ts, line) per [first, last) seq range in `ranges`, oldest first.
+
+        Ranges are visited in the order given; an archived segment is decompressed
+        once for a run of ranges that fall in it, not once per range.
+        """
+        with self._lock:
+            self._writer.flush()
+            self._index_writer.flush()
+            segments = list(self._segments)
+        bases = [s.base_seq for s in segments]
+        decoded, lines, seconds = None, None, {}
+        for first, last in ranges:
+            records = []
+            i = max(0, bisect.bisect_right(bases, first) - 1)
+            while i < len(segments) and segments[i].base_seq < last:
+                segment = segments[i]
+                i += 1
+                try:
+                    if segment.codec is None:
+                        for seq, ts, payload in segment.records(since_seq=first):
+                            if seq >= last:
+                                break
+                            if seq >= first:
+                                records.append((seq, ts, payload.decode("utf-8", errors="replace")))
+                        continue
+                    if decoded is not segment:
+                        decoded, lines = segment, segment.archived_lines()
+                except FileNotFoundError:
+                    continue        # removed by retention
+                for seq in range(max(first, segment.base_seq), min(last, segment.base_seq + len(lines))):
+                    ts, payload = parse_line(lines[seq - segment.base_seq], seconds)
+                    records.append((seq, ts, payload.decode("utf-8", errors="replace")))
+            yield records
+
+    def download(self, since: float = None, until: float = None, codec: str = "gzip", level: int = 0):
+        """(chunks, info): the records with ts in [since, until] as one compressed text stream.
+
+        Archived segments that lie wholly inside the range and use the requested
+        codec are sent as they are; the rest are rendered and compressed here.
+        info counts the segments in the range and how many were passed through.
+        """
+        with self._lock:
+            self._writer.flush()
+            self._index_writer.flush()
+            segments = [s for s in self._segments if s.first_ts is not None
+                        and (until is None or s.first_ts <= until) and (since is None or s.last_ts >= since)]
+            plan = [(s, s.codec == codec and (since is None or s.first_ts >= since)
+                     and (until is None or s.last_ts <= until)) for s in segments]
+        info = {"segments": len(plan), "passthrough": sum(1 for _, whole in plan if whole)}
+
+        def chunks():
+            sent = False
+            for segment, whole in plan:
+                if whole:
+                    try:
+                        with open(segment.path, "rb") as f:
+                            while True:
+                                block = f.read(1024 * 1024)
+                                if not block:
+                                    break
+                                sent = True
+                                yield block
+                        continue
+                    except FileNotFoundError:
+                        continue        # removed by retention since the plan was made
+                c, batch = None, []
+                try:
+                    for seq, ts, payload in segment.records(since_ts=since):
+                        if since is not None and ts < since:
+                            continue
+                        if until is not None and ts > until:
+                            break
+                        batch.append(render_line(ts, payload))
+                        if len(batch) >= 1024:
+                            c = c or compressor(codec, level)
+                            block = c.compress(b"".join(batch))
+                            batch = []
+                            if block:
+                                sent = True
+                                yield block
+                except FileNotFoundError:
+                    pass
+                if batch or c:
+                    c = c or compressor(codec, level)
+                    sent = True
+                    yield c.compress(b"".join(batch)) + c.flush()
+            if not sent:
+                yield empty_archive(codec)
+
+        return chunks(), info
+
+    def stats(self):
+        with self._lock:
+            return {
+                "segments": len(self._segments),
+                "archived_segments": sum(1 for s in self._segments if s.codec),
+                "bytes": sum(s.size for s in self._segments),
+                "first_seq": self._segments[0].base_seq,
+                "next_seq": self._segments[-1].next_seq,
+                "first_ts": self._segments[0].first_ts,
+                "last_ts": self._segments[-1].last_ts,
+            }
+
+    def close(self):
+        with self._lock:
+            self._writer.close()
+            self._index_writer.close()
+
+    def destroy(self):
+        self.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
@@ -0,0 +1,219 @@
+import re
+import time
+import threading
+import logging
+from bisect import bisect_left
+from collections import namedtuple
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+# Seconds; wide enough for both a 2ms index lookup and a 5 minute dependency install.
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+# One metric family produced at scrape time; samples are (labels dict, value).
+Family = namedtuple("Family", ("name", "kind", "help", "samples"))
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def percentile(values, fraction: float, digits: int = None):
+    """Nearest-rank percentile of `values` (`fraction` from 0 to 1), rounded to `digits`; None if empty."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    value = ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+    return value if digits is None else round(value, digits)
+
+
+def _number(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """Fixed buckets per label set. observe() is a bisect and three additions under a lock."""
+
+    def __init__(self, name: str, help: str, label_names=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._series = {}       # label values -> [count per bucket (+Inf last), sum]
+        self._lock = threading.Lock()
+
+    def observe(self, labels: tuple, seconds: float):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][bisect_left(self.buckets, seconds)] += 1
+            series[1] += seconds
+
+    def render(self, out: list):
+        with self._lock:
+            snapshot = [(labels, list(counts), total) for labels, (counts, total) in self._series.items()]
+        out.append(f"# HELP {self.name} {self.help}")
+        out.append(f"# TYPE {self.name} histogram")
+        for labels, counts, total in sorted(snapshot):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                out.append(f"{self.name}_bucket{_labels(self.label_names, labels, le)} {cumulative}")
+            out.append(f"{self.name}_sum{_labels(self.label_names, labels)} {total!r}")
+            out.append(f"{self.name}_count{_labels(self.label_names, labels)} {cumulative}")
+
+
+class MetricsRegistry:
+    """Histograms recorded on the hot paths, plus collectors that read counters and gauges only when scraped.
+
+    A collector is fn() -> iterable of Family; it reads state the backend
+    already keeps (brokers, queues, the admission semaphore), so nothing is
+    counted twice and nothing runs between scrapes.
+    """
+
+    def __init__(self):
+        self._histograms = []
+        self._collectors = []
+        self.scrapes = 0
+
+    def histogram(self, name: str, help: str, label_names=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        histogram = Histogram(name, help, label_names, buckets)
+        self._histograms.append(histogram)
+        return histogram
+
+    def collector(self, fn):
+        self._collectors.append(fn)
+        return fn
+
+    def render(self) -> str:
+        """Prometheus text exposition format (0.0.4)."""
+        self.scrapes += 1
+        out = []
+        for histogram in self._histograms:
+            histogram.render(out)
+        for collect in self._collectors:
+            try:
+                families = list(collect())
+            except Exception as e:
+                logger.warning(f"Metrics collector {collect.__name__} failed: {e}")
+                continue
+            for family in families:
+                out.append(f"# HELP {family.name} {family.help}")
+                out.append(f"# TYPE {family.name} {family.kind}")
+                for labels, value in family.samples:
+                    out.append(f"{family.name}{_labels(labels.keys(), labels.values())} {_number(value)}")
+        return "\n".join(out) + "\n"
+
+
+# /v1.41/containers/<id>/start -> ("containers", "<id>", "start")
+DOCKER_PATH_RE = re.compile(r"^(?:/v[\d.]+)?/([^/]+)(?:/([^/]+))?(?:/([^/]+))?")
+
+
+def docker_operation(method: str, path: str) -> str:
+    """A low-cardinality name for a Docker Engine API call: create, start, exec_create, stats, logs, ..."""
+    match = DOCKER_PATH_RE.match(path)
+    if not match:
+        return "other"
+    resource, ident, action = match.groups()
+    if resource == "containers":
+        if action == "exec":
+            return "exec_create"
+        if action == "json":
+            return "inspect"
+        if action:
+            return action
+        if ident in ("create", "json", "prune"):
+            return {"create": "create", "json": "list", "prune": "prune"}[ident]
+        return "remove" if method == "DELETE" else "container"
+    if resource == "exec":
+        return "exec_inspect" if action == "json" else f"exec_{action or 'other'}"
+    if resource == "images":
+        return "image_remove" if method == "DELETE" else f"image_{action or ident or 'other'}"
+    return resource.lstrip("_")     # events, info, _ping, commit, version, ...
+
+
+def instrument_docker(api, histogram: Histogram, node: str):
+    """Times every HTTP request the docker APIClient makes, labelled by node and operation.
+
+    docker-py's APIClient is a requests.Session, so all of its calls go
+    through request(). Streaming calls (logs, events, exec_start) are timed
+    until the response headers arrive.
+    """
+    request = api.request
+
+    def timed_request(method, url, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return request(method, url, *args, **kwargs)
+        finally:
+            histogram.observe((node, docker_operation(method, urlsplit(url).path)), time.perf_counter() - started)
+
+    api.request = timed_request
+
+
+class HealthProber:
+    """Runs probe_fn() every `interval` seconds in the background; readers get the last result.
+
+    Until the first background probe, get() probes inline (once, however many
+    callers arrive together). A result older than `stale_after` is reported
+    as stale, so a stuck prober fails health checks instead of hiding.
+    """
+
+    def __init__(self, probe_fn, interval: float = 5.0, stale_after: float = None):
+        self.probe_fn = probe_fn
+        self.interval = interval
+        self.stale_after = stale_after or interval * 3
+        self.probes = 0
+        self._result = None
+        self._checked_at = None
+        self._duration_ms = None
+        self._lock = threading.Lock()
+        self._first = threading.Lock()
+        self._stop = threading.Event()
+
+    def start(self):
+        threading.Thread(target=self._loop, name="health-prober", daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            self.probe()
+            self._stop.wait(self.interval)
+
+    def probe(self):
+        started = time.perf_counter()
+        try:
+            result = self.probe_fn()
+        except Exception as e:
+            logger.warning(f"Health probe failed: {e}")
+            result = None
+        with self._lock:
+            self._result = result
+            self._checked_at = time.time()
+            self._duration_ms = round((time.perf_counter() - started) * 1000, 1)
+            self.probes += 1
+        return result
+
+    def get(self):
+        """(result, checked_at, duration_ms, stale)."""
+        if self._checked_at is None:
+            with self._first:
+                if self._checked_at is None:
+                    self.probe()
+        with self._lock:
+            stale = time.time() - self._checked_at > self.stale_after
+            return self._result, self._checked_at, self._duration_ms, stale
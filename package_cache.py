@@ -0,0 +1,392 @@
+import os
+import re
+import json
+import base64
+import time
+import shlex
+import shutil
+import tempfile
+import threading
+import logging
+import docker
+
+logger = logging.getLogger(__name__)
+
+CACHE_MOUNT = "/cache"
+WHEELHOUSE = f"{CACHE_MOUNT}/wheelhouse"
+NPM_CACHE = f"{CACHE_MOUNT}/npm"
+
+DEFAULT_PACKAGES = {
+    "python": ["python-telegram-bot"],
+    "node": ["node-telegram-bot-api", "telegraf"],
+}
+
+NPM_FLAGS = "--no-audit --no-fund --no-update-notifier --logs-max=0"
+NPM_REGISTRY = "https://registry.npmjs.org/"
+NPM_DEPENDENCY_FIELDS = ("dependencies", "devDependencies", "optionalDependencies", "peerDependencies")
+
+# "name[extras] <specifiers> ; <marker>": a package from the index, not a URL, path or option.
+REQUIREMENT_RE = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]*(\[[A-Za-z0-9._,\s-]*\])?\s*[^@:/\\]*$")
+
+
+def index_requirements(text: str) -> str:
+    """The lines of a requirements file that name index packages, without their options.
+
+    Options (-r, -e, --index-url, --find-links, ...), direct URLs and paths
+    are dropped, so a cache fill only fetches from the configured index.
+    """
+    kept = []
+    for line in re.sub(r"\\\n", " ", text).splitlines():
+        line = re.sub(r"(^|\s)#.*", "", line)
+        line = re.sub(r"\s--?[A-Za-z][\w-]*(=\S*|\s+\S+)?", "", f" {line}").strip()
+        if line and REQUIREMENT_RE.match(line):
+            kept.append(line)
+    return "".join(f"{line}\n" for line in kept)
+
+
+def registry_manifest(package: dict, lock: dict = None):
+    """(package.json, package-lock.json or None) reduced to what npm fetches from the registry.
+
+    Dependencies given as git, URL, path or alias specs are dropped. The lock
+    is kept only if every package in it resolves to the registry.
+    """
+    def from_registry(spec):
+        return isinstance(spec, str) and ":" not in spec and "/" not in spec
+    reduced = {"name": "botoralo-fill", "version": "1.0.0"}
+    for field in NPM_DEPENDENCY_FIELDS:
+        deps = {name: spec for name, spec in (package.get(field) or {}).items() if from_registry(spec)}
+        if deps:
+            reduced[field] = deps
+    if lock is not None:
+        entries = [entry for path, entry in (lock.get("packages") or {}).items() if path]
+        if not all(isinstance(entry, dict) and not entry.get("link")
+                   and str(entry.get("resolved", NPM_REGISTRY)).startswith(NPM_REGISTRY) for entry in entries):
+            lock = None
+    return reduced, lock
+
+
+class PackageCache:
+    """Host directory holding a pip wheelhouse and an npm cache.
+
+    Bot containers get it mounted read-only and install with --no-index/--offline.
+    Misses are filled by a short-lived helper container that has the only
+    writable mount and only downloads, so tenant code never gets write access
+    to shared artifacts.
+    """
+
+    def __init__(self, docker_client, root: str, image: str, budget_bytes: int):
+        self.docker_client = docker_client
+        self.root = root
+        self.image = image
+        self.budget_bytes = budget_bytes
+        self.fills = 0
+        self.evictions = 0
+        self.bytes_saved = 0
+        self.bytes_fetched = 0
+        self.bytes_total = 0
+        self.seeding = False
+        self._lock = threading.Lock()
+        self._last_evict = 0.0
+        for sub in ("wheelhouse", "npm"):
+            path = os.path.join(root, sub)
+            os.makedirs(path, exist_ok=True)
+            try:
+                os.chown(path, 1000, 1000)      # bot containers run as 1000:1000
+            except PermissionError:
+                pass
+
+    def volumes(self, mode: str = "ro"):
+        return {self.root: {"bind": CACHE_MOUNT, "mode": mode}}
+
+    # --- Install commands ---
+    def install_cmd(self, runtime: str, deps_dir: str, isolated: bool = False) -> str:
+        """Offline install resolved purely from the cache; fails on a miss.
+
+        `isolated` installs Python packages into deps_dir instead of the user
+        site, for bots that share a container with others.
+        """
+        if runtime == "python":
+            return (
+                f"pip install --no-index --find-links {WHEELHOUSE} --no-cache-dir "
+                f"--report {shlex.quote(self._pip_report(deps_dir, isolated))} {self._pip_target(deps_dir, isolated)}"
+                f"{self._pip_targets()}"
+            )
+        return (f"npm install --prefix {shlex.quote(deps_dir)} --offline --cache {NPM_CACHE} {NPM_FLAGS} "
+                f"{self._npm_targets(deps_dir)}")
+
+    def fallback_cmd(self, runtime: str, deps_dir: str, isolated: bool = False) -> str:
+        """Plain online install, used only if the helper could not fill the cache."""
+        if runtime == "python":
+            return f"pip install {self._pip_target(deps_dir, isolated)}{self._pip_targets()}"
+        return f"npm install --prefix {shlex.quote(deps_dir)} {NPM_FLAGS} {self._npm_targets(deps_dir)}"
+
+    @staticmethod
+    def _pip_report(deps_dir, isolated):
+        return f"{deps_dir}/.pip-report.json" if isolated else "/tmp/pip-report.json"
+
+    @staticmethod
+    def _pip_target(deps_dir, isolated):
+        return f"--target {shlex.quote(deps_dir)} " if isolated else ""
+
+    def _pip_targets(self):
+        default = " ".join(DEFAULT_PACKAGES["python"])
+        return f"$([ -f requirements.txt ] && echo '-r requirements.txt' || echo '{default}')"
+
+    def _npm_targets(self, deps_dir):
+        default = " ".join(DEFAULT_PACKAGES["node"])
+        return f"$([ -f {shlex.quote(deps_dir + '/package.json')} ] || echo '{default}')"
+
+    def _fill_cmd(self, runtime: str, packages=None) -> str:
+        # Fetch only: pip takes wheels, so no build backend runs, and npm skips install scripts.
+        if runtime == "python":
+            fetch = f"pip download --only-binary=:all: --find-links {WHEELHOUSE} -d {WHEELHOUSE}"
+            if packages:
+                return f"{fetch} {' '.join(shlex.quote(p) for p in packages)}"
+            return f"cd /bot && {fetch} {self._pip_targets()}"
+        fetch = f"npm install --ignore-scripts --cache {NPM_CACHE} {NPM_FLAGS}"
+        if packages:
+            return f"mkdir -p /tmp/fill && cd /tmp/fill && {fetch} {' '.join(shlex.quote(p) for p in packages)}"
+        return (
+            f"mkdir -p /tmp/fill && cp /bot/package.json /tmp/fill/ && "
+            f"([ ! -f /bot/package-lock.json ] || cp /bot/package-lock.json /tmp/fill/) && "
+            f"cd /tmp/fill && {fetch}"
+        )
+
+    @staticmethod
+    def _write_fill_inputs(runtime: str, bot_code_dir: str, inputs_dir: str) -> bool:
+        # Copies of the bot's requirement files, reduced to index packages; False if nothing is left to fetch.
+        def read(name):
+            path = os.path.join(bot_code_dir, name)
+            if not os.path.isfile(path):
+                return None
+            with open(path, encoding="utf-8", errors="replace") as f:
+                return f.read()
+
+        def write(name, text):
+            path = os.path.join(inputs_dir, name)
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.chmod(path, 0o644)
+
+        if runtime == "python":
+            text = read("requirements.txt")
+            if text is None:
+                return True         # the helper fetches the default packages
+            requirements = index_requirements(text)
+            write("requirements.txt", requirements)
+            return bool(requirements)
+        text = read("package.json")
+        if text is None:
+            return False
+        try:
+            lock_text = read("package-lock.json")
+            package, lock = registry_manifest(json.loads(text), json.loads(lock_text) if lock_text else None)
+        except (ValueError, AttributeError):
+            return False
+        write("package.json", json.dumps(package))
+        if lock is not None:
+            write("package-lock.json", json.dumps(lock))
+        return any(field in package for field in NPM_DEPENDENCY_FIELDS)
+
+    def fill(self, runtime: str, bot_code_dir: str = None, packages=None) -> bool:
+        """Download whatever is missing into the cache from a throwaway container.
+
+        The helper never sees the bot's code, only copies of its requirement
+        files reduced to plain index/registry packages, and it runs no package
+        code. So the shared cache holds what any tenant would get from the
+        public index; npm also checks each tarball against its integrity hash.
+        """
+        volumes = self.volumes(mode="rw")
+        inputs_dir = None
+        try:
+            if bot_code_dir:
+                inputs_dir = tempfile.mkdtemp(prefix=".fill-", dir=os.path.dirname(os.path.abspath(bot_code_dir)))
+                os.chmod(inputs_dir, 0o755)
+                if not self._write_fill_inputs(runtime, bot_code_dir, inputs_dir):
+                    return False
+                volumes[inputs_dir] = {"bind": "/bot", "mode": "ro"}
+            self.docker_client.containers.run(
+                self.image,
+                command=["bash", "-lc", self._fill_cmd(runtime, packages)],
+                volumes=volumes,
+                user="1000:1000",
+                network_mode="bridge",
+                remove=True,
+                stdout=False,
+                stderr=True,
+            )
+        except docker.errors.ContainerError as e:
+            logger.warning(f"Package cache fill for {runtime} failed: {e}")
+            return False
+        finally:
+            if inputs_dir:
+                shutil.rmtree(inputs_dir, ignore_errors=True)
+        with self._lock:
+            self.fills += 1
+        return True
+
+    def seed(self):
+        """Pre-fetch the default telegram libraries so those installs need no network."""
+        with self._lock:
+            if self.seeding:
+                return False
+            self.seeding = True
+        try:
+            for runtime, packages in DEFAULT_PACKAGES.items():
+                self.fill(runtime, packages=packages)
+        finally:
+            with self._lock:
+                self.seeding = False
+            self.enforce_budget(force=True)
+        return True
+
+    # --- Accounting ---
+    def _used_files(self, container, runtime: str, deps_dir: str, isolated: bool = False):
+        if runtime == "python":
+            exit_code, output = container.exec_run(["cat", self._pip_report(deps_dir, isolated)], user="1000:1000")
+            if exit_code != 0:
+                return []
+            report = json.loads(output)
+            paths = []
+            for item in report.get("install", []):
+                url = item.get("download_info", {}).get("url", "")
+                if url.startswith(f"file://{WHEELHOUSE}/"):
+                    paths.append(os.path.join(self.root, "wheelhouse", url.rsplit("/", 1)[1]))
+            return paths
+        exit_code, output = container.exec_run(["cat", f"{deps_dir}/package-lock.json"], user="1000:1000")
+        if exit_code != 0:
+            return []
+        lock = json.loads(output)
+        paths = (self._npm_content_path(pkg.get("integrity", "")) for pkg in lock.get("packages", {}).values())
+        return [path for path in paths if path]
+
+    def _npm_content_path(self, integrity: str):
+        """Where npm's cacache keeps the content with this sha512 integrity, or None."""
+        if not integrity.startswith("sha512-"):
+            return None
+        try:
+            digest = base64.b64decode(integrity[len("sha512-"):].split()[0]).hex()
+        except (ValueError, IndexError):
+            return None
+        return os.path.join(self.root, "npm", "_cacache", "content-v2", "sha512", digest[:2], digest[2:4], digest[4:])
+
+    def _npm_index(self):
+        """{index bucket path: content paths its entries point at} for npm's cacache."""
+        buckets = {}
+        for dirpath, _, filenames in os.walk(os.path.join(self.root, "npm", "_cacache", "index-v5")):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                contents = set()
+                try:
+                    with open(path) as f:
+                        for line in f:
+                            # "<sha1 of entry>\t<entry json>", appended for each write of the key.
+                            try:
+                                entry = json.loads(line.partition("\t")[2])
+                            except ValueError:
+                                continue
+                            content = self._npm_content_path(entry.get("integrity") or "")
+                            if content:
+                                contents.add(content)
+                except OSError:
+                    continue
+                buckets[path] = contents
+        return buckets
+
+    def record_install(self, container, runtime: str, deps_dir: str, started_at: float, isolated: bool = False):
+        """Bytes served from cache vs. fetched for this install; touches used files for LRU."""
+        try:
+            paths = self._used_files(container, runtime, deps_dir, isolated)
+        except (ValueError, docker.errors.APIError) as e:
+            logger.info(f"Could not read install report: {e}")
+            return {}
+        saved = fetched = 0
+        now = time.time()
+        for path in paths:
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            if st.st_mtime >= started_at:
+                fetched += st.st_size
+            else:
+                saved += st.st_size
+            try:
+                os.utime(path, (now, now))
+            except OSError:
+                pass
+        with self._lock:
+            self.bytes_saved += saved
+            self.bytes_fetched += fetched
+        self.enforce_budget()
+        return {"bytes_saved": saved, "bytes_fetched": fetched}
+
+    def _files(self):
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                yield st.st_mtime, st.st_size, path
+
+    def enforce_budget(self, force: bool = False):
+        # Walking the tree isn't free; do it at most once a minute unless asked.
+        with self._lock:
+            if not force and time.time() - self._last_evict < 60:
+                return
+            self._last_evict = time.time()
+        files = {path: (mtime, size) for mtime, size, path in self._files()}
+        total = sum(size for _, size in files.values())
+        if total > self.budget_bytes:
+            total = self._evict(files, total)
+        self.bytes_total = total
+
+    def _evict(self, files, total):
+        # An npm index bucket goes together with the content it points at, so npm never finds
+        # an entry whose content is gone. Content another bucket still points at stays. A bucket
+        # is as recent as the most recently used file in it.
+        buckets = self._npm_index()
+        refs = {}
+        units = []
+        for bucket, contents in buckets.items():
+            for content in contents:
+                refs[content] = refs.get(content, 0) + 1
+            used = max((files[path][0] for path in (bucket, *contents) if path in files), default=0)
+            units.append((used, bucket, contents))
+        for path, (mtime, _) in files.items():
+            if path not in buckets and path not in refs:
+                units.append((mtime, None, [path]))
+        units.sort(key=lambda unit: unit[0])
+        for _, bucket, paths in units:
+            if total <= self.budget_bytes:
+                break
+            if bucket is not None:
+                for content in paths:
+                    refs[content] -= 1
+                paths = [bucket, *(content for content in paths if not refs[content])]
+            for path in paths:
+                if path not in files:
+                    continue
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= files.pop(path)[1]
+                with self._lock:
+                    self.evictions += 1
+        return total
+
+    def stats(self):
+        with self._lock:
+            return {
+                "root": self.root,
+                "bytes": self.bytes_total,
+                "budget_bytes": self.budget_bytes,
+                "fills": self.fills,
+                "evictions": self.evictions,
+                "bytes_saved": self.bytes_saved,
+                "bytes_fetched": self.bytes_fetched,
+                "seeding": self.seeding,
+            }
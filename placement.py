@@ -0,0 +1,194 @@
+import json
+import threading
+import logging
+from collections import namedtuple
+
+import docker
+
+logger = logging.getLogger(__name__)
+
+
+class NoCapacity(RuntimeError):
+    pass
+
+
+class Node:
+    """One Docker daemon bots can be placed on.
+
+    `index` and `deps_cache` are the node's own ContainerIndex and
+    DepsImageCache; the backend wires them in. Capacity not given in the
+    config is read from the daemon (`docker info`) on first use.
+    """
+
+    def __init__(self, name: str, client, api, memory_mb: int = None, cpus: int = None, overcommit: float = 1.0,
+                 local: bool = False):
+        self.name = name
+        self.client = client
+        self.api = api
+        self.memory_mb = memory_mb
+        self.cpus = cpus
+        self.overcommit = overcommit
+        self.local = local          # shares this host's /proc and cgroups
+        self.up = True
+        self.index = None
+        self.deps_cache = None
+
+    def refresh_capacity(self):
+        try:
+            info = self.api.info()
+            self.up = True
+        except Exception as e:
+            self.up = False
+            logger.warning(f"Docker node {self.name} is unreachable: {e}")
+            return
+        if self.memory_mb is None:
+            self.memory_mb = int(info.get("MemTotal", 0) // (1024 * 1024))
+        if self.cpus is None:
+            self.cpus = info.get("NCPU")
+
+    def to_dict(self):
+        return {"memory_mb": self.memory_mb, "cpus": self.cpus, "overcommit": self.overcommit,
+                "local": self.local, "up": self.up}
+
+
+def load_nodes(config: str, local_client, local_api, overcommit: float = 1.0) -> dict:
+    """{name: Node}, first entry primary.
+
+    `config` is a JSON list, or the path to a file holding one, of
+    {"name", "base_url", "memory_mb", "cpus", "overcommit"}. An entry without
+    base_url is this host's daemon. Empty config means just that daemon.
+    """
+    if not config:
+        return {"local": Node("local", local_client, local_api, overcommit=overcommit, local=True)}
+    if not config.lstrip().startswith("["):
+        with open(config) as f:
+            config = f.read()
+    nodes = {}
+    for entry in json.loads(config):
+        name = entry["name"]
+        if name in nodes:
+            raise ValueError(f"Duplicate Docker node name: {name}")
+        if entry.get("base_url"):
+            client = docker.DockerClient(base_url=entry["base_url"], timeout=entry.get("timeout", 60))
+            api, local = client.api, False
+        else:
+            client, api, local = local_client, local_api, True
+        nodes[name] = Node(name, client, api, memory_mb=entry.get("memory_mb"), cpus=entry.get("cpus"),
+                           overcommit=float(entry.get("overcommit", overcommit)), local=local)
+    if not nodes:
+        raise ValueError("DOCKER_NODES lists no nodes.")
+    return nodes
+
+
+# reserved_mb: memory limits of the bots placed there; used_mb: their observed usage.
+NodeLoad = namedtuple("NodeLoad", ("name", "capacity_mb", "overcommit", "reserved_mb", "used_mb"))
+
+
+def fits(load: NodeLoad, memory_mb: int) -> bool:
+    """Within the node's overcommit limit, and the bot's full limit still fits in physical memory."""
+    return (load.reserved_mb + memory_mb <= load.capacity_mb * load.overcommit
+            and load.used_mb + memory_mb <= load.capacity_mb)
+
+
+def choose_node(loads, memory_mb: int):
+    """Best fit: the feasible node left with the least reservable memory, ties to the least used."""
+    best = None
+    for load in loads:
+        if not fits(load, memory_mb):
+            continue
+        key = (load.capacity_mb * load.overcommit - load.reserved_mb - memory_mb, load.used_mb)
+        if best is None or key < best[0]:
+            best = (key, load.name)
+    return best[1] if best else None
+
+
+class Placement:
+    """Decides which node runs each bot; the bot -> node table is the registry's `node` column.
+
+    usage_fn(bot_id) -> observed memory in MB, or None if there's no recent
+    sample (then a bot that should be running counts at its full limit).
+    A bot hibernated by stopping its container uses nothing; a paused one
+    keeps what it used when it was paused.
+    A bot keeps its node on redeploy while it still fits there.
+    """
+
+    def __init__(self, nodes: dict, registry, usage_fn):
+        self.nodes = nodes
+        self.primary = next(iter(nodes.values()))
+        self.registry = registry
+        self.usage_fn = usage_fn
+        self.placed = 0
+        self.moved = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def node_of(self, bot_id) -> Node:
+        row = self.registry.get(bot_id)
+        node = self.nodes.get(row["node"]) if row and row["node"] else None
+        return node or self.primary
+
+    def loads(self, exclude=None):
+        totals = {name: [0, 0.0] for name in self.nodes}
+        for bot_id, row in self.registry.all().items():
+            if bot_id == exclude or not row["memory_mb"]:
+                continue
+            total = totals.get(row["node"] or self.primary.name)
+            if total is None:
+                continue
+            total[0] += row["memory_mb"]
+            if row["hibernated"] == "stop":
+                continue        # its memory is free until it wakes
+            if row["hibernated"] == "pause":
+                total[1] += row["hibernated_mb"] or row["memory_mb"]
+                continue
+            observed = self.usage_fn(bot_id)
+            if observed is not None:
+                total[1] += observed
+            elif row["desired_state"] == "running":
+                total[1] += row["memory_mb"]
+        loads = []
+        for name, (reserved, used) in totals.items():
+            node = self.nodes[name]
+            if node.memory_mb is None:
+                node.refresh_capacity()
+            if node.up and node.memory_mb:
+                loads.append(NodeLoad(name, node.memory_mb, node.overcommit, reserved, round(used, 1)))
+        return loads
+
+    def place(self, bot_id, memory_mb: int) -> Node:
+        """Reserves `memory_mb` for the bot on a node and records it; raises NoCapacity."""
+        with self._lock:
+            loads = self.loads(exclude=bot_id)
+            row = self.registry.get(bot_id)
+            current = (row["node"] or self.primary.name) if row else None
+            name = next((load.name for load in loads if load.name == current and fits(load, memory_mb)), None)
+            if name is None:
+                name = choose_node(loads, memory_mb)
+            if name is None:
+                self.rejected += 1
+                if not loads:
+                    raise NoCapacity("No Docker node is reachable.")
+                raise NoCapacity(f"No Docker node has room for a {memory_mb} MB bot.")
+            if current and current != name:
+                self.moved += 1
+            self.placed += 1
+            self.registry.update(bot_id, node=name, memory_mb=memory_mb)
+            return self.nodes[name]
+
+    def stats(self):
+        loads = {load.name: load for load in self.loads()}
+        bots = {}
+        for row in self.registry.all().values():
+            name = row["node"] or self.primary.name
+            bots[name] = bots.get(name, 0) + 1
+        nodes = {}
+        for name, node in self.nodes.items():
+            load = loads.get(name)
+            nodes[name] = {
+                **node.to_dict(),
+                "bots": bots.get(name, 0),
+                "reserved_mb": load.reserved_mb if load else None,
+                "used_mb": load.used_mb if load else None,
+            }
+        return {"primary": self.primary.name, "placed": self.placed, "moved": self.moved,
+                "rejected": self.rejected, "nodes": nodes}
@@ -0,0 +1,293 @@
+import os
+import time
+import threading
+import logging
+from array import array
+
+logger = logging.getLogger(__name__)
+
+# Per-sample fields, stored flat in one array('d') per bot.
+FIELDS = ("t", "mem_bytes", "cpu_percent", "net_rx_bps", "net_tx_bps", "blk_read_bps", "blk_write_bps")
+NFIELDS = len(FIELDS)
+
+
+class RingBuffer:
+    """Fixed-capacity time series; memory is allocated once and never grows."""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._data = array("d", bytes(8 * capacity * NFIELDS))
+        self._head = 0          # next slot to write
+        self._count = 0
+
+    @property
+    def nbytes(self):
+        return self._data.itemsize * len(self._data)
+
+    def append(self, values):
+        base = self._head * NFIELDS
+        self._data[base:base + NFIELDS] = array("d", values)
+        self._head = (self._head + 1) % self.capacity
+        self._count = min(self._count + 1, self.capacity)
+
+    def latest(self):
+        if not self._count:
+            return None
+        base = ((self._head - 1) % self.capacity) * NFIELDS
+        return dict(zip(FIELDS, self._data[base:base + NFIELDS]))
+
+    def _rows_since(self, since):
+        start = (self._head - self._count) % self.capacity
+        for i in range(self._count):
+            base = ((start + i) % self.capacity) * NFIELDS
+            if self._data[base] >= since:
+                yield self._data[base:base + NFIELDS]
+
+    def downsample(self, window: float, points: int, now: float = None):
+        """Averages over `points` equal buckets covering the last `window` seconds."""
+        now = now or time.time()
+        since = now - window
+        width = window / points
+        sums = [None] * points
+        counts = [0] * points
+        for row in self._rows_since(since):
+            bucket = min(points - 1, int((row[0] - since) / width))
+            if sums[bucket] is None:
+                sums[bucket] = list(row)
+            else:
+                acc = sums[bucket]
+                for j in range(1, NFIELDS):
+                    acc[j] += row[j]
+                acc[0] = row[0]
+            counts[bucket] += 1
+        history = []
+        for acc, n in zip(sums, counts):
+            if acc is None:
+                continue
+            point = {"t": acc[0]}
+            for j in range(1, NFIELDS):
+                point[FIELDS[j]] = acc[j] / n
+            history.append(point)
+        return history
+
+
+class CgroupReader:
+    """Reads container counters straight from the host's cgroup fs (v2, or v1 fallback)."""
+
+    def __init__(self, root: str = "/sys/fs/cgroup", proc: str = "/proc"):
+        self.root = root
+        self.proc = proc
+        self.v2 = os.path.exists(os.path.join(root, "cgroup.controllers"))
+
+    def _v2_dir(self, container_id):
+        for rel in (f"system.slice/docker-{container_id}.scope", f"docker/{container_id}"):
+            path = os.path.join(self.root, rel)
+            if os.path.isdir(path):
+                return path
+        return None
+
+    def available(self, container_id):
+        if self.v2:
+            return self._v2_dir(container_id) is not None
+        return os.path.isdir(os.path.join(self.root, "memory", "docker", container_id))
+
+    @staticmethod
+    def _read_int(path):
+        with open(path) as f:
+            return int(f.read().split()[0])
+
+    def read(self, container_id, pid=None):
+        """Cumulative counters: mem_bytes, cpu_usec, blk_read, blk_write, net_rx, net_tx."""
+        blk_read = blk_write = 0
+        if self.v2:
+            base = self._v2_dir(container_id)
+            mem = self._read_int(os.path.join(base, "memory.current"))
+            cpu_usec = 0
+            with open(os.path.join(base, "cpu.stat")) as f:
+                for line in f:
+                    if line.startswith("usage_usec"):
+                        cpu_usec = int(line.split()[1])
+                        break
+            with open(os.path.join(base, "io.stat")) as f:
+                for line in f:
+                    for part in line.split()[1:]:
+                        key, _, value = part.partition("=")
+                        if key == "rbytes":
+                            blk_read += int(value)
+                        elif key == "wbytes":
+                            blk_write += int(value)
+        else:
+            mem = self._read_int(os.path.join(self.root, "memory", "docker", container_id, "memory.usage_in_bytes"))
+            cpu_usec = self._read_int(os.path.join(self.root, "cpuacct", "docker", container_id, "cpuacct.usage")) // 1000
+            with open(os.path.join(self.root, "blkio", "docker", container_id, "blkio.throttle.io_service_bytes")) as f:
+                for line in f:
+                    parts = line.split()
+                    if len(parts) == 3 and parts[1] == "Read":
+                        blk_read += int(parts[2])
+                    elif len(parts) == 3 and parts[1] == "Write":
+                        blk_write += int(parts[2])
+        net_rx = net_tx = 0
+        if pid:
+            with open(os.path.join(self.proc, str(pid), "net", "dev")) as f:
+                for line in f.readlines()[2:]:
+                    iface, _, counters = line.partition(":")
+                    if iface.strip() == "lo":
+                        continue
+                    values = counters.split()
+                    net_rx += int(values[0])
+                    net_tx += int(values[8])
+        return {"mem_bytes": mem, "cpu_usec": cpu_usec, "blk_read": blk_read, "blk_write": blk_write,
+                "net_rx": net_rx, "net_tx": net_tx}
+
+
+def counters_from_docker_stats(stats):
+    """Same cumulative counters as CgroupReader.read, from a Docker stats payload."""
+    blk_read = blk_write = 0
+    for entry in (stats.get("blkio_stats", {}).get("io_service_bytes_recursive") or []):
+        if entry.get("op", "").lower() == "read":
+            blk_read += entry.get("value", 0)
+        elif entry.get("op", "").lower() == "write":
+            blk_write += entry.get("value", 0)
+    networks = stats.get("networks") or {}
+    return {
+        "mem_bytes": stats.get("memory_stats", {}).get("usage", 0),
+        "cpu_usec": stats.get("cpu_stats", {}).get("cpu_usage", {}).get("total_usage", 0) // 1000,
+        "blk_read": blk_read,
+        "blk_write": blk_write,
+        "net_rx": sum(n.get("rx_bytes", 0) for n in networks.values()),
+        "net_tx": sum(n.get("tx_bytes", 0) for n in networks.values()),
+    }
+
+
+class ResourceSampler:
+    """One background thread sampling every running bot into its own RingBuffer.
+
+    list_fn() -> {bot_id: (container_id, pid)} for running bots.
+    stats_fn(container_id) -> Docker stats payload, used when cgroups aren't readable.
+    process_fn() -> {bot_id: (container_id, counters)} for bots that share a
+    container and are read per process; called once per round.
+    """
+
+    def __init__(self, list_fn, stats_fn, executor, interval: float = 5.0, capacity: int = 720,
+                 cgroup_reader: CgroupReader = None, process_fn=None):
+        self.list_fn = list_fn
+        self.stats_fn = stats_fn
+        self.process_fn = process_fn
+        self.executor = executor
+        self.interval = interval
+        self.capacity = capacity
+        self.cgroups = cgroup_reader or CgroupReader()
+        self.rounds = 0
+        self.last_round_ms = 0.0
+        self._buffers = {}      # bot_id -> RingBuffer
+        self._previous = {}     # bot_id -> (container_id, time, counters)
+        self._totals = {}       # bot_id -> latest cumulative counters
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def start(self):
+        threading.Thread(target=self._loop, name="resource-sampler", daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            started = time.time()
+            try:
+                self.sample_once()
+            except Exception as e:
+                logger.warning(f"Resource sampling round failed: {e}")
+            self.last_round_ms = (time.time() - started) * 1000
+            self._stop.wait(max(0.0, self.interval - (time.time() - started)))
+
+    def _read(self, container_id, pid):
+        if self.cgroups.available(container_id):
+            return self.cgroups.read(container_id, pid)
+        return counters_from_docker_stats(self.stats_fn(container_id))
+
+    def sample_once(self):
+        running = self.list_fn()
+        futures = {bot_id: self.executor.submit(self._read, cid, pid) for bot_id, (cid, pid) in running.items()}
+        processes = {}
+        if self.process_fn:
+            try:
+                processes = self.process_fn()
+            except Exception as e:
+                logger.warning(f"Sampling shared processes failed: {e}")
+        now = time.time()
+        for bot_id, future in futures.items():
+            try:
+                counters = future.result()
+            except Exception as e:
+                logger.debug(f"Sampling {bot_id} failed: {e}")
+                continue
+            self.record(bot_id, running[bot_id][0], counters, now)
+        for bot_id, (container_id, counters) in processes.items():
+            self.record(bot_id, container_id, counters, now)
+        with self._lock:
+            for bot_id in list(self._previous):
+                if bot_id not in running and bot_id not in processes:
+                    # Stopped bots keep their history until /delete forgets them.
+                    del self._previous[bot_id]
+        self.rounds += 1
+
+    def record(self, bot_id, container_id, counters, now):
+        with self._lock:
+            previous = self._previous.get(bot_id)
+            cpu = net_rx = net_tx = blk_r = blk_w = 0.0
+            if previous and previous[0] == container_id and now > previous[1]:
+                elapsed = now - previous[1]
+                prev = previous[2]
+                # 100% == one full core.
+                cpu = max(0, counters["cpu_usec"] - prev["cpu_usec"]) / (elapsed * 1e6) * 100
+                net_rx = max(0, counters["net_rx"] - prev["net_rx"]) / elapsed
+                net_tx = max(0, counters["net_tx"] - prev["net_tx"]) / elapsed
+                blk_r = max(0, counters["blk_read"] - prev["blk_read"]) / elapsed
+                blk_w = max(0, counters["blk_write"] - prev["blk_write"]) / elapsed
+            buffer = self._buffers.get(bot_id)
+            if buffer is None:
+                buffer = self._buffers[bot_id] = RingBuffer(self.capacity)
+            buffer.append((now, counters["mem_bytes"], cpu, net_rx, net_tx, blk_r, blk_w))
+            self._previous[bot_id] = (container_id, now, counters)
+            self._totals[bot_id] = counters
+
+    def forget(self, bot_id):
+        with self._lock:
+            self._buffers.pop(bot_id, None)
+            self._previous.pop(bot_id, None)
+            self._totals.pop(bot_id, None)
+
+    def latest(self, bot_id):
+        with self._lock:
+            buffer = self._buffers.get(bot_id)
+            if buffer is None:
+                return None
+            sample = buffer.latest()
+            totals = self._totals.get(bot_id, {})
+        sample.update({
+            "net_rx_bytes": totals.get("net_rx", 0),
+            "net_tx_bytes": totals.get("net_tx", 0),
+            "blk_read_bytes": totals.get("blk_read", 0),
+            "blk_write_bytes": totals.get("blk_write", 0),
+        })
+        return sample
+
+    def history(self, bot_id, window: float, points: int):
+        with self._lock:
+            buffer = self._buffers.get(bot_id)
+            return buffer.downsample(window, points) if buffer else []
+
+    def stats(self):
+        with self._lock:
+            bots = len(self._buffers)
+        per_bot = 8 * NFIELDS * self.capacity
+        return {
+            "bots": bots,
+            "interval_s": self.interval,
+            "capacity": self.capacity,
+            "bytes_per_bot": per_bot,
+            "rounds": self.rounds,
+            "last_round_ms": round(self.last_round_ms, 2),
+            "cgroup_v2": self.cgroups.v2,
+        }
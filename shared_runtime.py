@@ -0,0 +1,223 @@
+import io
+import json
+import tarfile
+import hashlib
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+DENSITY_MODES = ("dedicated", "shared")
+RUNTIME_NAME_PREFIX = "botoralo-rt-"
+RUNTIME_LABEL = "botoralo.runtime_group"
+BOTS_ROOT = "/bots"             # /bots/<bot_id>/code (workdir) and /bots/<bot_id>/deps
+PID_DIR = "/run/botoralo"       # <bot_id>.pid holds the bot's process group id
+CGROUP_ROOT = "/sys/fs/cgroup"
+
+# Run as root whenever a runtime (re)starts. Pid files from before a restart are stale.
+# Sub-groups can only get controllers if no process sits in the root group, so the
+# container's own init moves to /init first. Docker mounts the cgroup fs read-only in
+# unprivileged containers. Then this prints "soft" and the backend enforces the limits
+# from its samples instead.
+PREPARE_SCRIPT = f"""
+mkdir -p {BOTS_ROOT} {PID_DIR} && chown 1000:1000 {BOTS_ROOT} && rm -f {PID_DIR}/*.pid
+if [ -w {CGROUP_ROOT}/cgroup.subtree_control ] && mkdir -p {CGROUP_ROOT}/init 2>/dev/null \\
+   && echo 1 > {CGROUP_ROOT}/init/cgroup.procs && echo '+memory +pids' > {CGROUP_ROOT}/cgroup.subtree_control; then
+    echo cgroup
+else
+    echo soft
+fi
+"""
+
+# bash -c LAUNCH_SCRIPT launch <bot_id> <memory_mb> <pids_max> <cmd...>, as root. With a tty the
+# exec is a session leader, so its pid is also the process group every child inherits.
+LAUNCH_SCRIPT = f"""
+id=$1 mem=$2 pids=$3; shift 3
+old=$(cat "{PID_DIR}/$id.pid" 2>/dev/null) && kill -KILL -- "-$old" 2>/dev/null
+cg="{CGROUP_ROOT}/bot-$id"
+if [ -w {CGROUP_ROOT}/cgroup.subtree_control ] && mkdir -p "$cg" 2>/dev/null \\
+   && echo $((mem * 1048576)) > "$cg/memory.max" && echo "$pids" > "$cg/pids.max" && echo $$ > "$cg/cgroup.procs"; then
+    echo "[info] limits: ${{mem}} MB, $pids processes (cgroup)"
+else
+    echo "[info] limits: ${{mem}} MB, $pids processes (enforced by the backend)"
+fi
+echo $$ > "{PID_DIR}/$id.pid"
+export HOME="{BOTS_ROOT}/$id"
+exec setpriv --reuid=1000 --regid=1000 --clear-groups -- "$@"
+"""
+
+# bash -c STOP_SCRIPT stop <bot_id> <timeout>, as root. Prints "stopped" or "not_running".
+STOP_SCRIPT = f"""
+pgid=$(cat "{PID_DIR}/$1.pid" 2>/dev/null)
+rm -f "{PID_DIR}/$1.pid"
+if [ -z "$pgid" ] || ! kill -TERM -- "-$pgid" 2>/dev/null; then echo not_running; exit 0; fi
+for i in $(seq 1 $(($2 * 10))); do kill -0 -- "-$pgid" 2>/dev/null || break; sleep 0.1; done
+kill -KILL -- "-$pgid" 2>/dev/null
+rmdir "{CGROUP_ROOT}/bot-$1" 2>/dev/null
+echo stopped
+"""
+
+# python3 -c READ_SCRIPT, as root: cumulative counters per bot, summed over its process group,
+# or read from its cgroup when it has one. Network counters are per container, not per process.
+READ_SCRIPT = f"""
+import os, json
+tick = 1e6 / os.sysconf("SC_CLK_TCK")
+page = os.sysconf("SC_PAGE_SIZE")
+groups = {{}}
+for name in os.listdir("{PID_DIR}"):
+    if name.endswith(".pid"):
+        try:
+            groups[int(open("{PID_DIR}/" + name).read())] = name[:-4]
+        except (OSError, ValueError):
+            pass
+out = {{bot: dict(mem_bytes=0, cpu_usec=0, blk_read=0, blk_write=0, net_rx=0, net_tx=0, procs=0, limits="soft")
+        for bot in groups.values()}}
+for pid in os.listdir("/proc"):
+    if not pid.isdigit():
+        continue
+    try:
+        stat = open("/proc/" + pid + "/stat").read().rsplit(")", 1)[1].split()
+        bot = groups.get(int(stat[2]))
+        if bot is None:
+            continue
+        c = out[bot]
+        c["procs"] += 1
+        c["cpu_usec"] += int(sum(int(v) for v in stat[11:15]) * tick)
+        c["mem_bytes"] += int(open("/proc/" + pid + "/statm").read().split()[1]) * page
+        for line in open("/proc/" + pid + "/io"):
+            key, _, value = line.partition(":")
+            if key in ("read_bytes", "write_bytes"):
+                c["blk_read" if key == "read_bytes" else "blk_write"] += int(value)
+    except (OSError, IndexError, ValueError):
+        pass
+for bot, c in out.items():
+    cg = "{CGROUP_ROOT}/bot-" + bot
+    try:
+        c["mem_bytes"] = int(open(cg + "/memory.current").read())
+        for line in open(cg + "/cpu.stat"):
+            if line.startswith("usage_usec"):
+                c["cpu_usec"] = int(line.split()[1])
+        c["limits"] = "cgroup"
+    except (OSError, ValueError):
+        pass
+print(json.dumps(out))
+"""
+
+
+def group_key(group: str) -> str:
+    return hashlib.sha1(str(group).encode()).hexdigest()[:12]
+
+
+def runtime_group(name: str) -> str:
+    """The group key a runtime container name was made from."""
+    return name[len(RUNTIME_NAME_PREFIX):].rsplit("-", 1)[0]
+
+
+def bot_dir(bot_id) -> str:
+    return f"{BOTS_ROOT}/{bot_id}"
+
+
+def code_archive(bot_code_dir: str) -> bytes:
+    """Tar of the bot's code as code/..., owned by the bot user, for put_archive into bot_dir()."""
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w") as tar:
+        def owned(info):
+            info.uid = info.gid = 1000
+            info.uname = info.gname = ""
+            return info
+        tar.add(bot_code_dir, arcname="code", filter=owned)
+    return buffer.getvalue()
+
+
+class SharedRuntimes:
+    """Which shared runtime container each shared-mode bot runs in.
+
+    A runtime is one container per tenant group (a user, unless the deploy
+    names a group) hosting up to `max_bots` bot processes. Membership is the
+    registry's `shared_runtime` column, so nothing here needs persisting;
+    assign() runs under `lock`, held by the caller until the assignment is
+    recorded.
+    """
+
+    def __init__(self, registry, max_bots: int = 16):
+        self.registry = registry
+        self.max_bots = max_bots
+        self.created = 0
+        self.removed = 0
+        self.enforced = 0           # processes the backend killed for exceeding soft limits
+        self.lock = threading.Lock()
+
+    def members(self):
+        """{runtime name: {"node", "bots": [bot ids], "memory_mb"}}."""
+        runtimes = {}
+        for bot_id, row in self.registry.all().items():
+            name = row["shared_runtime"]
+            if not name:
+                continue
+            entry = runtimes.setdefault(name, {"node": row["node"], "bots": [], "memory_mb": 0})
+            entry["bots"].append(bot_id)
+            entry["memory_mb"] += row["memory_mb"] or 0
+        return runtimes
+
+    def assign(self, bot_id, group: str, node: str = None):
+        """(runtime name, node name or None for a new runtime) for the bot in `group`.
+
+        Keeps the bot's current runtime if it belongs to the group, otherwise
+        fills the group's fullest runtime that still has a slot, so runtimes
+        empty out and can be removed. `node` restricts the choice to one node.
+        """
+        key = group_key(group)
+        runtimes = self.members()
+        row = self.registry.get(bot_id)
+        current = row["shared_runtime"] if row else None
+        if current and runtime_group(current) == key and node in (None, runtimes[current]["node"]):
+            return current, runtimes[current]["node"]
+        best = None
+        for name, entry in runtimes.items():
+            if (runtime_group(name) != key or len(entry["bots"]) >= self.max_bots
+                    or node not in (None, entry["node"])):
+                continue
+            if best is None or len(entry["bots"]) > len(runtimes[best]["bots"]):
+                best = name
+        if best:
+            return best, runtimes[best]["node"]
+        n = 0
+        while f"{RUNTIME_NAME_PREFIX}{key}-{n}" in runtimes:
+            n += 1
+        return f"{RUNTIME_NAME_PREFIX}{key}-{n}", None
+
+    def stats(self):
+        runtimes = self.members()
+        return {
+            "max_bots": self.max_bots,
+            "bots": sum(len(entry["bots"]) for entry in runtimes.values()),
+            "created": self.created,
+            "removed": self.removed,
+            "enforced": self.enforced,
+            "runtimes": {
+                name: {"node": entry["node"], "bots": len(entry["bots"]), "reserved_mb": entry["memory_mb"]}
+                for name, entry in runtimes.items()
+            },
+        }
+
+
+def parse_readings(output) -> dict:
+    """READ_SCRIPT output -> {bot_id: counters}; {} if the runtime printed nothing usable."""
+    try:
+        readings = json.loads(output)
+    except (TypeError, ValueError):
+        return {}
+    return readings if isinstance(readings, dict) else {}
+
+
+def runtime_pids_limit(max_bots: int, bot_pids: int) -> int:
+    # Room for every bot's pids plus the init process and the backend's own execs.
+    return max_bots * bot_pids + 32
+
+
+def bot_env(runtime: str, memory_mb: int, deps_dir: str) -> dict:
+    """Environment for a shared-mode bot process."""
+    if runtime == "python":
+        return {"PYTHONUNBUFFERED": "1", "PYTHONPATH": deps_dir}
+    # V8 collects before the heap reaches the limit instead of growing into it.
+    return {"FORCE_COLOR": "1", "NODE_OPTIONS": f"--max-old-space-size={max(16, int(memory_mb * 0.75))}"}
@@ -4,6 +4,8 @@ import { createSupabaseServerClient } from '@/lib/supabase/server';
 import { getBotById } from '@/lib/supabase/actions';
 
 const BACKEND_URL = process.env.BOT_BACKEND_URL;
+// Optional: the backend's async log server (ASYNC_LOG_PORT), which holds idle streams far more cheaply.
+const LOG_STREAM_URL = process.env.BOT_BACKEND_LOG_STREAM_URL || BACKEND_URL;
 const MASTER_KEY = process.env.BOT_BACKEND_MASTER_KEY;
 
 export const runtime = 'edge'; // Use the Edge runtime for best streaming performance
@@ -38,7 +40,7 @@ export async function POST(req: NextRequest, { params }: { params: { id: string
   }
 
   try {
-    const backendResponse = await fetch(`${BACKEND_URL}/logs`, {
+    const backendResponse = await fetch(`${LOG_STREAM_URL}/logs`, {
       method: 'POST',
       headers: {
         'Authorization': `Bearer ${MASTER_KEY}`,
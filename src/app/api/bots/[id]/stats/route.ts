@@ -24,10 +24,15 @@ export async function POST(req: NextRequest, { params }: { params: { id: string
     return new NextResponse('Bot not found or not authorized', { status: 404 });
   }
 
+  // Optional history request: { window: seconds, points: number }
+  const { window, points } = await req.json().catch(() => ({}));
+
   try {
     const body = JSON.stringify({
       userId: user.id,
       botoraloBotId: botId,
+      window,
+      points,
     });
 
     const backendResponse = await fetch(`${BACKEND_URL}/stats`, {
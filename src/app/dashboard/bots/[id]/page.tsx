@@ -8,7 +8,7 @@ import { Badge, type BadgeProps } from "@/components/ui/badge";
 import { SummarizeLogs } from "@/components/bots/summarize-logs";
 import { AnalyzeAnomalies } from "@/components/bots/analyze-anomalies";
 import { SuggestFixes } from "@/components/bots/suggest-fixes";
-import { getBotInfoFromBackend } from "@/lib/bot-backend/client";
+import { getBotInfoFromBackend, getBotLogExcerptsFromBackend } from "@/lib/bot-backend/client";
 import { BotActions } from "@/components/bots/bot-actions";
 
 type StatusConfig = {
@@ -39,8 +39,9 @@ export default async function BotDetailPage({ params }: { params: { id: string }
     bot.status = backendInfo.bot.status;
   }
   
-  // No longer need to pass logs, as the LogViewer will stream them.
-  const botLogs = "";
+  // The LogViewer streams logs itself; the AI tabs get excerpts filtered by the backend,
+  // or the recent stored lines while the search index has nothing for this bot.
+  const { recentLogs, errorLogs } = await getBotLogExcerptsFromBackend(bot.id);
 
   const status = statusConfig[bot.status as keyof typeof statusConfig] || statusConfig.stopped;
 
@@ -74,13 +75,13 @@ export default async function BotDetailPage({ params }: { params: { id: string }
           <LogViewer botId={bot.id} />
         </TabsContent>
         <TabsContent value="summary">
-          <SummarizeLogs logs={botLogs} />
+          <SummarizeLogs logs={recentLogs} />
         </TabsContent>
         <TabsContent value="anomalies">
-          <AnalyzeAnomalies botId={bot.id} logs={botLogs} />
+          <AnalyzeAnomalies botId={bot.id} logs={recentLogs} />
         </TabsContent>
         <TabsContent value="fixes">
-           <SuggestFixes botCode={''} botLogs={botLogs} />
+           <SuggestFixes botCode={''} botLogs={errorLogs} />
         </TabsContent>
       </Tabs>
     </div>
@@ -6,7 +6,7 @@ import { BotCard } from '@/components/dashboard/bot-card';
 import { getUserBots, getUserSubscription } from '@/lib/supabase/actions';
 import { Tooltip, TooltipContent, TooltipProvider, TooltipTrigger } from '@/components/ui/tooltip';
 import { createSupabaseServerClient } from '@/lib/supabase/server';
-import { getBotInfoFromBackend } from '@/lib/bot-backend/client';
+import { getBotsInfoFromBackend } from '@/lib/bot-backend/client';
 import { revalidatePath } from 'next/cache';
 
 const planLimits = {
@@ -40,17 +40,17 @@ export default async function Dashboard() {
     getUserBots(),
   ]);
 
-  // Fetch live backend info for each bot
-  const userBots = await Promise.all(
-    userBotsFromDb.map(async (bot) => {
-      const backendInfo = await getBotInfoFromBackend(bot.id);
-      return {
-        ...bot,
-        status: backendInfo?.bot.status || bot.status,
-        backendInfo: backendInfo?.bot || null,
-      };
-    })
-  );
+  // Fetch live backend info for all bots in one request
+  const backendInfoById = await getBotsInfoFromBackend(userBotsFromDb.map((bot) => bot.id));
+  const userBots = userBotsFromDb.map((bot) => {
+    const backendInfo = backendInfoById[bot.id];
+    const usable = backendInfo && !backendInfo.error;
+    return {
+      ...bot,
+      status: (usable && backendInfo.status) || bot.status,
+      backendInfo: usable ? backendInfo : null,
+    };
+  });
 
   const plan = subscription.plan as keyof typeof planLimits;
   const botLimit = planLimits[plan].bots;
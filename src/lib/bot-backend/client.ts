@@ -120,4 +120,108 @@ export async function getBotInfoFromBackend(botId: string) {
     }
 }
 
-    
\ No newline at end of file
+    
+export async function getDeployStatusFromBackend(botId: string, jobId?: string) {
+    const { user } = await getCurrentUser();
+    if (!user) throw new Error("Not authenticated");
+
+    // Deploys run in the background; without a jobId the bot's latest deploy is reported.
+    const payload = { userId: user.id, botoraloBotId: botId, jobId };
+    try {
+        const response = await makeBackendRequest('/deploy/status', 'POST', payload);
+        return response.data;
+    } catch (e) {
+        return null;
+    }
+}
+
+export async function getBotsInfoFromBackend(botIds: string[]) {
+    const { user } = await getCurrentUser();
+    if (!user) throw new Error("Not authenticated");
+    if (botIds.length === 0) return {};
+
+    // One round trip for the whole dashboard; per-bot failures come back inline.
+    const payload = { userId: user.id, botoraloBotIds: botIds };
+    try {
+        const response = await makeBackendRequest('/info/batch', 'POST', payload);
+        return response.data.bots ?? {};
+    } catch (e) {
+        return {};
+    }
+}
+
+export async function getBotsStatsFromBackend(botIds: string[]) {
+    const { user } = await getCurrentUser();
+    if (!user) throw new Error("Not authenticated");
+    if (botIds.length === 0) return {};
+
+    const payload = { userId: user.id, botoraloBotIds: botIds };
+    try {
+        const response = await makeBackendRequest('/stats/batch', 'POST', payload);
+        return response.data.stats ?? {};
+    } catch (e) {
+        return {};
+    }
+}
+
+export type LogSearchFilters = {
+    query?: string;
+    regex?: string;
+    level?: 'stderr' | 'error' | 'traceback';
+    since?: number;
+    until?: number;
+    limit?: number;
+    errors?: number;
+    context?: number;
+};
+
+export async function searchBotLogsInBackend(botId: string, filters: LogSearchFilters) {
+    const { user } = await getCurrentUser();
+    if (!user) throw new Error("Not authenticated");
+
+    // Filtering happens next to the logs; only matching lines cross the network.
+    const payload = { userId: user.id, botoraloBotId: botId, ...filters };
+    try {
+        const response = await makeBackendRequest('/logs/search', 'POST', payload);
+        return response.data;
+    } catch (e) {
+        return null;
+    }
+}
+
+type LogLine = { seq: number; t: number; line: string };
+
+const RECENT_LOG_LINES = 200;
+const ERROR_LINE_RE = /^\[stderr\]|error|traceback/i;
+
+async function getRecentBotLogsFromBackend(botId: string): Promise<LogLine[]> {
+    // The stored log read in order, for when the search index has nothing yet (e.g. still rebuilding).
+    const { user } = await getCurrentUser();
+    if (!user) throw new Error("Not authenticated");
+
+    const since = Date.now() / 1000 - 3600;
+    const payload = { userId: user.id, botoraloBotId: botId, since, limit: 10000 };
+    try {
+        const response = await makeBackendRequest('/logs/range', 'POST', payload);
+        return (response.data?.lines ?? []).slice(-RECENT_LOG_LINES);
+    } catch (e) {
+        return [];
+    }
+}
+
+export async function getBotLogExcerptsFromBackend(botId: string) {
+    // Compact input for the AI flows: recent lines, and the last error blocks with context.
+    const result = await searchBotLogsInBackend(botId, { limit: RECENT_LOG_LINES, errors: 5, context: 3 });
+    if (result?.lines?.length) {
+        const recentLogs = result.lines.map((l: LogLine) => l.line).join('\n');
+        const errorLogs = (result.error_blocks ?? [])
+            .map((block: { lines: LogLine[] }) => block.lines.map((l) => l.line).join('\n'))
+            .join('\n---\n');
+        return { recentLogs, errorLogs };
+    }
+    // Search came back empty: fall back to the plain stored log so the AI tabs still get input.
+    const lines = await getRecentBotLogsFromBackend(botId);
+    const recentLogs = lines.map((l) => l.line).join('\n');
+    const errorLogs = lines.filter((l) => ERROR_LINE_RE.test(l.line)).map((l) => l.line).join('\n');
+    return { recentLogs, errorLogs };
+}
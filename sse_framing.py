@@ -0,0 +1,121 @@
+import json
+import time
+import zlib
+
+from log_index import PREFIX_RE
+
+FRAMINGS = ("line", "batch")
+
+
+def accepts_gzip(accept_encoding: str) -> bool:
+    """Whether an Accept-Encoding header allows gzip (and doesn't give it q=0)."""
+    for part in (accept_encoding or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        if coding.strip().lower() in ("gzip", "*"):
+            q = params.strip().lower()
+            try:
+                return not (q.startswith("q=") and float(q[2:] or 0) == 0)
+            except ValueError:
+                return False
+    return False
+
+
+def split_stream(line: str):
+    """"[stderr] boom" -> ("stderr", "boom"); (None, line) for a line without a stream tag."""
+    prefix = PREFIX_RE.match(line)
+    return (prefix.group(1), line[prefix.end():]) if prefix else (None, line)
+
+
+def parse_framing(data: dict, accept_encoding: str = "", batch_ms: int = 50, batch_bytes: int = 65536):
+    """SseFraming for a /logs request body's "framing", "batch_ms" and "batch_bytes"; ValueError if invalid."""
+    mode = data.get("framing") or "line"
+    if mode not in FRAMINGS:
+        raise ValueError(f"'framing' must be one of {', '.join(FRAMINGS)}")
+    try:
+        window = max(1, min(int(data.get("batch_ms", batch_ms)), 1000)) / 1000
+        max_bytes = max(1024, min(int(data.get("batch_bytes", batch_bytes)), 1 << 20))
+    except (TypeError, ValueError):
+        raise ValueError("'batch_ms' and 'batch_bytes' must be integers")
+    return SseFraming(mode, window, max_bytes, gzip=mode == "batch" and accepts_gzip(accept_encoding))
+
+
+class SseFraming:
+    """How one log stream's lines are written as SSE events.
+
+    "line" is one `data: <line>` event per line, what EventSource clients
+    expect. "batch" writes the lines that arrived within `window` seconds as
+    one event, `data: {"lines": [[seq, stream, text], ...], "dropped": n}`,
+    starting a new event once one reaches `max_bytes`. Notices are
+    `data: {"info": ...}` and heartbeats SSE comments. With `gzip` the whole
+    response is one gzip stream, sync-flushed after every write so each
+    event reaches the client when it is sent.
+    """
+
+    def __init__(self, mode: str = "line", window: float = 0.05, max_bytes: int = 65536, gzip: bool = False):
+        self.mode = mode
+        self.window = window
+        self.max_bytes = max_bytes
+        self.gzip = gzip
+        self.raw_bytes = 0
+        self.wire_bytes = 0
+        self._compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if gzip else None
+
+    @property
+    def batched(self):
+        return self.mode == "batch"
+
+    @property
+    def headers(self):
+        headers = {"Cache-Control": "no-cache", "Connection": "keep-alive", "X-Accel-Buffering": "no"}
+        if self.gzip:
+            headers.update({"Content-Encoding": "gzip", "Vary": "Accept-Encoding"})
+        return headers
+
+    def encode(self, text: str) -> bytes:
+        data = text.encode()
+        self.raw_bytes += len(data)
+        if self._compressor is not None:
+            data = self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+        self.wire_bytes += len(data)
+        return data
+
+    def finish(self) -> bytes:
+        """The gzip trailer, once the stream ends normally."""
+        if self._compressor is None:
+            return b""
+        data = self._compressor.flush()
+        self.wire_bytes += len(data)
+        return data
+
+    def lines(self, lines, end_seq: int, dropped: int = 0) -> list:
+        """SSE text for a broker read: `lines` are the seqs up to `end_seq`, after `dropped` missed ones."""
+        if not self.batched:
+            events = [f"data: [info] dropped {dropped} lines\n\n"] if dropped else []
+            events.extend(f"data: {line}\n\n" for line in lines)
+            return events
+        events, batch, size = [], [], 0
+        for seq, line in enumerate(lines, end_seq - len(lines)):
+            stream, text = split_stream(line)
+            batch.append([seq, stream, text])
+            size += len(text) + 16
+            if size >= self.max_bytes:
+                events.append(self._batch(batch, dropped))
+                batch, size, dropped = [], 0, 0
+        if batch or dropped:
+            events.append(self._batch(batch, dropped))
+        return events
+
+    @staticmethod
+    def _batch(batch, dropped):
+        body = {"lines": batch, "dropped": dropped} if dropped else {"lines": batch}
+        return f"data: {json.dumps(body, separators=(',', ':'))}\n\n"
+
+    def info(self, text: str) -> str:
+        if self.batched:
+            return f"data: {json.dumps({'info': split_stream(text)[1]})}\n\n"
+        return f"data: {text}\n\n"
+
+    def heartbeat(self) -> str:
+        if self.batched:
+            return f": heartbeat {time.strftime('%H:%M:%S')}\n\n"
+        return f"data: [heartbeat] {time.strftime('%H:%M:%S')}\n\n"
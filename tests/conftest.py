@@ -0,0 +1,64 @@
+import io
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+MASTER_KEY = "k" * 32
+HEADERS = {"Authorization": f"Bearer {MASTER_KEY}"}
+
+
+@pytest.fixture(scope="session")
+def fake_docker():
+    from fake_docker import FakeDocker
+    fake = FakeDocker(log_rate=50, create_latency=0, start_latency=0, install_latency=0.01, exec_latency=0.001)
+    fake.install()
+    return fake
+
+
+@pytest.fixture(scope="session")
+def backend(fake_docker):
+    # bot_backend reads its configuration at import time, against the fake daemon.
+    os.environ["MASTER_BACKEND_KEY"] = MASTER_KEY
+    os.environ["BOTS_DIR"] = tempfile.mkdtemp(prefix="botoralo-test-")
+    os.environ["WARM_POOL_SIZE"] = "0"
+    logging.disable(logging.INFO)
+    import bot_backend
+    return bot_backend
+
+
+@pytest.fixture(scope="session")
+def client(backend):
+    return backend.app.test_client()
+
+
+def deploy(client, bot_id, density="dedicated", code=b"print('hello')\n", timeout=30, memory_mb=128):
+    meta = {"userId": "u", "botoraloBotId": bot_id, "name": bot_id, "auto_start": True, "density": density,
+            "memory_mb": memory_mb}
+    response = client.post("/deploy", headers=HEADERS,
+                           data={"meta": json.dumps(meta), "code": (io.BytesIO(code), "main.py")})
+    assert response.status_code in (200, 202), response.json
+    job_id = response.json["jobId"]
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = client.post("/deploy/status", headers=HEADERS, json={"userId": "u", "jobId": job_id}).json["job"]
+        if job["status"] in ("succeeded", "failed"):
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"deploy {job_id} still {job['status']} after {timeout}s")
+
+
+def wait_for(fn, timeout=10):
+    # fn's first truthy result, polling until `timeout`.
+    deadline = time.time() + timeout
+    while True:
+        result = fn()
+        if result or time.time() >= deadline:
+            return result
+        time.sleep(0.05)
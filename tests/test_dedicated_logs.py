@@ -0,0 +1,42 @@
+import gzip
+
+from conftest import HEADERS, deploy, wait_for
+
+
+def _bot_lines(client, bot_id):
+    lines = client.post("/logs/range", headers=HEADERS, json={"userId": "u", "botoraloBotId": bot_id}).json["lines"]
+    return [entry for entry in lines if " line " in entry["line"]]
+
+
+def test_dedicated_output_reaches_log_range(client):
+    job = deploy(client, "dedicated-range")
+    assert job["status"] == "succeeded", job.get("error")
+    lines = wait_for(lambda: _bot_lines(client, "dedicated-range"))
+    assert lines, "no bot output in /logs/range"
+    assert all(entry["line"].startswith("[stdout] ") for entry in lines)
+    seqs = [entry["seq"] for entry in lines]
+    assert seqs == sorted(seqs)
+
+
+def test_dedicated_output_in_gzip_download(client):
+    job = deploy(client, "dedicated-download")
+    assert job["status"] == "succeeded", job.get("error")
+    assert wait_for(lambda: _bot_lines(client, "dedicated-download"))
+    response = client.post("/logs/download", headers=HEADERS,
+                           json={"userId": "u", "botoraloBotId": "dedicated-download"})
+    assert response.status_code == 200
+    assert response.mimetype == "application/gzip"
+    text = gzip.decompress(response.data).decode()
+    assert "[stdout] " in text and " line " in text
+
+
+def test_dedicated_output_is_searchable(client):
+    job = deploy(client, "dedicated-search")
+    assert job["status"] == "succeeded", job.get("error")
+
+    def search():
+        return client.post("/logs/search", headers=HEADERS,
+                           json={"userId": "u", "botoraloBotId": "dedicated-search", "query": "line"}).json["lines"]
+    lines = wait_for(search)
+    assert lines, "/logs/search found nothing for a dedicated bot"
+    assert all(" line " in entry["line"] for entry in lines)
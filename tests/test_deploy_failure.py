@@ -0,0 +1,43 @@
+import io
+import json
+
+from conftest import HEADERS, deploy
+
+
+def test_failed_shared_deploy_fails_despite_cleanup_errors(backend, client, monkeypatch):
+    def broken(*args, **kwargs):
+        raise RuntimeError("daemon went away")
+    # The deploy fails copying the code in, and the cleanup's stop of the bot fails too.
+    monkeypatch.setattr(backend, "_put_shared_code", broken)
+    monkeypatch.setattr(backend, "_stop_shared_process", broken)
+    job = deploy(client, "shared-broken", density="shared", timeout=10)
+    assert job["status"] == "failed"
+    assert "daemon went away" in job["error"]
+    assert backend.bot_registry.get("shared-broken") is None
+
+
+def test_failed_redeploy_keeps_the_running_bot(backend, fake_docker, client):
+    job = deploy(client, "redeploy-no-room", code=b"print('v1')\n")
+    assert job["status"] == "succeeded", job.get("error")
+    row = backend.bot_registry.get("redeploy-no-room")
+    # More memory than the fake daemon has, so placement refuses the redeploy.
+    job = deploy(client, "redeploy-no-room", code=b"print('v2')\n", memory_mb=fake_docker.memory_mb * 2)
+    assert job["status"] == "failed"
+    assert "No Docker node has room" in job["error"]
+    restored = backend.bot_registry.get("redeploy-no-room")
+    assert restored is not None
+    assert {k: restored[k] for k in ("memory_mb", "content_hash", "container_id", "node")} == \
+           {k: row[k] for k in ("memory_mb", "content_hash", "container_id", "node")}
+    assert backend.manifest_store.load("redeploy-no-room")["digest"] == row["content_hash"]
+    with open(f"{backend.get_bot_code_dir('redeploy-no-room')}/main.py") as f:
+        assert f.read() == "print('v1')\n"
+    assert fake_docker.containers[row["container_id"]].status == "running"
+
+
+def test_deploy_rejects_unsafe_bot_ids(client):
+    for bot_id in ("x; touch /pwned", "../escape", ".hidden", "a b", "$(id)", ""):
+        meta = {"userId": "u", "botoraloBotId": bot_id, "name": "n", "density": "shared"}
+        response = client.post("/deploy", headers=HEADERS,
+                               data={"meta": json.dumps(meta), "code": (io.BytesIO(b"print(1)\n"), "main.py")})
+        assert response.status_code == 400, bot_id
+        assert "botoraloBotId" in response.json["error"]
@@ -0,0 +1,62 @@
+import pytest
+
+from deploy_jobs import DeployJob, DeployQueue, DeployQueueFull
+
+
+def test_job_runs_through_its_stages():
+    ended = []
+    job = DeployJob("bot", on_stage_end=lambda stage, status, seconds: ended.append((stage, status)))
+    assert job.status == "queued"
+    job.begin_stage("upload")
+    job.end_stage("upload")
+    assert job.status == "queued"       # the upload happens before a worker picks the job up
+    job.begin_stage("extract")
+    assert job.status == "running" and job.stage == "extract"
+    job.end_stage("extract", files=3)
+    job.skip_stage("start")
+    job.succeed(containerId="c1")
+    data = job.to_dict()
+    assert data["status"] == "succeeded" and data["stage"] is None
+    assert data["containerId"] == "c1"
+    assert data["stages"]["extract"]["files"] == 3
+    assert data["stages"]["start"] == {"status": "skipped"}
+    assert ended == [("upload", "done"), ("extract", "done")]
+    assert job.done
+
+
+def test_failure_marks_the_running_stage():
+    ended = []
+    job = DeployJob("bot", debug=True, on_stage_end=lambda stage, status, seconds: ended.append((stage, status)))
+    job.begin_stage("extract")
+    job.end_stage("extract")
+    job.begin_stage("install")
+    version = job.version
+    job.fail("pip failed", "Traceback ...")
+    data = job.to_dict()
+    assert data["status"] == "failed"
+    assert data["error"] == "pip failed" and data["trace"] == "Traceback ..."
+    assert data["stages"]["install"]["status"] == "failed"
+    assert data["stages"]["create"]["status"] == "pending"
+    assert ended[-1] == ("install", "failed")
+    assert job.wait_for_change(version, timeout=0) > version
+    assert job.done
+
+
+def test_trace_only_kept_in_debug():
+    job = DeployJob("bot")
+    job.fail("boom", "Traceback ...")
+    assert "trace" not in job.to_dict()
+
+
+def test_queue_counts_failures_and_rejects_when_full():
+    queue = DeployQueue(max_workers=1, max_pending=1)
+    job = queue.reserve("bot")
+    with pytest.raises(DeployQueueFull):
+        queue.reserve("other")
+
+    def fail(job):
+        job.fail("no")
+    queue.submit(job, fail)
+    queue._executor.shutdown(wait=True)
+    assert queue.stats()["failed"] == 1 and queue.stats()["pending"] == 0
+    assert queue.latest_for_bot("bot") is job
@@ -0,0 +1,11 @@
+import time
+
+from conftest import deploy, wait_for
+
+
+def test_dedicated_output_keeps_bot_active(backend, client):
+    job = deploy(client, "dedicated-active")
+    assert job["status"] == "succeeded", job.get("error")
+    # The fake bot prints a line every 20 ms into the container log, never on its exec stream.
+    started = time.time()
+    assert wait_for(lambda: backend.hibernator._last_active.get("dedicated-active", 0) > started + 0.2)
@@ -0,0 +1,24 @@
+import threading
+import time
+
+from log_broker import LogBroker
+
+
+def test_wait_closed_sleeps_through_publishes_and_ends_on_close():
+    broker = LogBroker(capacity=10)
+    threading.Timer(0.02, broker.publish, args=("a",)).start()
+    started = time.monotonic()
+    assert broker.wait_closed(0.1) is False
+    assert time.monotonic() - started >= 0.1
+    threading.Timer(0.05, broker.close).start()
+    started = time.monotonic()
+    assert broker.wait_closed(5.0) is True
+    assert time.monotonic() - started < 1.0
+
+
+def test_read_reports_lines_missed_by_a_slow_reader():
+    broker = LogBroker(capacity=4)
+    for i in range(6):
+        broker.publish(f"line {i}")
+    lines, cursor, dropped = broker.read(0)
+    assert (lines, cursor, dropped) == (["line 2", "line 3", "line 4", "line 5"], 6, 2)
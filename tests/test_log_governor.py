@@ -0,0 +1,73 @@
+import threading
+
+from log_governor import LogGovernor
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_repeats_within_window_collapse():
+    clock = Clock()
+    governor = LogGovernor(clock=clock)
+    assert governor.admit("ping") == ["ping"]
+    for _ in range(3):
+        clock.now += 0.1
+        assert governor.admit("ping") == []
+    assert governor.admit("pong") == ["[info] last message repeated 3 times", "pong"]
+    assert governor.stats()["collapsed"] == 3
+
+
+def test_repeat_after_window_is_published():
+    clock = Clock()
+    governor = LogGovernor(repeat_window=5.0, clock=clock)
+    assert governor.admit("heartbeat") == ["heartbeat"]
+    clock.now += 60
+    assert governor.admit("heartbeat") == ["heartbeat"]
+    assert governor.stats()["collapsed"] == 0
+
+
+def test_long_run_of_repeats_reports_every_flush_interval():
+    clock = Clock()
+    governor = LogGovernor(repeat_flush=5.0, clock=clock)
+    governor.admit("spam")
+    published = []
+    for _ in range(39):
+        clock.now += 0.25
+        published += governor.admit("spam")
+    assert published == ["[info] last message repeated 20 times"]
+    assert governor.flush() == ["[info] last message repeated 19 times"]
+
+
+def test_reset_forgets_previous_line():
+    clock = Clock()
+    governor = LogGovernor(clock=clock)
+    governor.admit("started")
+    governor.admit("started")
+    assert governor.reset() == ["[info] last message repeated 1 times"]
+    assert governor.admit("started") == ["started"]
+
+
+def test_concurrent_admit_and_reset_keep_counts():
+    governor = LogGovernor()
+
+    def reader(name):
+        for i in range(2000):
+            governor.admit(f"{name} {i % 3}")
+
+    def restarter():
+        for _ in range(200):
+            governor.reset()
+    threads = [threading.Thread(target=reader, args=(f"r{n}",)) for n in range(4)]
+    threads.append(threading.Thread(target=restarter))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stats = governor.stats()
+    assert stats["lines_in"] == 8000
+    assert stats["bytes_in"] == sum(len(f"r{n} {i % 3}") for n in range(4) for i in range(2000))
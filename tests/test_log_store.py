@@ -0,0 +1,90 @@
+import time
+
+from log_index import LogIndex
+from log_store import LogStore
+
+# Within the default 72 h retention, which drops older segments as soon as one is sealed.
+T0 = float(int(time.time()) - 3600)
+
+
+def _store(tmp_path, **kwargs):
+    return LogStore(str(tmp_path / "log"), **{"segment_bytes": 4096, "index_every": 8, **kwargs})
+
+
+def test_range_pages_across_segments(tmp_path):
+    store = _store(tmp_path)
+    for i in range(500):
+        store.append(f"[stdout] line {i}", ts=T0 + i)
+    assert store.stats()["segments"] > 3
+    lines, after = [], None
+    while True:
+        page = store.range(after_seq=after, limit=64)
+        if not page:
+            break
+        lines.extend(page)
+        after = page[-1][0]
+    assert [seq for seq, _, _ in lines] == list(range(500))
+    assert lines[123] == (123, T0 + 123, "[stdout] line 123")
+
+
+def test_range_by_time(tmp_path):
+    store = _store(tmp_path)
+    for i in range(300):
+        store.append(f"line {i}", ts=T0 + i)
+    records = store.range(since=T0 + 100, until=T0 + 104)
+    assert [line for _, _, line in records] == [f"line {i}" for i in range(100, 105)]
+
+
+def test_retention_drops_whole_sealed_segments(tmp_path):
+    store = _store(tmp_path, retention_bytes=16384)
+    for i in range(2000):
+        store.append(f"line {i:05d}", ts=T0 + i)
+    stats = store.stats()
+    assert stats["bytes"] <= 16384 + 4096
+    assert stats["first_seq"] > 0 and stats["next_seq"] == 2000
+    first = store.range(limit=1)[0]
+    assert first[0] == stats["first_seq"] and first[2] == f"line {stats['first_seq']:05d}"
+
+
+def test_reopen_and_archive_keep_records(tmp_path):
+    store = _store(tmp_path)
+    for i in range(300):
+        store.append(f"line {i}", ts=T0 + i)
+    assert store.archive_sealed("gzip") > 0
+    store.close()
+    reopened = _store(tmp_path)
+    assert reopened.stats()["archived_segments"] > 0
+    assert [line for _, _, line in reopened.range(after_seq=149, limit=3)] == ["line 150", "line 151", "line 152"]
+    assert reopened.append("line 300") == 300
+
+
+def test_index_search(tmp_path):
+    store = _store(tmp_path)
+    index = LogIndex(store)
+    lines = [f"[stdout] polling update {i}" for i in range(200)]
+    lines[50] = "[stderr] Traceback (most recent call last):"
+    lines[51] = "[stderr]   File \"main.py\", line 3, in <module>"
+    lines[52] = "[stderr] ValueError: bad token"
+    lines[120] = "[stdout] Connected to Telegram"
+    for line in lines:
+        index.add(store.append(line), line)
+
+    found, next_before, _ = index.search(query="telegram")
+    assert [seq for seq, _, _ in found] == [120] and next_before is None
+    found, _, _ = index.search(regex=r"Value\w+: bad")
+    assert [seq for seq, _, _ in found] == [52]
+    found, _, _ = index.search(level="stderr")
+    assert [seq for seq, _, _ in found] == [50, 51, 52]
+    (kind, first_seq, last_seq, records), = index.error_blocks(count=5, context=1)
+    assert (kind, first_seq, last_seq) == ("traceback", 50, 52)
+    assert [seq for seq, _, _ in records] == [49, 50, 51, 52, 53]
+    found, next_before, _ = index.search(query="polling", limit=10)
+    assert [seq for seq, _, _ in found] == list(range(190, 200)) and next_before == 190
+
+
+def test_index_catches_up_from_store(tmp_path):
+    store = _store(tmp_path)
+    for i in range(100):
+        store.append(f"line {i} {'needle' if i == 77 else 'hay'}")
+    found, _, _ = LogIndex(store).search(query="needle")
+    assert [seq for seq, _, _ in found] == [77]
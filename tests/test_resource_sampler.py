@@ -0,0 +1,36 @@
+import pytest
+
+from resource_sampler import FIELDS, RingBuffer
+
+
+def _row(t, mem):
+    return [t, mem] + [0.0] * (len(FIELDS) - 2)
+
+
+def test_downsample_averages_into_buckets():
+    ring = RingBuffer(100)
+    for i in range(60):
+        ring.append(_row(1000.0 + i, float(i)))
+    history = ring.downsample(window=60, points=6, now=1060.0)
+    assert len(history) == 6
+    # Bucket k covers t in [1000 + 10k, 1010 + 10k): mem values 10k..10k+9.
+    assert [point["mem_bytes"] for point in history] == [pytest.approx(10 * k + 4.5) for k in range(6)]
+    assert [point["t"] for point in history] == [1009.0 + 10 * k for k in range(6)]
+
+
+def test_downsample_skips_empty_buckets_and_old_rows():
+    ring = RingBuffer(100)
+    for t in (900.0, 1001.0, 1002.0, 1055.0):
+        ring.append(_row(t, t))
+    history = ring.downsample(window=60, points=6, now=1060.0)
+    assert [point["t"] for point in history] == [1002.0, 1055.0]
+    assert history[0]["mem_bytes"] == pytest.approx(1001.5)
+
+
+def test_ring_keeps_only_capacity_rows():
+    ring = RingBuffer(10)
+    for i in range(25):
+        ring.append(_row(1000.0 + i, float(i)))
+    history = ring.downsample(window=100, points=100, now=1025.0)
+    assert [point["mem_bytes"] for point in history] == [float(i) for i in range(15, 25)]
+    assert ring.latest()["mem_bytes"] == 24.0
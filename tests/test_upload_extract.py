@@ -0,0 +1,68 @@
+import io
+import os
+import zipfile
+
+import pytest
+
+from upload_extract import UploadRejected, ZipStreamExtractor
+
+MB = 1024 * 1024
+
+
+def _zip(files, compression=zipfile.ZIP_DEFLATED):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", compression) as archive:
+        for name, data in files.items():
+            archive.writestr(name, data)
+    return buf.getvalue()
+
+
+def _extract(tmp_path, data, chunk=4096, **limits):
+    limits = {"max_bytes": 10 * MB, "max_files": 100, "max_ratio": 100.0, **limits}
+    extractor = ZipStreamExtractor(str(tmp_path / "out"), **limits)
+    for i in range(0, len(data), chunk):
+        extractor.write(data[i:i + chunk])
+    try:
+        return extractor, extractor.finish()
+    finally:
+        extractor.close()
+
+
+def test_extracts_entries_as_they_stream_in(tmp_path):
+    data = _zip({"main.py": "print('hi')\n", "lib/util.py": "X = 1\n"})
+    _, report = _extract(tmp_path, data, chunk=7)
+    assert report["files"] == 2
+    assert (tmp_path / "out" / "lib" / "util.py").read_text() == "X = 1\n"
+
+
+def test_rejects_archive_over_size_limit(tmp_path):
+    data = _zip({"big.bin": b"\0" * (3 * MB)})
+    with pytest.raises(UploadRejected, match="more than 1 MB"):
+        _extract(tmp_path, data, max_bytes=1 * MB, max_ratio=1e9)
+    assert not os.path.exists(tmp_path / "out")
+
+
+def test_rejects_archive_over_ratio_limit(tmp_path):
+    data = _zip({"bomb.bin": b"\0" * (8 * MB)})
+    with pytest.raises(UploadRejected, match="compression ratio"):
+        _extract(tmp_path, data, max_ratio=100.0)
+
+
+def test_rejects_too_many_files(tmp_path):
+    data = _zip({f"f{i}.py": "" for i in range(3)})
+    with pytest.raises(UploadRejected, match="more than 2 files"):
+        _extract(tmp_path, data, max_files=2)
+
+
+@pytest.mark.parametrize("name", ["../evil.py", "/etc/evil.py", "a/../../evil.py"])
+def test_rejects_paths_outside_the_directory(tmp_path, name):
+    data = _zip({name: "x"}, compression=zipfile.ZIP_STORED)
+    with pytest.raises(UploadRejected):
+        _extract(tmp_path, data)
+    assert not (tmp_path / "evil.py").exists()
+    assert not os.path.exists(tmp_path / "out")
+
+
+def test_rejects_non_zip(tmp_path):
+    with pytest.raises(UploadRejected, match="not a valid zip"):
+        _extract(tmp_path, b"this is not a zip archive")
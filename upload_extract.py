@@ -0,0 +1,280 @@
+import os
+import zlib
+import struct
+import shutil
+
+from code_manifest import safe_relpath
+
+LOCAL_HEADER = struct.Struct("<IHHHHHIIIHH")
+LOCAL_SIG = 0x04034B50
+DESCRIPTOR_SIG = 0x08074B50
+# Anything after the last entry (central directory, end records) is ignored.
+END_SIGS = {0x02014B50, 0x06054B50, 0x06064B50, 0x07064B50, 0x05054B50}
+OUT_CHUNK = 64 * 1024
+
+
+class UploadRejected(ValueError):
+    pass
+
+
+class _Entry:
+    __slots__ = ("name", "file", "method", "flags", "remaining", "crc", "expected_crc", "zip64", "inflater", "size")
+
+    def __init__(self, name, file, method, flags, compressed_size, expected_crc, zip64):
+        self.name = name
+        self.file = file
+        self.method = method
+        self.flags = flags
+        self.remaining = compressed_size
+        self.crc = 0
+        self.expected_crc = expected_crc
+        self.zip64 = zip64
+        self.inflater = zlib.decompressobj(-15) if method == 8 else None
+        self.size = 0
+
+
+class ZipStreamExtractor:
+    """Unpacks a zip archive as its bytes arrive, reading local file headers in order.
+
+    The archive is never stored: each entry is inflated in OUT_CHUNK pieces
+    straight into its destination file under `directory`. Limits on total
+    uncompressed bytes, entry count and overall compression ratio are checked
+    before every write, so a zip bomb is stopped after at most one chunk past
+    the limit. Errors don't raise out of write() (it runs inside the multipart
+    parser); they're recorded, the partial output is deleted, the rest of the
+    upload is discarded, and finish() raises UploadRejected.
+
+    Stored entries that use a data descriptor, encrypted entries and methods
+    other than stored/deflate are rejected.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, max_files: int, max_ratio: float,
+                 ratio_grace_bytes: int = 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        self.max_ratio = max_ratio
+        self.ratio_grace_bytes = ratio_grace_bytes
+        self.error = None
+        self.files = 0
+        self.bytes_in = 0
+        self.bytes_written = 0
+        self.peak_buffer_bytes = 0
+        self._buf = bytearray()
+        self._entry = None
+        self._descriptor_pending = None
+        self._done = False
+        self._finished = False
+        self._claimed = False
+        os.makedirs(directory, exist_ok=True)
+
+    # --- File-like surface the multipart parser uses ---
+    def write(self, data):
+        self.bytes_in += len(data)
+        if self.error:
+            return len(data)
+        if self.bytes_in > self.max_bytes:
+            # Also bounds whatever trails the last entry, which is otherwise skipped unread.
+            self._reject(f"Upload is larger than {self.max_bytes // (1024 * 1024)} MB.")
+            return len(data)
+        if self._done:
+            return len(data)
+        self._buf += data
+        self.peak_buffer_bytes = max(self.peak_buffer_bytes, len(self._buf))
+        try:
+            self._process()
+        except ValueError as e:     # UploadRejected, or an unsafe path from safe_relpath
+            self._reject(str(e))
+        except (OSError, zlib.error) as e:
+            self._reject(f"Could not extract archive: {e}")
+        return len(data)
+
+    def seek(self, offset, whence=0):
+        # The parser rewinds once the part is complete.
+        if not self._finished:
+            self._finished = True
+            if not self.error and not self._done and (self._entry or self._descriptor_pending or self._buf):
+                self._reject("Archive is truncated.")
+            elif not self.error and not self.files:
+                self._reject("Archive contains no files.")
+        return 0
+
+    def read(self, size=-1):
+        return b""
+
+    def readline(self, size=-1):
+        return b""
+
+    def close(self):
+        if self._entry and self._entry.file:
+            self._entry.file.close()
+            self._entry = None
+        if not self._claimed:
+            shutil.rmtree(self.directory, ignore_errors=True)
+
+    # --- Results ---
+    def report(self):
+        return {
+            "files": self.files,
+            "compressed_bytes": self.bytes_in,
+            "extracted_bytes": self.bytes_written,
+            "peak_buffer_bytes": self.peak_buffer_bytes,
+        }
+
+    def finish(self):
+        """Raises UploadRejected if extraction failed, else hands over `directory` and returns report()."""
+        self.seek(0)
+        if self.error:
+            raise UploadRejected(self.error)
+        self._claimed = True
+        return self.report()
+
+    # --- Parsing ---
+    def _reject(self, message):
+        self.error = message
+        self._buf = bytearray()
+        if self._entry and self._entry.file:
+            self._entry.file.close()
+        self._entry = None
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def _process(self):
+        while True:
+            if self._descriptor_pending is not None:
+                if not self._read_descriptor():
+                    return
+            elif self._entry is not None:
+                if not self._read_entry_data():
+                    return
+            else:
+                if len(self._buf) < 4:
+                    return
+                signature = struct.unpack_from("<I", self._buf)[0]
+                if signature in END_SIGS:
+                    self._done = True
+                    self._buf = bytearray()
+                    return
+                if signature != LOCAL_SIG:
+                    raise UploadRejected("Upload is not a valid zip archive.")
+                if not self._read_local_header():
+                    return
+
+    def _read_local_header(self):
+        buf = self._buf
+        if len(buf) < LOCAL_HEADER.size:
+            return False
+        (_, _, flags, method, _, _, crc, compressed_size, size,
+         name_len, extra_len) = LOCAL_HEADER.unpack_from(buf)
+        end = LOCAL_HEADER.size + name_len + extra_len
+        if len(buf) < end:
+            return False
+        raw_name = bytes(buf[LOCAL_HEADER.size:LOCAL_HEADER.size + name_len])
+        extra = bytes(buf[LOCAL_HEADER.size + name_len:end])
+        del buf[:end]
+        name = raw_name.decode("utf-8" if flags & 0x800 else "cp437")
+        zip64 = False
+        if compressed_size == 0xFFFFFFFF or size == 0xFFFFFFFF:
+            zip64 = True
+            compressed_size = self._zip64_compressed_size(extra, size, compressed_size)
+        if flags & 0x1:
+            raise UploadRejected(f"Encrypted entries are not supported: {name}")
+        if method not in (0, 8):
+            raise UploadRejected(f"Unsupported compression method {method} for {name}")
+        if method == 0 and flags & 0x8:
+            raise UploadRejected(f"Stored entry without sizes is not supported: {name}")
+        if name.endswith("/"):
+            # Directory entries can still carry an (empty) deflate stream; it is read and dropped.
+            if name.strip("/"):
+                os.makedirs(self._dest(safe_relpath(name.rstrip("/"))), exist_ok=True)
+            file = None
+        else:
+            self.files += 1
+            if self.files > self.max_files:
+                raise UploadRejected(f"Archive has more than {self.max_files} files.")
+            dest = self._dest(safe_relpath(name))
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            file = open(dest, "wb")
+        self._entry = _Entry(name, file, method, flags, compressed_size, crc, zip64)
+        return True
+
+    @staticmethod
+    def _zip64_compressed_size(extra, size, compressed_size):
+        pos = 0
+        while pos + 4 <= len(extra):
+            tag, length = struct.unpack_from("<HH", extra, pos)
+            if tag == 0x0001:
+                fields = extra[pos + 4:pos + 4 + length]
+                values = [struct.unpack_from("<Q", fields, i)[0] for i in range(0, len(fields) - 7, 8)]
+                if size == 0xFFFFFFFF:
+                    values = values[1:]
+                return values[0] if compressed_size == 0xFFFFFFFF and values else compressed_size
+            pos += 4 + length
+        return compressed_size
+
+    def _dest(self, relpath):
+        return os.path.join(self.directory, *relpath.split("/"))
+
+    def _emit(self, entry, data):
+        if not data:
+            return
+        self.bytes_written += len(data)
+        if self.bytes_written > self.max_bytes:
+            raise UploadRejected(f"Archive expands to more than {self.max_bytes // (1024 * 1024)} MB.")
+        if self.bytes_written > self.ratio_grace_bytes and self.bytes_written > self.max_ratio * max(1, self.bytes_in):
+            raise UploadRejected(f"Archive compression ratio exceeds {self.max_ratio:g}:1.")
+        if entry.file is None:
+            raise UploadRejected(f"Directory entry {entry.name} has content.")
+        entry.crc = zlib.crc32(data, entry.crc)
+        entry.size += len(data)
+        entry.file.write(data)
+
+    def _read_entry_data(self):
+        entry = self._entry
+        buf = self._buf
+        if entry.method == 0:
+            take = min(len(buf), entry.remaining)
+            for start in range(0, take, OUT_CHUNK):
+                self._emit(entry, bytes(buf[start:min(take, start + OUT_CHUNK)]))
+            del buf[:take]
+            entry.remaining -= take
+            if entry.remaining:
+                return False
+        else:
+            if not buf:
+                return False
+            inflater = entry.inflater
+            self._emit(entry, inflater.decompress(buf, OUT_CHUNK))
+            while inflater.unconsumed_tail and not inflater.eof:
+                self._emit(entry, inflater.decompress(inflater.unconsumed_tail, OUT_CHUNK))
+            if not inflater.eof:
+                self._buf = bytearray()
+                return False
+            self._buf = bytearray(inflater.unused_data)
+        self._entry = None
+        if entry.file:
+            entry.file.close()
+        if entry.flags & 0x8:
+            self._descriptor_pending = entry
+        else:
+            self._check_crc(entry, entry.expected_crc)
+        return True
+
+    def _read_descriptor(self):
+        entry = self._descriptor_pending
+        buf = self._buf
+        if len(buf) < 4:
+            return False
+        offset = 4 if struct.unpack_from("<I", buf)[0] == DESCRIPTOR_SIG else 0
+        size = offset + (20 if entry.zip64 else 12)     # crc + compressed + uncompressed sizes
+        if len(buf) < size:
+            return False
+        crc = struct.unpack_from("<I", buf, offset)[0]
+        del buf[:size]
+        self._descriptor_pending = None
+        self._check_crc(entry, crc)
+        return True
+
+    @staticmethod
+    def _check_crc(entry, expected):
+        if entry.crc != expected:
+            raise UploadRejected(f"CRC mismatch in {entry.name}")
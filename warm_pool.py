@@ -0,0 +1,134 @@
+import os
+import time
+import uuid
+import shutil
+import threading
+import logging
+from collections import deque
+import docker
+
+from metrics import percentile
+
+logger = logging.getLogger(__name__)
+
+POOL_LABEL = "botoralo.pool"
+POOL_NAME_PREFIX = "botoralo-pool-"
+
+
+class WarmPool:
+    """Idle, already-started runtime containers per memory tier.
+
+    Each pooled container bind-mounts its own empty slot directory at /bot.
+    A bind mount follows the directory, not its path, so claiming moves the
+    bot's code into the slot and renames the slot to the bot's code dir.
+    """
+
+    def __init__(self, docker_client, create_fn, pool_dir: str, tiers, size: int):
+        self.docker_client = docker_client
+        self.create_fn = create_fn          # (name, memory_mb, code_dir, labels) -> started container
+        self.pool_dir = pool_dir
+        self.tiers = list(tiers)
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self.claim_latencies = deque(maxlen=512)     # ms
+        self._idle = {tier: deque() for tier in self.tiers}     # tier -> deque[(container, slot_dir)]
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        os.makedirs(pool_dir, exist_ok=True)
+
+    def start(self):
+        if self.size <= 0:
+            return
+        self._discard_leftovers()
+        threading.Thread(target=self._refill_loop, name="warm-pool", daemon=True).start()
+
+    def _discard_leftovers(self):
+        # Idle containers from a previous run are cheaper to recreate than to trust.
+        for container in self.docker_client.containers.list(all=True, filters={"label": POOL_LABEL}):
+            if container.name.startswith(POOL_NAME_PREFIX):
+                try:
+                    container.remove(force=True)
+                except docker.errors.APIError:
+                    pass
+        for name in os.listdir(self.pool_dir):
+            shutil.rmtree(os.path.join(self.pool_dir, name), ignore_errors=True)
+
+    def _refill_loop(self):
+        while True:
+            for tier in self.tiers:
+                while self.idle_count(tier) < self.size:
+                    try:
+                        self._add(tier)
+                    except Exception as e:
+                        logger.warning(f"Warm pool refill for {tier}MB failed: {e}")
+                        break
+            self._wake.wait(timeout=30)
+            self._wake.clear()
+
+    def _add(self, tier):
+        slot_id = uuid.uuid4().hex[:12]
+        slot_dir = os.path.join(self.pool_dir, slot_id)
+        os.makedirs(slot_dir)
+        try:
+            container = self.create_fn(f"{POOL_NAME_PREFIX}{tier}-{slot_id}", tier, slot_dir, {POOL_LABEL: str(tier)})
+        except Exception:
+            shutil.rmtree(slot_dir, ignore_errors=True)
+            raise
+        with self._lock:
+            self._idle[tier].append((container, slot_dir))
+
+    def idle_count(self, tier):
+        with self._lock:
+            return len(self._idle[tier])
+
+    def claim(self, memory_mb: int, name: str, code_dir: str):
+        """Hand out a started container whose /bot is now code_dir, renamed to name; None on a miss."""
+        started = time.time()
+        with self._lock:
+            idle = self._idle.get(memory_mb)
+            entry = idle.popleft() if idle else None
+            if entry is None:
+                self.misses += 1
+                return None
+        self._wake.set()
+        container, slot_dir = entry
+        try:
+            for item in os.listdir(code_dir):
+                os.rename(os.path.join(code_dir, item), os.path.join(slot_dir, item))
+            os.rmdir(code_dir)
+            os.rename(slot_dir, code_dir)
+            container.rename(name)
+        except Exception as e:
+            logger.warning(f"Warm pool claim of {container.name} failed: {e}")
+            # Put whatever we moved back where the deploy expects it.
+            if os.path.isdir(slot_dir):
+                os.makedirs(code_dir, exist_ok=True)
+                for item in os.listdir(slot_dir):
+                    os.rename(os.path.join(slot_dir, item), os.path.join(code_dir, item))
+                shutil.rmtree(slot_dir, ignore_errors=True)
+            try:
+                container.remove(force=True)
+            except docker.errors.APIError:
+                pass
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+            self.claim_latencies.append((time.time() - started) * 1000)
+        return container
+
+    def stats(self):
+        with self._lock:
+            claims = self.hits + self.misses
+            latencies = list(self.claim_latencies)
+            return {
+                "target_size": self.size,
+                "idle": {str(tier): len(idle) for tier, idle in self._idle.items()},
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / claims, 3) if claims else 0.0,
+                "claim_ms_p50": percentile(latencies, 0.5, 2),
+                "claim_ms_p99": percentile(latencies, 0.99, 2),
+            }